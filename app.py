@@ -4,6 +4,7 @@ from modules._evaluar import render_evaluation_page
 from modules.clima import render_clima_page  # <--- Importa tu función de clima
 from modules.auth import check_password
 from modules.ficha import render_ficha_page
+from modules.drive_client import get_cold_start_stats
 
 # --- CONFIGURACIÓN INICIAL DE LA PÁGINA ---
 st.set_page_config(
@@ -58,6 +59,18 @@ else:
             st.warning("⚠️ **Estado del Sistema**")
             st.success("✅ Conexión a Google Drive: ACTIVA")
             st.success("✅ Motor de IA: LISTO")
+            arranque = get_cold_start_stats()
+            if arranque:
+                st.caption(f"Cliente de Drive construido en {arranque['total_ms']} ms (arranque en frío).")
+            # Import diferido: pdf_generator carga WeasyPrint/Pango, que los enlaces públicos no usan
+            from modules.pdf_generator import render_cache_stats
+            cache_pdf = render_cache_stats()
+            st.caption(
+                f"Caché de PDFs: {cache_pdf['aciertos']} aciertos, {cache_pdf['renders']} renders, "
+                f"{cache_pdf['subidas_omitidas']} subidas a Drive omitidas · "
+                f"{cache_pdf['entradas']} PDFs ({cache_pdf['bytes'] / 1024 / 1024:.1f} MB)"
+                + (f" · render medio {cache_pdf['kb_medio']} KB en {cache_pdf['ms_medio']} ms" if cache_pdf["renders"] else "")
+            )
 
         st.markdown("---")
         st.caption("Desarrollado para SERVINET - Versión 1.0")
@@ -0,0 +1,86 @@
+"""
+Prueba de throughput de los flujos de IA sin red, usando el backend stub.
+
+Uso:
+    python benchmarks/bench_ai_flows.py --latency-ms 300 --error-rate 0.05 --cargos 10
+
+Se puede apuntar al servidor HTTP local (SDK real de OpenAI) con --http.
+Antes verifica que el circuit breaker se cierre aunque la sonda tenga que esperar cupo.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def verificar_circuito():
+    """
+    Fallos del stub abren el circuito; pasa el enfriamiento con el único cupo ocupado y bajo el
+    retry-after del 429. La sonda espera su turno (sin rechazarse a sí misma) y al responder bien
+    cierra el circuito.
+    """
+    from modules.ai_brain import AIRateLimiter, AIServiceError
+    from modules.llm_backend import StubBackend
+
+    limiter = AIRateLimiter(max_concurrency=4, max_retries=0, failure_threshold=2, cooldown=0.2, max_wait=10)
+    stub = StubBackend(error_rate=1.0)
+    mensajes = [{"role": "user", "content": "ping"}]
+    ocupado = threading.Thread(target=limiter.call, args=(lambda: (time.sleep(2.5), StubBackend().complete(mensajes))[1],))
+    ocupado.start()
+    for _ in range(2):
+        try:
+            limiter.call(lambda: stub.complete(mensajes))
+        except AIServiceError:
+            pass
+    assert limiter.circuit_open, "los fallos debían abrir el circuito"
+    time.sleep(0.3)  # enfriamiento cumplido; el único cupo (concurrencia 4 -> 1 tras los 429) sigue ocupado
+    stub.error_rate = 0.0
+    limiter.call(lambda: stub.complete(mensajes))
+    ocupado.join()
+    assert not limiter.circuit_open and limiter._opened_at is None and not limiter._half_open_probe
+    limiter.call(lambda: stub.complete(mensajes))
+    print("Circuito: se abre con los fallos y la sonda lo cierra tras esperar cupo: OK")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cargos", type=int, default=5)
+    parser.add_argument("--http", action="store_true", help="Usa el servidor HTTP stub en localhost")
+    args = parser.parse_args()
+
+    if args.http:
+        from modules.llm_backend import serve_stub
+        server = serve_stub(latency_ms=args.latency_ms, error_rate=args.error_rate)
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        os.environ["OPENAI_API_KEY"] = "stub"
+        os.environ["LLM_BACKEND"] = "openai"
+    else:
+        os.environ["LLM_BACKEND"] = "stub"
+        os.environ["LLM_STUB_LATENCY_MS"] = str(args.latency_ms)
+        os.environ["LLM_STUB_ERROR_RATE"] = str(args.error_rate)
+
+    from modules import ai_brain
+
+    verificar_circuito()
+    cargos = [f"CARGO {i}" for i in range(args.cargos)]
+    flujos = {
+        "manual por secciones": lambda c: ai_brain.generate_role_profile_by_sections(c, "contexto"),
+        "formulario de evaluación": lambda c: ai_brain.generate_evaluation(c, "contexto"),
+        "análisis de resultados": lambda c: ai_brain.analyze_results({"cargo": c}),
+    }
+    print(f"Backend: {ai_brain.backend.name} | latencia={args.latency_ms}ms | error={args.error_rate}")
+    for nombre, fn in flujos.items():
+        inicio = time.perf_counter()
+        for cargo in cargos:
+            fn(cargo)
+        total = time.perf_counter() - inicio
+        print(f"{nombre:28s} {len(cargos)} ops en {total:7.2f}s -> {len(cargos) / total:7.2f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Resultados de clima laboral: el cálculo anterior de la página (pd.to_numeric de cada pregunta
+tres veces, medias globales y por cargo sobre todas las respuestas) frente al cubo de agregados.
+
+Columnas:
+  anterior       cálculo anterior, en cada rerun
+  armar          primera sincronización (cubo vacío): una sola vez
+  lectura        sincronizar una lectura de la hoja sin filas nuevas (compara las huellas de las
+                 filas que cambiaron desde la última lectura verificada): una vez por lectura
+  lectura fría   lo mismo en un proceso nuevo (compara todas las huellas y lee los grupos)
+  rerun          rerun con el cubo ya sincronizado (get_cubo_clima): estadísticas de la página
+  registrar      la encuesta suma su fila (registrar_respuesta)
+  +1 sincronizar la lectura siguiente trae una fila que nadie registró
+
+No incluye la lectura de la hoja (get_all_records), que la página ahora cachea: con la red de por
+medio es el costo dominante y antes se pagaba en cada rerun.
+
+Uso:
+    python benchmarks/bench_clima_cubo.py --respuestas 300 3000 30000 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+os.environ["SERVINET_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench_clima_")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.cache_store import cache_path  # noqa: E402
+from modules import clima_cube  # noqa: E402
+from modules.clima_cube import sincronizar, registrar_respuesta, estadisticas  # noqa: E402
+
+PREGUNTAS = [f"¿Pregunta {i}?" for i in range(9)] + ["¿Qué mejorarías en el ambiente laboral? (opcional)"]
+
+
+def respuestas_sinteticas(n, seed=0):
+    rng = np.random.default_rng(seed)
+    cargos = rng.integers(0, 60, n)
+    df = pd.DataFrame({
+        "NOMBRE COMPLETO": [f"Empleado {i}" for i in range(n)],
+        "CEDULA": np.arange(n) + 10_000_000,
+        "CARGO": [f"Cargo {c}" for c in cargos],
+        "DEPARTAMENTO": np.array(["ADMINISTRATIVO", "OPERATIVO", "FINANZAS", "COMERCIAL"])[cargos % 4],  # cada cargo en un depto
+        "FECHA": [f"2025-{m:02d}-15 09:00:00" for m in rng.integers(1, 13, n)],
+    })
+    for pregunta in PREGUNTAS[:-1]:
+        df[pregunta] = rng.integers(0, 11, n)
+    df[PREGUNTAS[-1]] = ""
+    return df
+
+
+def anterior(df_clima):
+    df_clima = df_clima.copy()
+    for _ in range(3):  # nivel superior, pestaña 2 y pestaña 3
+        preguntas = [col for col in df_clima.columns if col.startswith("¿")]
+        for col in preguntas:
+            df_clima[col] = pd.to_numeric(df_clima[col], errors='coerce')
+    return df_clima[preguntas].mean(), df_clima.groupby("CARGO")[preguntas].mean()
+
+
+def resultados(cubo):
+    globales = estadisticas(cubo).set_index("PREGUNTA").reindex(cubo["preguntas"])
+    por_cargo = estadisticas(cubo, ["CARGO"]).pivot(index="CARGO", columns="PREGUNTA", values="MEDIA")
+    estadisticas(cubo, ["CARGO"])  # pestaña 3
+    return globales, por_cargo
+
+
+def olvidar_memoria():
+    with clima_cube._memoria_lock:
+        clima_cube._memoria.update(version=None, estado=None, verificada=None)
+
+
+def cronometrar(funcion, *args, repeticiones=1):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        ms = (time.perf_counter() - inicio) * 1000
+        mejor = ms if mejor is None else min(mejor, ms)
+    return resultado, mejor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--respuestas", type=int, nargs="+", default=[300, 3000, 30000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'respuestas':>10} {'grupos':>7} {'anterior':>10} {'armar':>9} {'lectura':>9} {'lectura fría':>13} {'rerun':>8} {'registrar':>10} {'+1 sincronizar':>15}")
+    for n in args.respuestas:
+        if os.path.exists(cache_path("clima", "cubo.sqlite")):
+            os.remove(cache_path("clima", "cubo.sqlite"))  # cada tamaño arma su cubo desde cero
+        olvidar_memoria()
+        df = respuestas_sinteticas(n)
+        (medias, por_cargo), t_anterior = cronometrar(anterior, df, repeticiones=3)
+        _, t_armar = cronometrar(sincronizar, df)
+        cubo, t_lectura = cronometrar(sincronizar, df.copy(), repeticiones=3)
+        olvidar_memoria()
+        cubo, t_fria = cronometrar(sincronizar, df.copy())
+        (globales, cubo_cargo), _ = cronometrar(resultados, cubo)
+        _, t_rerun = cronometrar(resultados, cubo, repeticiones=3)
+        assert np.allclose(globales["MEDIA"].to_numpy(), medias.dropna().to_numpy())
+        assert np.allclose(cubo_cargo.loc[por_cargo.index, globales.index].to_numpy(), por_cargo.dropna(axis=1).to_numpy())
+
+        editada = df.copy()
+        editada.loc[0, PREGUNTAS[0]] = (editada.loc[0, PREGUNTAS[0]] + 1) % 11
+        assert sincronizar(editada)["version"] != cubo["version"], "editar la fila 0 debe reconstruir el cubo"
+        sincronizar(df)
+
+        nueva = respuestas_sinteticas(1, seed=n)
+        fila = [str(v) for v in nueva.iloc[0].tolist()]
+        _, t_registrar = cronometrar(registrar_respuesta, fila, {"updates": {"updatedRange": f"4_clima_laboral!A{n + 2}:O{n + 2}"}})
+        mas_dos = pd.concat([df, nueva, respuestas_sinteticas(1, seed=n + 1)], ignore_index=True)
+        cubo, t_sincronizar = cronometrar(sincronizar, mas_dos)
+        assert cubo["filas"] == n + 2
+        grupos = len(cubo["grupos"])
+        print(f"{n:10d} {grupos:7d} {t_anterior:8.1f}ms {t_armar:7.1f}ms {t_lectura:7.1f}ms {t_fria:11.1f}ms "
+              f"{t_rerun:6.1f}ms {t_registrar:8.1f}ms {t_sincronizar:13.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Pestaña de envío de clima laboral: el código anterior (iterrows sobre las respuestas para armar
+las cédulas que respondieron e iterrows sobre los pendientes armando una tarjeta HTML por fila)
+frente al anti-join vectorizado, los enlaces de todos en una pasada y una página de 25 tarjetas.
+Verifica que los pendientes sean los mismos.
+
+Uso:
+    python benchmarks/bench_clima_pendientes.py --empleados 500 5000 50000
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+import urllib.parse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.clima import pendientes_clima, enlaces_clima, exportar_enlaces  # noqa: E402
+
+POR_PAGINA = 25
+
+
+def plantilla(n):
+    empleados = pd.DataFrame({
+        "NOMBRE COMPLETO": [f"Empleado {i}" for i in range(n)],
+        "CEDULA": [10_000_000 + i for i in range(n)],
+        "CARGO": [f"Cargo {i % 80}" for i in range(n)],
+        "CELULAR": [3_000_000_000 + i for i in range(n)],
+    })
+    respuestas = pd.DataFrame({"CEDULA": [10_000_000 + i for i in range(0, n, 3)], "CARGO": "X"})
+    return empleados, respuestas
+
+
+def anterior(df, df_clima):
+    df = df.copy()
+    respondieron = set(str(row['CEDULA']) for _, row in df_clima.iterrows() if 'CEDULA' in row and row['CEDULA'])
+    df['CEDULA'] = df['CEDULA'].astype(str)
+    df_pendientes = df[~df['CEDULA'].isin(respondieron)]
+    tarjetas = []
+    for _, row in df_pendientes.iterrows():
+        token = base64.b64encode(str(row['CEDULA']).encode()).decode()
+        url = f"https://servinet.datovatenexuspro.com/?clima={row['CEDULA']}&token={token}"
+        url_encoded = urllib.parse.quote(url, safe='')
+        mensaje_ws = f"🌤️ Hola {row['NOMBRE COMPLETO']},%0A{url_encoded}%0A"
+        tarjetas.append(f"<div><b>{row['NOMBRE COMPLETO']}</b> ({row.get('CARGO','')})<a href=\"{url}\"></a>"
+                        f"<a href=\"https://web.whatsapp.com/send?phone={row.get('CELULAR','')}&text={mensaje_ws}\"></a></div>")
+    return df_pendientes, tarjetas
+
+
+def nuevo(df, df_clima):
+    enlaces = enlaces_clima(pendientes_clima(df, df_clima))
+    pagina = [f"<div><b>{f['NOMBRE COMPLETO']}</b> ({f['CARGO']})<a href=\"{f['ENLACE']}\"></a><a href=\"{f['WHATSAPP']}\"></a></div>"
+              for f in enlaces.iloc[:POR_PAGINA].to_dict("records")]
+    return enlaces, pagina
+
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--empleados", type=int, nargs="+", default=[500, 5000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'empleados':>9} {'pendientes':>10} {'anterior':>10} {'nuevo':>9} {'HTML antes':>11} {'HTML ahora':>11} {'CSV':>9}")
+    for n in args.empleados:
+        df, df_clima = plantilla(n)
+        (pendientes, tarjetas), t_anterior = cronometrar(anterior, df, df_clima)
+        (enlaces, pagina), t_nuevo = cronometrar(nuevo, df, df_clima)
+        assert pendientes["CEDULA"].tolist() == enlaces["CEDULA"].tolist(), "los pendientes difieren"
+        _, t_csv = cronometrar(exportar_enlaces, enlaces, "csv")
+        html_antes = sum(len(t) for t in tarjetas) / 1024
+        html_ahora = sum(len(t) for t in pagina) / 1024
+        print(f"{n:9d} {len(enlaces):10d} {t_anterior:8.1f}ms {t_nuevo:7.1f}ms {html_antes:9.0f}KB {html_ahora:9.1f}KB {t_csv:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Mide el arranque en frío del cliente de Drive: build() de googleapiclient frente a la
+fábrica compartida que usa el documento de descubrimiento empaquetado.
+Cada medición corre en un proceso nuevo para que sea realmente "en frío".
+
+Uso:
+    python benchmarks/bench_drive_client.py --repeticiones 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODIGO_BUILD = """
+import time
+from googleapiclient.discovery import build
+from google.oauth2.credentials import Credentials
+t0 = time.perf_counter()
+service = build('drive', 'v3', credentials=Credentials(token='x'))
+service.files()
+print((time.perf_counter() - t0) * 1000)
+"""
+
+CODIGO_FABRICA = """
+import time
+from google.oauth2.credentials import Credentials
+import modules.drive_client as dc
+dc.get_google_creds = lambda: Credentials(token='x')
+t0 = time.perf_counter()
+dc.get_drive_client().files()
+print((time.perf_counter() - t0) * 1000)
+"""
+
+
+def medir(codigo, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+        tiempos.append(float(salida.stdout.strip().splitlines()[-1]))
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+    for nombre, codigo in [("build() estándar", CODIGO_BUILD), ("fábrica compartida", CODIGO_FABRICA)]:
+        tiempos = medir(codigo, args.repeticiones)
+        print(f"{nombre:20s} mediana {statistics.median(tiempos):8.1f} ms (sin contar imports)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Micro-benchmark del extractor del manual: las 8 funciones extraer_* anteriores (cada una
+re-parsea el HTML con BeautifulSoup) frente a extraer_manual (una pasada con lxml).
+Verifica además que ambos den el mismo resultado.
+
+Uso:
+    python benchmarks/bench_extractor.py --repeticiones 200
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.llm_backend import _stub_section  # noqa: E402
+from modules.pdf_generator import extraer_manual, MANUAL_FIELDS  # noqa: E402
+
+SECCIONES = [
+    "🎯 Objetivo del Cargo", "📜 Funciones Principales", "🔄 Procesos Clave", "🗺️ Mapa de Procesos",
+    "🧩 Matriz de Competencias", "💡 Habilidades Blandas Requeridas", "🏆 Habilidades Técnicas Requeridas",
+    "📊 KPIs Sugeridos", "🏅 Perfil Ideal", "🧠 Análisis de Riesgos", "🚦 Alertas y Recomendaciones",
+    "🔍 Diagnóstico Comparativo", "📝 Observaciones y recomendaciones finales", "📚 Referencias y fuentes",
+]
+
+
+def manual_html(sin_clases=False):
+    """HTML con la misma forma que generate_role_profile_by_sections (contenido del stub)."""
+    partes = []
+    for titulo in SECCIONES:
+        contenido = _stub_section(titulo)
+        if sin_clases:  # ejercita los caminos de respaldo por título de sección
+            contenido = re.sub(r' class="(mission-text|function-list|skill-tag)"', "", contenido)
+            contenido = re.sub(r"<th>([^<]*)</th><td>", r"<td>\1: </td><td>", contenido)
+        partes.append(f'<div class="section">\n  <div class="section-title">{titulo}</div>\n  {contenido}\n</div>\n')
+    return "".join(partes)
+
+
+# --- IMPLEMENTACIÓN ANTERIOR (BeautifulSoup, una pasada por campo), como línea base ---
+
+def _find_section_by_title(soup, titles):
+    """
+    Busca una sección por posibles títulos (case-insensitive, lista de variantes).
+    Devuelve el tag de la sección o None.
+    """
+    for section in soup.find_all(class_="section"):
+        title_tag = section.find(class_="section-title")
+        if title_tag:
+            title_text = title_tag.get_text(strip=True).lower()
+            for t in titles:
+                if t.lower() in title_text:
+                    return section
+    return None
+
+def extraer_mision(html):
+    soup = BeautifulSoup(html, "html.parser")
+    # Busca por clase específica primero
+    mission = soup.find(class_="mission-text")
+    if mission:
+        return mission.get_text(strip=True)
+    # Fallback: busca por título de sección
+    section = _find_section_by_title(soup, ["propósito principal", "objetivo del cargo", "misión"])
+    if section:
+        # Busca el primer <div> o <p> después del título
+        for tag in section.find_all(["div", "p"], recursive=False):
+            if tag.get("class") != ["section-title"]:
+                return tag.get_text(strip=True)
+    return ""
+
+def extraer_funciones(html):
+    soup = BeautifulSoup(html, "html.parser")
+    # Busca por clase
+    ul = soup.find("ul", class_="function-list")
+    if ul:
+        return [li.get_text(strip=True) for li in ul.find_all("li")]
+    # Fallback: busca por sección
+    section = _find_section_by_title(soup, ["funciones", "responsabilidades"])
+    if section:
+        items = []
+        for li in section.find_all("li"):
+            items.append(li.get_text(strip=True))
+        if items:
+            return items
+        # Fallback: busca <p> en la sección
+        for p in section.find_all("p"):
+            if p.get_text(strip=True):
+                items.append(p.get_text(strip=True))
+        return items
+    return []
+
+def extraer_educacion(html):
+    soup = BeautifulSoup(html, "html.parser")
+    # Busca por tabla
+    for th in soup.find_all("th"):
+        if "educativo" in th.get_text(strip=True).lower():
+            td = th.find_next_sibling("td")
+            if td:
+                return td.get_text(strip=True)
+    # Fallback: busca por sección
+    section = _find_section_by_title(soup, ["perfil", "educación"])
+    if section:
+        text = section.get_text(separator=" ", strip=True)
+        match = re.search(r"nivel educativo[:\-]?\s*(.+?)(?:\s{2,}|$)", text, re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+    return ""
+
+def extraer_experiencia(html):
+    soup = BeautifulSoup(html, "html.parser")
+    for th in soup.find_all("th"):
+        if "experiencia" in th.get_text(strip=True).lower():
+            td = th.find_next_sibling("td")
+            if td:
+                return td.get_text(strip=True)
+    section = _find_section_by_title(soup, ["perfil", "experiencia"])
+    if section:
+        text = section.get_text(separator=" ", strip=True)
+        match = re.search(r"experiencia requerida[:\-]?\s*(.+?)(?:\s{2,}|$)", text, re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+    return ""
+
+def extraer_conocimientos(html):
+    soup = BeautifulSoup(html, "html.parser")
+    for th in soup.find_all("th"):
+        if "conocimientos" in th.get_text(strip=True).lower():
+            td = th.find_next_sibling("td")
+            if td:
+                # Busca <ul> o lista dentro del td
+                ul = td.find("ul")
+                if ul:
+                    return [li.get_text(strip=True) for li in ul.find_all("li")]
+                # Si no hay lista, devuelve el texto plano
+                return [td.get_text(strip=True)]
+    section = _find_section_by_title(soup, ["perfil", "conocimientos"])
+    if section:
+        items = []
+        for li in section.find_all("li"):
+            items.append(li.get_text(strip=True))
+        if items:
+            return items
+        # Fallback: busca <p>
+        for p in section.find_all("p"):
+            if p.get_text(strip=True):
+                items.append(p.get_text(strip=True))
+        return items
+    return []
+
+def extraer_idiomas(html):
+    soup = BeautifulSoup(html, "html.parser")
+    for th in soup.find_all("th"):
+        if "idioma" in th.get_text(strip=True).lower():
+            td = th.find_next_sibling("td")
+            if td:
+                return td.get_text(strip=True)
+    section = _find_section_by_title(soup, ["idioma", "idiomas"])
+    if section:
+        text = section.get_text(separator=" ", strip=True)
+        match = re.search(r"idiomas?[:\-]?\s*(.+?)(?:\s{2,}|$)", text, re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+    return ""
+
+def extraer_competencias(html):
+    soup = BeautifulSoup(html, "html.parser")
+    # Busca por clase
+    tags = soup.find_all(class_="skill-tag")
+    if tags:
+        return [tag.get_text(strip=True) for tag in tags]
+    # Fallback: busca por sección
+    section = _find_section_by_title(soup, ["competencias", "habilidades"])
+    if section:
+        items = []
+        for li in section.find_all("li"):
+            items.append(li.get_text(strip=True))
+        if items:
+            return items
+        # Fallback: busca <p>
+        for p in section.find_all("p"):
+            if p.get_text(strip=True):
+                items.append(p.get_text(strip=True))
+        return items
+    return []
+
+def extraer_kpis(html):
+    soup = BeautifulSoup(html, "html.parser")
+    # Busca la tabla de KPIs
+    for section in soup.find_all(class_="section"):
+        title_tag = section.find(class_="section-title")
+        if title_tag and ("kpi" in title_tag.get_text(strip=True).lower() or "indicador" in title_tag.get_text(strip=True).lower()):
+            table = section.find("table")
+            if table:
+                kpis = []
+                for row in table.find_all("tr")[1:]:  # omite encabezado
+                    cols = row.find_all("td")
+                    if len(cols) >= 3:
+                        kpis.append({
+                            "nombre": cols[0].get_text(strip=True),
+                            "frecuencia": cols[1].get_text(strip=True),
+                            "meta": cols[2].get_text(strip=True)
+                        })
+                return kpis
+    return []
+
+
+ANTERIORES = {
+    "mision": extraer_mision, "funciones": extraer_funciones, "educacion": extraer_educacion,
+    "experiencia": extraer_experiencia, "conocimientos": extraer_conocimientos, "idiomas": extraer_idiomas,
+    "competencias": extraer_competencias, "kpis": extraer_kpis,
+}
+
+
+def extraer_anterior(html):
+    return {campo: ANTERIORES[campo](html) for campo in MANUAL_FIELDS}
+
+
+def medir(funcion, html, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(html)
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+    for nombre, html in [("con clases", manual_html()), ("respaldo por sección", manual_html(sin_clases=True))]:
+        anterior, nuevo = extraer_anterior(html), extraer_manual(html)
+        distintos = [c for c in MANUAL_FIELDS if anterior[c] != nuevo[c]]
+        t_anterior = medir(extraer_anterior, html, args.repeticiones)
+        t_nuevo = medir(extraer_manual, html, args.repeticiones)
+        print(f"{nombre:22s} {len(html):6d} B  anterior {t_anterior:7.2f} ms  una pasada {t_nuevo:6.2f} ms  "
+              f"x{t_anterior / t_nuevo:4.1f}  " + ("resultados idénticos" if not distintos else f"DIFIEREN: {distintos}"))
+
+
+if __name__ == "__main__":
+    main()
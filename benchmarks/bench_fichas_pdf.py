@@ -0,0 +1,45 @@
+"""
+Rendimiento de la exportación rápida de texto (FPDF): fichas de empleados sintéticos en un
+solo PDF, en páginas por minuto.
+
+Uso:
+    python benchmarks/bench_fichas_pdf.py --empleados 500 2000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+from PyPDF2 import PdfReader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.pdf_generator import export_fichas_pdf, FICHA_CAMPOS  # noqa: E402
+
+
+def fichas_sinteticas(n):
+    df = pd.DataFrame({col: [f"{etiqueta} {i}" for i in range(n)] for col, etiqueta in FICHA_CAMPOS})
+    df["NOMBRE COMPLETO"] = [f"Empleado {i}" for i in range(n)]
+    df.loc[::10, "DIRECCIÓN DE RESIDENCIA"] = "Carrera 45 # 12-34, barrio Los Almendros, apartamento 501 " * 3
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--empleados", type=int, nargs="+", default=[500, 2000])
+    args = parser.parse_args()
+
+    print(f"{'empleados':>9} {'páginas':>8} {'tiempo':>9} {'pág/min':>9} {'PDF':>9}")
+    for n in args.empleados:
+        df = fichas_sinteticas(n)
+        inicio = time.perf_counter()
+        pdf = export_fichas_pdf(df)
+        segundos = time.perf_counter() - inicio
+        paginas = len(PdfReader(io.BytesIO(pdf)).pages)
+        print(f"{n:9d} {paginas:8d} {segundos:7.2f} s {paginas / segundos * 60:9.0f} {len(pdf) / 1024:7.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Construcción del organigrama por cargos: el código anterior de la página (groupby con lambda
+mode(), iterrows y formato recursivo, en cada rerun) frente a modules.org_model (moda
+vectorizada, recorrido iterativo) y frente a un rerun con el modelo ya en caché (solo la huella).
+Verifica además que la opción de ECharts sea idéntica.
+
+Uso:
+    python benchmarks/bench_org_model.py --tamanos 100 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.org_model import (  # noqa: E402
+    OrgModel, get_org_model, fingerprint_empleados, wrap_text_node, color_por_departamento
+)
+
+DEPARTAMENTOS = ["ADMINISTRATIVO", "OPERATIVO", "FINANZAS", "COMERCIAL", "RRHH", "TECNOLOGÍA"]
+
+
+def plantilla_sintetica(n, seed=0):
+    """n empleados en ~n/10 cargos; cada cargo reporta a un empleado de un cargo anterior."""
+    rng = np.random.default_rng(seed)
+    n_cargos = max(3, n // 10)
+    cargo_ids = np.sort(rng.integers(0, n_cargos, n))
+    nombres = [f"Empleado {i}" for i in range(n)]
+    primero = {c: i for i, c in reversed(list(enumerate(cargo_ids)))}
+    jefes = []
+    for c in cargo_ids:
+        if c == cargo_ids[0]:
+            jefes.append("")
+        else:
+            jefe_cargo = rng.integers(0, c)
+            jefes.append(nombres[primero.get(jefe_cargo, 0)])
+    return pd.DataFrame({
+        "NOMBRE COMPLETO": nombres,
+        "CARGO": [f"Cargo {c}" for c in cargo_ids],
+        "DEPARTAMENTO": [DEPARTAMENTOS[c % len(DEPARTAMENTOS)] for c in cargo_ids],
+        "CORREO": [f"empleado{i}@servinet.co" for i in range(n)],
+        "CELULAR": rng.integers(3000000000, 3999999999, n),
+        "JEFE_DIRECTO": jefes,
+    })
+
+
+def opcion_anterior(df):
+    """Código anterior de pages/1_📊_Organigrama.py (solo la serie de datos)."""
+    df_cargos = (
+        df.groupby(["CARGO", "DEPARTAMENTO"], as_index=False)
+        .agg(
+            NOMBRE_COMPLETO=("NOMBRE COMPLETO", list),
+            CORREO=("CORREO", list),
+            CELULAR=("CELULAR", list),
+            JEFE_DIRECTO_CARGO=("JEFE_DIRECTO", lambda x: x.mode()[0] if not x.mode().empty else None)
+        )
+    )
+    nombre_a_cargo = df.set_index('NOMBRE COMPLETO')['CARGO'].to_dict()
+    df_cargos['PARENT_CARGO'] = df_cargos['JEFE_DIRECTO_CARGO'].map(nombre_a_cargo)
+    nodes = {row['CARGO']: {"name": row['CARGO'], "data": row.to_dict(), "children": []} for _, row in df_cargos.iterrows()}
+    forest = []
+    for cargo, node in nodes.items():
+        parent_cargo = node['data'].get('PARENT_CARGO')
+        if parent_cargo and parent_cargo in nodes and parent_cargo != cargo:
+            nodes[parent_cargo]['children'].append(node)
+        else:
+            forest.append(node)
+    tree_data = {"name": "SERVINET", "data": {"CARGO": "SERVINET", "DEPARTAMENTO": "DIRECCIÓN", "NOMBRE_COMPLETO": []}, "children": forest} if len(forest) > 1 else (forest[0] if forest else {})
+
+    def format_node_for_echarts(node):
+        data = node['data']
+        cargo, depto, empleados = data.get('CARGO', 'N/A'), data.get('DEPARTAMENTO', 'OTROS'), data.get('NOMBRE_COMPLETO', [])
+        formatted_label = f"{{title|{wrap_text_node(cargo, 18)}}}\n{{hr|}}\n{{subtitle|{len(empleados)} Personas}}"
+        return {
+            "name": formatted_label, "value": len(empleados),
+            "itemStyle": {"color": color_por_departamento(depto), "borderColor": "#3b82f6", "borderWidth": 1.5, "borderRadius": 12, "shadowBlur": 10, "shadowColor": "rgba(0,0,0,0.08)"},
+            "tooltip_info": {
+                "cargo": cargo, "departamento": depto,
+                "empleados": [{"nombre": n, "correo": c, "celular": cel} for n, c, cel in zip(empleados, data.get('CORREO', []), data.get('CELULAR', []))]
+            },
+            "children": [format_node_for_echarts(child) for child in node.get('children', [])]
+        }
+    return format_node_for_echarts(tree_data)
+
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'empleados':>9} {'anterior':>11} {'org_model':>11} {'en caché':>10}")
+    for n in args.tamanos:
+        df = plantilla_sintetica(n)
+        anterior, t_anterior = cronometrar(opcion_anterior, df)
+        modelo, t_nuevo = cronometrar(lambda d: OrgModel(d, fingerprint_empleados(d)), df)
+        assert modelo.opcion["series"][0]["data"][0] == anterior, "el organigrama difiere del anterior"
+        get_org_model(df)
+        _, t_cache = cronometrar(get_org_model, df)
+        print(f"{n:9d} {t_anterior:9.1f}ms {t_nuevo:9.1f}ms {t_cache:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Escalamiento del organigrama master con plantillas sintéticas (100, 1k y 10k empleados).
+
+Mide la agrupación anterior (iterrows + búsqueda lineal del cargo) frente a agrupar_organigrama
+(groupby), el llenado de la plantilla, y con --pdf el render completo por modo
+("unico", "paginas", "por_departamento") con tiempo y memoria pico (cada caso en un proceso nuevo).
+
+Uso:
+    python benchmarks/bench_organigrama.py --tamanos 100 1000 10000
+    python benchmarks/bench_organigrama.py --tamanos 1000 5000 --pdf
+"""
+import argparse
+import os
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEPARTAMENTOS = ["ADMINISTRATIVO", "OPERATIVO", "FINANZAS", "COMERCIAL", "RRHH", "TECNOLOGÍA",
+                 "LOGÍSTICA", "DIRECCIÓN", "JURÍDICO", "MARKETING"]
+
+
+def plantilla_sintetica(n, seed=0):
+    """n empleados repartidos en 10 departamentos y ~n/20 cargos."""
+    rng = np.random.default_rng(seed)
+    n_cargos = max(5, n // 20)
+    cargo_ids = rng.integers(0, n_cargos, n)
+    return pd.DataFrame({
+        "NOMBRE COMPLETO": [f"Empleado {i}" for i in range(n)],
+        "DEPARTAMENTO": [DEPARTAMENTOS[c % len(DEPARTAMENTOS)] for c in cargo_ids],
+        "CARGO": [f"Cargo {c}" for c in cargo_ids],
+        "CORREO": [f"empleado{i}@servinet.co" for i in range(n)],
+        "CELULAR": rng.integers(3000000000, 3999999999, n).astype(str),
+        "SEDE": rng.choice(["Bogotá", "Medellín", "Cali"], n),
+        "MODALIDAD": rng.choice(["Oficina", "Remoto"], n),
+    })
+
+
+def agrupar_anterior(df_empleados):
+    """Implementación anterior de export_organigrama_pdf_master, como línea base."""
+    data_grouped = {}
+    for _, row in df_empleados.iterrows():
+        depto = row.get("DEPARTAMENTO", "OTROS")
+        cargo = row.get("CARGO", "Sin Cargo")
+        if depto not in data_grouped:
+            data_grouped[depto] = []
+        cargo_entry = next((c for c in data_grouped[depto] if c["cargo"] == cargo), None)
+        emp_dict = {
+            "nombre": row.get("NOMBRE COMPLETO", ""),
+            "email": row.get("CORREO", ""),
+            "telefono": row.get("CELULAR", ""),
+            "ubicacion": row.get("SEDE", ""),
+            "modalidad": row.get("MODALIDAD", "Oficina"),
+            "foto_url": row.get("FOTO_URL", ""),
+        }
+        if cargo_entry:
+            cargo_entry["empleados"].append(emp_dict)
+        else:
+            data_grouped[depto].append({
+                "cargo": cargo,
+                "descripcion": row.get("DESCRIPCION_CARGO", ""),
+                "empleados": [emp_dict]
+            })
+    return data_grouped
+
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def caso_pdf(n, modo):
+    """Se ejecuta en un proceso nuevo: render completo sin caché. Retorna (ms, MB pico, bytes)."""
+    import resource
+    os.environ["SERVINET_CACHE_DIR"] = os.path.join("/tmp", f"bench_organigrama_{os.getpid()}")
+    from modules.pdf_generator import export_organigrama_pdf_master
+    pdf, ms = cronometrar(lambda: export_organigrama_pdf_master(plantilla_sintetica(n), "Benchmark", modo=modo))
+    return ms, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, len(pdf)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--pdf", action="store_true", help="Incluye el render con WeasyPrint por modo")
+    args = parser.parse_args()
+
+    from modules.pdf_generator import agrupar_organigrama, render_template_html, _organigrama_master_render_args
+
+    print(f"{'empleados':>9} {'anterior':>11} {'groupby':>10} {'plantilla':>10}")
+    for n in args.tamanos:
+        df = plantilla_sintetica(n)
+        anterior, t_anterior = cronometrar(agrupar_anterior, df)
+        nuevo, t_nuevo = cronometrar(agrupar_organigrama, df)
+        assert repr(anterior) == repr(nuevo), "la agrupación difiere de la anterior"
+        name, contexto = _organigrama_master_render_args(df, "Benchmark")
+        html, t_html = cronometrar(lambda: render_template_html(name, **contexto))
+        print(f"{n:9d} {t_anterior:9.1f}ms {t_nuevo:8.1f}ms {t_html:8.1f}ms  ({len(html) / 1024:.0f} KB de HTML)")
+
+    if args.pdf:
+        print(f"\n{'empleados':>9} {'modo':>17} {'tiempo':>10} {'RSS pico':>10} {'PDF':>9}")
+        contexto_spawn = multiprocessing.get_context("spawn")
+        for n in args.tamanos:
+            for modo in ("unico", "paginas", "por_departamento"):
+                with ProcessPoolExecutor(max_workers=1, mp_context=contexto_spawn) as pool:
+                    ms, mb, size = pool.submit(caso_pdf, n, modo).result()
+                print(f"{n:9d} {modo:>17} {ms / 1000:8.1f} s {mb:8.0f}MB {size / 1024:7.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Tamaño de la opción de ECharts que viaja al navegador: organigrama completo (todos los cargos
+con la lista de empleados del tooltip) frente a la vista ligera, al abrir la página y tras
+expandir el camino hasta el cargo más profundo. Para el organigrama por personas compara todas
+las personas abiertas con la vista inicial y con la búsqueda de la persona más profunda.
+
+Uso:
+    python benchmarks/bench_organigrama_payload.py --tamanos 100 1000 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_org_model import plantilla_sintetica  # noqa: E402
+from modules.org_model import OrgModel, PersonOrgModel  # noqa: E402
+
+
+def medir(funcion):
+    inicio = time.perf_counter()
+    opcion = funcion()
+    ms = (time.perf_counter() - inicio) * 1000
+    return len(json.dumps(opcion, ensure_ascii=False).encode("utf-8")), ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'empleados':>9} {'cargos':>7} {'completo':>10} {'ligero':>18} {'camino abierto':>18}")
+    for n in args.tamanos:
+        modelo = OrgModel(plantilla_sintetica(n), None)
+        completo, _ = medir(lambda: modelo.opcion)
+        ligero, t_ligero = medir(modelo.opcion_ligera)
+        profundo = max(range(len(modelo.nodos)), key=modelo.nivel.__getitem__)
+        camino, i = set(), modelo.padre[profundo]
+        while i >= 0:
+            camino.add(i)
+            i = modelo.padre[i]
+        abierto, t_abierto = medir(lambda: modelo.opcion_ligera(camino))
+        print(f"{n:9d} {len(modelo.nodos):7d} {completo / 1024:8.0f}KB "
+              f"{ligero / 1024:6.1f}KB ({t_ligero:5.1f}ms) {abierto / 1024:6.1f}KB ({t_abierto:5.1f}ms)")
+
+    print(f"\n{'empleados':>9} {'por personas: todo abierto':>27} {'inicial':>18} {'búsqueda':>18}")
+    for n in args.tamanos:
+        personas = PersonOrgModel(plantilla_sintetica(n), None)
+        todo = {f"p:{i}" for i in range(len(personas))}
+        todo |= {f"g:{padre}:{depto}" for padre, grupos in personas.grupos.items() for depto in grupos}
+        completo, t_completo = medir(lambda: personas.opcion(todo))
+        inicial, t_inicial = medir(lambda: personas.opcion(personas.iniciales()))
+        profunda = int(personas.jerarquia.profundidad.argmax())
+        busqueda, t_busqueda = medir(lambda: personas.opcion(personas.iniciales() | personas.camino(profunda), profunda))
+        print(f"{n:9d} {completo / 1024:16.0f}KB ({t_completo:5.0f}ms) {inicial / 1024:6.1f}KB ({t_inicial:5.1f}ms) "
+              f"{busqueda / 1024:6.1f}KB ({t_busqueda:5.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Tamaño y tiempo de render de los PDFs con la salida anterior (PDF_OPTIMIZE=0) frente a la
+optimizada (PDF_OPTIMIZE=1): manual de funciones y organigrama master.
+
+Cada modo corre en un proceso nuevo con su propia caché vacía, porque PDF_OPTIMIZE y
+SERVINET_CACHE_DIR se leen al importar los módulos. "frío" es el primer render del proceso
+(carga de fuentes e imágenes); "tibio" es un segundo render con HTML distinto (sin acierto de caché).
+
+Uso:
+    python benchmarks/bench_pdf_optimizado.py --empleados 100
+"""
+import argparse
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_extractor import manual_html  # noqa: E402
+from bench_organigrama import plantilla_sintetica  # noqa: E402
+
+
+def caso(empleados):
+    """Se ejecuta en un proceso nuevo. Retorna {documento: (bytes, ms frío, ms tibio)}."""
+    from modules.pdf_generator import build_manual_data, create_manual_pdf_from_template, export_organigrama_pdf_master
+
+    def medir(render):
+        tiempos, pdf = [], None
+        for i in range(2):
+            inicio = time.perf_counter()
+            pdf = render(i)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return len(pdf), tiempos[0], tiempos[1]
+
+    perfil = manual_html()
+    df = plantilla_sintetica(empleados)
+    return {
+        "manual": medir(lambda i: create_manual_pdf_from_template(
+            build_manual_data("Analista de Nómina", "RRHH", perfil, codigo=f"MF-BENCH-{i}"), "Analista de Nómina")),
+        f"organigrama ({empleados})": medir(lambda i: export_organigrama_pdf_master(df, f"Benchmark {i}")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--empleados", type=int, default=100)
+    args = parser.parse_args()
+
+    contexto_spawn = multiprocessing.get_context("spawn")
+    resultados = {}
+    for optimizado in (False, True):
+        # El proceso nuevo hereda el entorno: modo de salida y caché vacía propia.
+        os.environ["PDF_OPTIMIZE"] = "1" if optimizado else "0"
+        os.environ["SERVINET_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench_pdf_")
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto_spawn) as pool:
+            resultados[optimizado] = pool.submit(caso, args.empleados).result()
+
+    print(f"{'documento':>18} {'modo':>10} {'tamaño':>10} {'frío':>9} {'tibio':>9}")
+    for documento in resultados[False]:
+        for optimizado, etiqueta in ((False, "anterior"), (True, "optimizado")):
+            size, frio, tibio = resultados[optimizado][documento]
+            print(f"{documento:>18} {etiqueta:>10} {size / 1024:8.0f}KB {frio:7.0f}ms {tibio:7.0f}ms")
+        antes, despues = resultados[False][documento][0], resultados[True][documento][0]
+        print(f"{'':>18} {'':>10} {(despues - antes) / antes * 100:+8.0f}%")
+
+
+if __name__ == "__main__":
+    main()
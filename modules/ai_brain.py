@@ -1,14 +1,250 @@
 import streamlit as st
-import openai
 import json
 import os
+import re
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from modules.auth import get_secret
+from modules.llm_backend import get_backend, DEFAULT_MODEL, LLMBackendError
 
 # Configuración de la API Key
-api_key = os.environ.get("OPENAI_API_KEY")
-if not api_key and "openai" in st.secrets:
-    api_key = st.secrets["openai"]["api_key"]
+api_key = os.environ.get("OPENAI_API_KEY") or get_secret("api_key", section="openai")
 
-client = openai.OpenAI(api_key=api_key) if api_key else None
+# MEJORA: Backend intercambiable (OpenAI o stub local con LLM_BACKEND=stub)
+backend = get_backend(api_key)
+
+
+class AIServiceError(Exception):
+    """La IA no respondió tras los reintentos, o el circuito está abierto."""
+
+
+class CircuitOpenError(AIServiceError):
+    pass
+
+
+_RETRYABLE_STATUS = {None, 408, 409, 429, 500, 502, 503, 504}
+
+
+def _is_service_failure(status_code):
+    """Fallas que abren el circuito: transporte (sin status), timeout, 429 y 5xx. Los demás 4xx no."""
+    return status_code is None or status_code in (408, 429) or status_code >= 500
+
+
+def _parse_duration(value):
+    """Convierte '1s', '6m0s', '20ms' o '2.5' (segundos) a segundos."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, found = 0.0, False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        found = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if found else None
+
+
+class AIRateLimiter:
+    """
+    Limitador compartido para todas las llamadas de IA del proceso.
+    - Ventana deslizante de requests y tokens por minuto.
+    - Concurrencia adaptativa: se reduce a la mitad ante un 429 y se recupera de a uno con los éxitos.
+    - Respeta los headers retry-after / x-ratelimit-* del proveedor.
+    - Reintentos con backoff exponencial y jitter.
+    - Circuit breaker: tras N fallos consecutivos rechaza de inmediato durante el enfriamiento.
+    """
+
+    def __init__(self, rpm=500, tpm=200000, max_concurrency=8, max_retries=4,
+                 failure_threshold=5, cooldown=30.0, max_wait=120.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._requests = deque()
+        self._tokens = deque()
+        self._tokens_in_window = 0
+        self._blocked_until = 0.0
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._half_open_probe = False
+        self._successes_since_decrease = 0
+
+    # --- Circuito ---
+    @property
+    def circuit_open(self):
+        with self._cond:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.cooldown
+
+    def _check_circuit(self, now):
+        """Rechaza si el circuito está abierto. Retorna True si esta llamada tomó la sonda de verificación."""
+        if self._opened_at is None:
+            return False
+        if now - self._opened_at < self.cooldown:
+            raise CircuitOpenError("Servicio de IA temporalmente no disponible (circuito abierto). Intente en unos segundos.")
+        if self._half_open_probe:
+            raise CircuitOpenError("Servicio de IA en verificación. Intente en unos segundos.")
+        self._half_open_probe = True
+        return True
+
+    def _record_success(self):
+        with self._cond:
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._half_open_probe = False
+            self._successes_since_decrease += 1
+            if self.concurrency < self.max_concurrency and self._successes_since_decrease >= self.concurrency:
+                self.concurrency += 1
+                self._successes_since_decrease = 0
+            self._cond.notify_all()
+
+    def _record_neutral(self):
+        """Error que no indica caída del servicio (4xx, error propio): libera la sonda sin contar falla."""
+        with self._cond:
+            self._half_open_probe = False
+            self._cond.notify_all()
+
+    def _record_failure(self):
+        with self._cond:
+            self._consecutive_failures += 1
+            if self._half_open_probe or self._consecutive_failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._half_open_probe = False
+            self._cond.notify_all()
+
+    # --- Ventanas ---
+    def _prune(self, now):
+        while self._requests and now - self._requests[0] >= 60:
+            self._requests.popleft()
+        while self._tokens and now - self._tokens[0][0] >= 60:
+            self._tokens_in_window -= self._tokens.popleft()[1]
+
+    def _acquire(self, est_tokens):
+        deadline = time.monotonic() + self.max_wait
+        sonda = False  # la sonda se toma una sola vez; mientras espera cupo sigue siendo de esta llamada
+        with self._cond:
+            try:
+                while True:
+                    now = time.monotonic()
+                    if not sonda:
+                        sonda = self._check_circuit(now)
+                    self._prune(now)
+                    if self._inflight >= self.concurrency:
+                        wait = 1.0
+                    elif now < self._blocked_until:
+                        wait = self._blocked_until - now
+                    elif len(self._requests) >= self.rpm:
+                        wait = 60 - (now - self._requests[0])
+                    elif self._tokens and self._tokens_in_window + est_tokens > self.tpm:
+                        wait = 60 - (now - self._tokens[0][0])
+                    else:
+                        self._inflight += 1
+                        self._requests.append(now)
+                        self._tokens.append((now, est_tokens))
+                        self._tokens_in_window += est_tokens
+                        return
+                    if now >= deadline:
+                        raise AIServiceError("Tiempo de espera agotado por límite de tasa de la IA.")
+                    self._cond.wait(max(0.01, min(wait, deadline - now)))
+            except BaseException:
+                if sonda:  # no llegó a llamar al servicio: otra llamada puede tomar la sonda
+                    self._half_open_probe = False
+                    self._cond.notify_all()
+                raise
+
+    def _release(self, est_tokens, real_tokens):
+        with self._cond:
+            self._inflight -= 1
+            if real_tokens and real_tokens != est_tokens:
+                now = time.monotonic()
+                self._tokens.append((now, real_tokens - est_tokens))
+                self._tokens_in_window += real_tokens - est_tokens
+            self._cond.notify_all()
+
+    def _apply_headers(self, headers, rate_limited=False):
+        now = time.monotonic()
+        with self._cond:
+            limit_req = headers.get("x-ratelimit-limit-requests")
+            limit_tok = headers.get("x-ratelimit-limit-tokens")
+            if limit_req and str(limit_req).isdigit():
+                self.rpm = int(limit_req)
+            if limit_tok and str(limit_tok).isdigit():
+                self.tpm = int(limit_tok)
+            wait = None
+            retry_ms = headers.get("retry-after-ms")
+            if retry_ms is not None:
+                wait = _parse_duration(retry_ms)
+                wait = wait / 1000.0 if wait is not None else None
+            if wait is None:
+                wait = _parse_duration(headers.get("retry-after"))
+            for kind in ("requests", "tokens"):
+                if str(headers.get(f"x-ratelimit-remaining-{kind}", "")).strip() == "0":
+                    reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset is not None:
+                        wait = max(wait or 0, reset)
+            if rate_limited:
+                self.concurrency = max(1, self.concurrency // 2)
+                self._successes_since_decrease = 0
+                if wait is None:
+                    wait = 1.0
+            if wait:
+                self._blocked_until = max(self._blocked_until, now + wait)
+            self._cond.notify_all()
+        return wait
+
+    def call(self, fn, est_tokens=1000):
+        """Ejecuta fn() (que retorna un LLMResult) bajo el limitador, con reintentos."""
+        for attempt in range(self.max_retries + 1):
+            self._acquire(est_tokens)
+            try:
+                result = fn()
+            except LLMBackendError as e:
+                self._release(est_tokens, 0)
+                server_wait = self._apply_headers(e.headers, rate_limited=e.status_code == 429)
+                if _is_service_failure(e.status_code):
+                    self._record_failure()
+                else:
+                    self._record_neutral()
+                if e.status_code not in _RETRYABLE_STATUS or attempt == self.max_retries:
+                    raise AIServiceError(f"La IA no respondió: {e}") from e
+                backoff = min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                time.sleep(max(backoff, server_wait or 0))
+                continue
+            except BaseException:
+                self._release(est_tokens, 0)
+                self._record_neutral()
+                raise
+            self._release(est_tokens, result.total_tokens)
+            self._apply_headers(result.headers)
+            self._record_success()
+            return result
+
+
+limiter = AIRateLimiter(
+    rpm=int(os.environ.get("AI_RPM", 500)),
+    tpm=int(os.environ.get("AI_TPM", 200000)),
+    max_concurrency=int(os.environ.get("AI_MAX_CONCURRENCY", 8)),
+)
+
+
+def _chat(prompt, temperature=None, json_mode=False, model=DEFAULT_MODEL):
+    """Envía un prompt de usuario al backend configurado (vía el limitador) y retorna el texto de respuesta."""
+    messages = [{"role": "user", "content": prompt}]
+    result = limiter.call(
+        lambda: backend.complete(messages, model=model, temperature=temperature, json_mode=json_mode),
+        est_tokens=len(prompt) // 4 + 1000
+    )
+    return result.text
 
 def generate_role_profile_by_sections(cargo, company_context):
     """
@@ -16,7 +252,7 @@ def generate_role_profile_by_sections(cargo, company_context):
     CORREGIDO: Se toma control de la generación del título para evitar que el prompt se filtre.
     NO omitas ninguna sección. Si no tienes información, inventa contenido profesional y genérico para el cargo. Usa SIEMPRE la estructura HTML esperada (clases, listas, tablas, etc.).
     """
-    if not client:
+    if not backend:
         return "⚠️ Error: Falta configurar OPENAI_API_KEY."
 
     secciones = [
@@ -37,9 +273,8 @@ def generate_role_profile_by_sections(cargo, company_context):
     ]
 
     contexto_limitado = company_context[:4000]
-    manual_html = ""
 
-    for titulo_seccion, instruccion in secciones:
+    def generar_seccion(titulo_seccion, instruccion):
         prompt = f"""
 Eres un consultor experto en RRHH para Servinet, una empresa de telecomunicaciones.
 Contexto de la empresa: {contexto_limitado}
@@ -57,23 +292,25 @@ REGLAS ESTRICTAS:
 - Si no tienes información, genera contenido genérico y profesional para el cargo.
 - NO omitas ninguna sección.
 """
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2
-            )
-            content = response.choices[0].message.content.strip()
-            if not content or len(content) < 10:
-                content = "<p>Información no disponible. Se requiere completar esta sección.</p>"
-        except Exception as e:
-            content = f"<p>Error al generar contenido: {e}</p>"
-        manual_html += f'<div class="section">\n'
-        manual_html += f'  <div class="section-title">{titulo_seccion}</div>\n'
-        manual_html += f'  {content}\n'
-        manual_html += f'</div>\n'
-
-    return manual_html
+        content = _chat(prompt, temperature=0.2).strip()
+        if not content or len(content) < 10:
+            content = "<p>Información no disponible. Se requiere completar esta sección.</p>"
+        return (
+            f'<div class="section">\n'
+            f'  <div class="section-title">{titulo_seccion}</div>\n'
+            f'  {content}\n'
+            f'</div>\n'
+        )
+
+    # MEJORA: Secciones en paralelo bajo el limitador compartido. Si una falla tras los
+    # reintentos (o el circuito está abierto) se lanza AIServiceError en lugar de
+    # incrustar el error dentro del PDF.
+    executor = ThreadPoolExecutor(max_workers=limiter.max_concurrency)
+    try:
+        futures = [executor.submit(generar_seccion, t, i) for t, i in secciones]
+        return "".join(f.result() for f in futures)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 # --- El resto de las funciones se mantienen intactas ---
 
@@ -81,7 +318,7 @@ def generate_evaluation(cargo, company_context):
     """
     Crea una super evaluación de desempeño (mínimo 30 preguntas, selección múltiple/Likert).
     """
-    if not client: return {}
+    if not backend: return {}
 
     prompt = f"""
 Eres experto en psicometría y recursos humanos. Basado en los manuales y contexto de Servinet, diseña una evaluación de desempeño para el cargo "{cargo}".
@@ -104,12 +341,7 @@ NO incluyas preguntas abiertas. Haz las preguntas claras, variadas y relevantes
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
-        return json.loads(response.choices[0].message.content)
+        return json.loads(_chat(prompt, json_mode=True))
     except Exception as e:
         st.error(f"Error generando evaluación: {e}")
         return {"preguntas": []}
@@ -119,7 +351,7 @@ def analyze_results(respuestas_json):
     Analiza las respuestas del empleado.
     Modelo: gpt-4o-mini
     """
-    if not client: return "Error de configuración."
+    if not backend: return "Error de configuración."
 
     prompt = f"""
     Analiza estos resultados de evaluación de desempeño de un empleado de Servinet:
@@ -133,11 +365,7 @@ def analyze_results(respuestas_json):
     """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", # <--- MODELO ECONÓMICO
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content
+        return _chat(prompt)
     except Exception as e:
         return f"Error analizando resultados: {e}"
 
@@ -146,7 +374,7 @@ def analyze_clima_laboral(respuestas_list):
     Analiza los resultados de clima laboral de un grupo de empleados.
     Usa GPT para generar un reporte ejecutivo, fortalezas, debilidades y plan de acción.
     """
-    if not client:
+    if not backend:
         return "Error de configuración de IA."
 
     prompt = f"""
@@ -164,21 +392,41 @@ Sé claro, profesional y orientado a la mejora continua.
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content
+        return _chat(prompt)
     except Exception as e:
         return f"Error analizando clima laboral: {e}"
 
+def describe_cargo(cargo, departamento):
+    """
+    Describe en una línea el propósito de un cargo (usado en el PDF del organigrama).
+    """
+    if not backend:
+        return "Descripción no generada."
+    prompt = f"Describe brevemente en una línea el propósito del cargo '{cargo}' en el departamento '{departamento}' para una empresa de telecomunicaciones."
+    try:
+        return _chat(prompt, temperature=0.2).strip()
+    except Exception as e:
+        return f"Error IA: {e}"
+
+def summarize_organigrama(cargos):
+    """
+    Resume el organigrama en un párrafo ejecutivo a partir de la lista de cargos.
+    """
+    if not backend:
+        return "Análisis no disponible."
+    prompt = f"Eres consultor senior en RRHH. Resume el organigrama de SERVINET en un párrafo ejecutivo (máximo 7 líneas), basado en estos cargos: {list(cargos)}. Resalta la estructura y distribución de roles."
+    try:
+        return _chat(prompt, temperature=0.2).strip()
+    except Exception as e:
+        return f"Error IA: {e}"
+
 # La función generate_role_profile original ya no es necesaria si usas la de secciones,
 # pero la dejamos por si la usas en otro lado.
 def generate_role_profile(cargo, company_context, force=False):
     """
     Crea el Manual de Funciones personalizado, ahora mucho más completo y analítico.
     """
-    if not client:
+    if not backend:
         return "⚠️ Error: Falta configurar OPENAI_API_KEY."
 
     prompt = f"""
@@ -213,12 +461,7 @@ def generate_role_profile(cargo, company_context, force=False):
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2
-        )
-        content = response.choices[0].message.content
+        content = _chat(prompt, temperature=0.2)
         return content.replace("```html", "").replace("```", "")
     except Exception as e:
         return f"Error generando perfil: {e}"
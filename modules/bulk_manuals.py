@@ -0,0 +1,296 @@
+import os
+import time
+import queue
+import uuid
+import hashlib
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from modules.ai_brain import generate_role_profile_by_sections, backend, AIServiceError
+from modules.pdf_generator import build_manual_data, submit_render, wait_render, RENDER_WORKERS
+from modules.drive_manager import (
+    get_drive_service, get_drive_index, list_all_files, upload_pdf_to_drive, manual_filename,
+    set_files_public, FILE_FIELDS, FOLDER_MIME, ORGANIGRAMA_FILENAME
+)
+from modules.cache_store import cache_path, read_json, write_json, atomic_write, read_text, file_lock
+
+# Generación masiva de manuales de funciones para todos los cargos de BD EMPLEADOS.
+# Etapas en tubería, cada una con su propio paralelismo acotado:
+#   1. generación (IA)           -> BULK_GEN_WORKERS hilos
+#   2. plantilla + PDF           -> servicio de render en procesos (RENDER_WORKERS)
+#   3. subida a Drive            -> BULK_UPLOAD_WORKERS hilos
+# Cada cargo avanza a la siguiente etapa apenas termina la anterior. El avance se guarda en
+# .cache/bulk_manuals/checkpoint.json (y el HTML generado en .cache/bulk_manuals/html), así
+# que una corrida interrumpida retoma sin volver a pagar la generación de lo ya generado.
+# El checkpoint se comparte entre procesos: cada escritura relee y fusiona bajo
+# file_lock("bulk_manuals"), y la corrida que lo usa deja su "dueno" con un latido. Otra corrida
+# no arranca mientras ese latido tenga menos de BULK_OWNER_STALE_S segundos.
+
+BULK_GEN_WORKERS = int(os.environ.get("BULK_GEN_WORKERS", 2))
+BULK_UPLOAD_WORKERS = int(os.environ.get("BULK_UPLOAD_WORKERS", 2))
+MANUAL_MAX_AGE_DAYS = int(os.environ.get("MANUAL_MAX_AGE_DAYS", 365))
+BULK_OWNER_STALE_S = int(os.environ.get("BULK_OWNER_STALE_S", 900))
+CHECKPOINT_PATH = ("bulk_manuals", "checkpoint.json")
+
+
+class BulkRunBusyError(RuntimeError):
+    """Otra corrida inconclusa (en este u otro proceso) tiene el checkpoint."""
+
+def _parse_drive_time(value):
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def _folder_files(folder_id):
+    """Archivos de la carpeta de la app, desde el índice local si la cubre."""
+    index = get_drive_index()
+    if index and index.contains(folder_id):
+        return index.children(folder_id)
+    service = get_drive_service()
+    if not service:
+        return []
+    query = f"'{folder_id}' in parents and trashed = false"
+    return list(list_all_files(service, query, FILE_FIELDS))
+
+def plan_bulk_manuals(df_empleados, folder_id):
+    """
+    Cargos de BD EMPLEADOS sin manual o con manual desactualizado.
+    Un manual está desactualizado si es más antiguo que el documento fuente más reciente de la
+    carpeta (manuales/estructura que alimentan la IA) o que MANUAL_MAX_AGE_DAYS.
+    Retorna una lista de dicts {cargo, departamento, motivo, manual_id}.
+    """
+    if df_empleados.empty or "CARGO" not in df_empleados.columns:
+        return []
+    cargos = df_empleados[df_empleados["CARGO"].astype(str).str.strip() != ""]
+    if "DEPARTAMENTO" in cargos.columns:
+        deptos = cargos.groupby("CARGO")["DEPARTAMENTO"].agg(lambda s: s.mode().iloc[0] if not s.mode().empty else "")
+    else:
+        deptos = {c: "" for c in cargos["CARGO"].unique()}
+
+    files = [f for f in _folder_files(folder_id) if f.get("mimeType") != FOLDER_MIME]
+    generados = {manual_filename(c) for c in deptos.keys()} | {ORGANIGRAMA_FILENAME}
+    manuales = {}
+    for f in files:  # children() ya viene del más reciente al más antiguo
+        if f["name"] in generados:
+            manuales.setdefault(f["name"], f)
+    fuentes = [
+        f.get("modifiedTime", "") for f in files
+        if f["name"] not in generados and ("manual" in f["name"].lower() or "estructura" in f["name"].lower())
+    ]
+    fuente_mas_reciente = max(fuentes, default="")
+    limite_edad = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=MANUAL_MAX_AGE_DAYS)
+
+    plan = []
+    for cargo in sorted(deptos.keys()):
+        manual = manuales.get(manual_filename(cargo))
+        if manual is None:
+            motivo = "sin_manual"
+        elif manual.get("modifiedTime", "") < fuente_mas_reciente:
+            motivo = "fuente_actualizada"
+        elif manual.get("modifiedTime") and _parse_drive_time(manual["modifiedTime"]) < limite_edad:
+            motivo = "antiguo"
+        else:
+            continue
+        plan.append({
+            "cargo": cargo,
+            "departamento": deptos[cargo],
+            "motivo": motivo,
+            "manual_id": manual["id"] if manual else None,
+        })
+    return plan
+
+def _html_path(cargo):
+    return cache_path("bulk_manuals", "html", hashlib.sha1(cargo.encode("utf-8")).hexdigest()[:16] + ".html")
+
+def _dueno_vivo(checkpoint):
+    dueno = (checkpoint or {}).get("dueno")
+    return bool(dueno) and not checkpoint.get("finalizado") and time.time() - dueno.get("latido", 0) < BULK_OWNER_STALE_S
+
+def _load_checkpoint(context_hash, dueno_id):
+    """
+    Toma el checkpoint para esta corrida: el de una corrida inconclusa con el mismo contexto, o
+    uno nuevo. Lanza BulkRunBusyError si otra corrida inconclusa lo tiene con latido reciente;
+    una corrida caída (sin latido) se retoma o se reemplaza.
+    """
+    with file_lock("bulk_manuals"):
+        checkpoint = read_json(cache_path(*CHECKPOINT_PATH))
+        if _dueno_vivo(checkpoint):
+            raise BulkRunBusyError(
+                f"Hay otra generación masiva en curso (iniciada {checkpoint['dueno'].get('inicio', '?')}). "
+                "Espera a que termine."
+            )
+        reanudado = bool(checkpoint) and not checkpoint.get("finalizado") and checkpoint.get("contexto") == context_hash
+        if not reanudado:
+            checkpoint = {"contexto": context_hash, "creado": datetime.datetime.now().isoformat(timespec="seconds"),
+                          "finalizado": False, "items": {}}
+        checkpoint["dueno"] = {"id": dueno_id, "pid": os.getpid(), "latido": time.time(),
+                               "inicio": datetime.datetime.now().isoformat(timespec="seconds")}
+        write_json(cache_path(*CHECKPOINT_PATH), checkpoint)
+    return checkpoint, reanudado
+
+def _actualizar_checkpoint(dueno_id, cambios=None, **campos):
+    """
+    Lee, fusiona y escribe el checkpoint bajo file_lock: `cambios` es {cargo: {campo: valor}} y
+    `campos` va a la raíz. Renueva el latido del dueño. Si otra corrida tomó el checkpoint (la
+    nuestra se dio por caída), no lo pisa y retorna False.
+    """
+    with file_lock("bulk_manuals"):
+        checkpoint = read_json(cache_path(*CHECKPOINT_PATH))
+        if not checkpoint or (checkpoint.get("dueno") or {}).get("id") != dueno_id:
+            return False
+        items = checkpoint.setdefault("items", {})
+        for cargo, valores in (cambios or {}).items():
+            items.setdefault(cargo, {"estado": "pendiente"}).update(valores)
+        checkpoint.update(campos)
+        if checkpoint.get("dueno"):
+            checkpoint["dueno"]["latido"] = time.time()
+        write_json(cache_path(*CHECKPOINT_PATH), checkpoint)
+    return True
+
+def run_bulk_manuals(plan, folder_id, company_context, on_progress=None,
+                     gen_workers=BULK_GEN_WORKERS, upload_workers=BULK_UPLOAD_WORKERS):
+    """
+    Ejecuta la tubería para los cargos de `plan` (ver plan_bulk_manuals).
+    on_progress(evento, resumen) se llama en el hilo que invoca (seguro para Streamlit)
+    cada vez que un cargo termina una etapa o falla.
+    Retorna el resumen: totales por estado, fallos, tiempos medios por etapa y duración.
+    Lanza BulkRunBusyError si otra corrida inconclusa está usando el checkpoint.
+    """
+    if not backend:
+        raise AIServiceError("Falta configurar OPENAI_API_KEY.")
+    context_hash = hashlib.sha1(company_context.encode("utf-8")).hexdigest()[:16]
+    dueno_id = uuid.uuid4().hex
+    checkpoint, reanudado = _load_checkpoint(context_hash, dueno_id)
+    try:
+        return _ejecutar(plan, folder_id, company_context, on_progress, gen_workers, upload_workers,
+                         checkpoint, reanudado, dueno_id)
+    finally:
+        _actualizar_checkpoint(dueno_id, dueno=None)  # libera el checkpoint aunque la corrida falle
+
+def _ejecutar(plan, folder_id, company_context, on_progress, gen_workers, upload_workers,
+              checkpoint, reanudado, dueno_id):
+    items = checkpoint["items"]
+    ck_lock = threading.Lock()
+    eventos = queue.Queue()
+    tiempos = {"generacion": [], "render": [], "subida": []}
+    year = datetime.datetime.now().year
+
+    def guardar(cargo, **cambios):
+        with ck_lock:
+            items.setdefault(cargo, {"estado": "pendiente"}).update(cambios)
+            _actualizar_checkpoint(dueno_id, {cargo: cambios})
+
+    def fallar(item, etapa, e):
+        guardar(item["cargo"], estado="error", etapa=etapa, error=f"{type(e).__name__}: {e}")
+        eventos.put({"cargo": item["cargo"], "etapa": etapa, "estado": "error", "error": str(e)})
+
+    gen_pool = ThreadPoolExecutor(max_workers=gen_workers, thread_name_prefix="bulk-gen")
+    render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="bulk-render")
+    upload_pool = ThreadPoolExecutor(max_workers=upload_workers, thread_name_prefix="bulk-upload")
+    # Contrapresión: como máximo estos PDFs en memoria esperando subida.
+    en_vuelo = threading.BoundedSemaphore(RENDER_WORKERS + 2 * upload_workers)
+
+    def etapa_subida(item, pdf):
+        try:
+            inicio = time.monotonic()
+            # upload_pdf_to_drive (no upload_manual_to_drive, que se traga el error) para que un
+            # fallo quede como error en el checkpoint y se reintente al reanudar.
+            file_id, _ = upload_pdf_to_drive(pdf, manual_filename(item["cargo"]), folder_id)
+            if not file_id:
+                raise RuntimeError("Drive no está disponible.")
+            tiempos["subida"].append(time.monotonic() - inicio)
+            guardar(item["cargo"], estado="subido", file_id=file_id, error=None)
+            eventos.put({"cargo": item["cargo"], "etapa": "subida", "estado": "subido", "file_id": file_id})
+        except Exception as e:
+            fallar(item, "subida", e)
+        finally:
+            en_vuelo.release()
+
+    def etapa_render(item, perfil_html):
+        en_vuelo.acquire()
+        try:
+            inicio = time.monotonic()
+            datos = build_manual_data(
+                item["cargo"], item["departamento"], perfil_html,
+                codigo=f"MF-{hashlib.sha1(item['cargo'].encode('utf-8')).hexdigest()[:6].upper()}-{year}"
+            )
+            pdf = wait_render(submit_render("manual", datos, item["cargo"]))
+            tiempos["render"].append(time.monotonic() - inicio)
+        except Exception as e:
+            en_vuelo.release()
+            fallar(item, "render", e)
+            return
+        eventos.put({"cargo": item["cargo"], "etapa": "render", "estado": "renderizado"})
+        upload_pool.submit(etapa_subida, item, pdf)
+
+    def etapa_generacion(item):
+        try:
+            previo = items.get(item["cargo"], {})
+            perfil_html = read_text(previo["html"]) if previo.get("estado") != "pendiente" and previo.get("html") else None
+            if perfil_html is None:
+                inicio = time.monotonic()
+                perfil_html = generate_role_profile_by_sections(item["cargo"], company_context)
+                tiempos["generacion"].append(time.monotonic() - inicio)
+                path = _html_path(item["cargo"])
+                atomic_write(path, perfil_html)
+                guardar(item["cargo"], estado="generado", html=path, error=None)
+            eventos.put({"cargo": item["cargo"], "etapa": "generacion", "estado": "generado"})
+        except Exception as e:
+            fallar(item, "generacion", e)
+            return
+        render_pool.submit(etapa_render, item, perfil_html)
+
+    inicio_corrida = time.monotonic()
+    pendientes = []
+    omitidos = 0
+    for item in plan:
+        previo = items.get(item["cargo"], {})
+        estado = previo.get("estado")
+        if estado == "subido" and previo.get("file_id"):
+            omitidos += 1
+            continue
+        if estado is None:
+            guardar(item["cargo"], estado="pendiente", departamento=item["departamento"], motivo=item["motivo"])
+        pendientes.append(item)
+
+    resumen = {
+        "total": len(plan), "reanudado": reanudado, "omitidos": omitidos,
+        "generados": 0, "renderizados": 0, "subidos": 0, "fallidos": {},
+    }
+    for item in pendientes:
+        gen_pool.submit(etapa_generacion, item)
+
+    terminados = 0
+    subidos = []
+    while terminados < len(pendientes):
+        try:
+            evento = eventos.get(timeout=BULK_OWNER_STALE_S / 3)
+        except queue.Empty:
+            _actualizar_checkpoint(dueno_id)  # latido: una generación lenta no es una corrida caída
+            continue
+        if evento["estado"] == "generado":
+            resumen["generados"] += 1
+        elif evento["estado"] == "renderizado":
+            resumen["renderizados"] += 1
+        elif evento["estado"] == "subido":
+            resumen["subidos"] += 1
+            if evento["file_id"]:
+                subidos.append(evento["file_id"])
+            terminados += 1
+        else:
+            resumen["fallidos"][evento["cargo"]] = f"{evento['etapa']}: {evento['error']}"
+            terminados += 1
+        if on_progress:
+            on_progress(evento, resumen)
+
+    for pool in (gen_pool, render_pool, upload_pool):
+        pool.shutdown(wait=True)
+    if subidos:
+        set_files_public(subidos)
+
+    with ck_lock:
+        checkpoint["finalizado"] = not resumen["fallidos"]
+        _actualizar_checkpoint(dueno_id, finalizado=checkpoint["finalizado"])
+    resumen["duracion_s"] = round(time.monotonic() - inicio_corrida, 1)
+    resumen["tiempo_medio_s"] = {
+        etapa: round(sum(t) / len(t), 2) if t else None for etapa, t in tiempos.items()
+    }
+    return resumen
@@ -0,0 +1,105 @@
+import os
+import glob
+import json
+import tempfile
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows (desarrollo local)
+    fcntl = None
+    import msvcrt
+
+# Directorio de cachés locales compartidas entre sesiones y procesos del servidor.
+# Se puede mover con la variable de entorno SERVINET_CACHE_DIR (por ejemplo a un volumen persistente).
+CACHE_DIR = os.environ.get(
+    "SERVINET_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+)
+
+def cache_path(*parts):
+    """Ruta dentro del directorio de caché; crea las carpetas intermedias."""
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def atomic_write(path, data):
+    """Escribe bytes o texto de forma atómica (archivo temporal + os.replace)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def read_text(path):
+    """Lee un archivo de texto de la caché. Retorna None si no existe."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def read_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+def write_json(path, obj):
+    atomic_write(path, json.dumps(obj, ensure_ascii=False))
+
+@contextlib.contextmanager
+def file_lock(name):
+    """Lock exclusivo entre procesos del mismo servidor (bloqueante)."""
+    with open(cache_path("locks", f"{name}.lock"), "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def evict_lru(directory, max_bytes, pattern="*"):
+    """Borra los archivos menos usados recientemente (por mtime) hasta quedar bajo max_bytes."""
+    entries = []
+    for path in glob.glob(os.path.join(directory, pattern)):
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((info.st_mtime, info.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def bump_stats(name, **increments):
+    """Suma contadores en .cache/stats/{name}.json (compartido entre procesos)."""
+    with file_lock(f"stats-{name}"):
+        path = cache_path("stats", f"{name}.json")
+        stats = read_json(path, {})
+        for key, value in increments.items():
+            stats[key] = stats.get(key, 0) + value
+        write_json(path, stats)
+
+def read_stats(name):
+    return read_json(cache_path("stats", f"{name}.json"), {})
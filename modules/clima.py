@@ -1,7 +1,73 @@
-import streamlit as st
+import io
 import base64
+import sqlite3
 import datetime
-from modules.database import get_employees, connect_to_drive, SPREADSHEET_ID
+import urllib.parse
+import streamlit as st
+import pandas as pd
+from modules.database import get_employees, get_clima_laboral, connect_to_drive, SPREADSHEET_ID
+from modules.clima_cube import sincronizar, registrar_respuesta
+
+@st.cache_resource(ttl=300, show_spinner=False)
+def get_cubo_clima():
+    """
+    Cubo de clima sincronizado con la lectura cacheada de la hoja. Comparar las huellas de la
+    lectura con el cubo es O(respuestas): se hace una vez por lectura, no en cada rerun.
+    """
+    return sincronizar(get_clima_laboral())
+
+URL_ENCUESTA = "https://servinet.datovatenexuspro.com/"
+COLUMNAS_ENLACES = ["NOMBRE COMPLETO", "CEDULA", "CARGO", "DEPARTAMENTO", "CELULAR", "ENLACE", "MENSAJE", "WHATSAPP"]
+
+def texto_identificador(serie):
+    """Cédulas o celulares como texto comparable: sin espacios ni el ".0" que deja una columna numérica."""
+    return serie.fillna("").astype(str).str.strip().str.replace(r"\.0$", "", regex=True)
+
+def pendientes_clima(df, df_clima):
+    """Empleados de BD EMPLEADOS cuya cédula no aparece en las respuestas (anti-join vectorizado)."""
+    if df.empty or "CEDULA" not in df.columns:
+        return df.iloc[0:0]
+    cedulas = texto_identificador(df["CEDULA"])
+    if df_clima.empty or "CEDULA" not in df_clima.columns:
+        return df.assign(CEDULA=cedulas)
+    respondieron = pd.Index(texto_identificador(df_clima["CEDULA"]).unique()).drop("", errors="ignore")
+    return df.assign(CEDULA=cedulas)[~cedulas.isin(respondieron).to_numpy()]
+
+def enlaces_clima(df_pendientes):
+    """Enlace personalizado, mensaje de invitación y enlace de WhatsApp de cada pendiente, en una pasada."""
+    if df_pendientes.empty:
+        return pd.DataFrame(columns=COLUMNAS_ENLACES)
+    texto = lambda c: df_pendientes[c].fillna("").astype(str) if c in df_pendientes.columns else pd.Series("", index=df_pendientes.index)
+    cedulas, nombres = texto("CEDULA"), texto("NOMBRE COMPLETO")
+    celulares = texto_identificador(texto("CELULAR"))
+    tokens = [base64.b64encode(c.encode()).decode() for c in cedulas]
+    enlaces = [f"{URL_ENCUESTA}?clima={c}&token={t}" for c, t in zip(cedulas, tokens)]
+    # El texto fijo del mensaje se codifica para la URL una sola vez; por fila solo nombre y enlace
+    saludo, cuerpo, cierre = "🌤️ Hola ", (
+        ",\nTe invitamos a diligenciar la Encuesta de Clima Laboral de SERVINET.\n"
+        "Tu opinión es muy importante para nosotros y nos ayuda a mejorar el ambiente de trabajo.\n"
+        "Por favor ingresa al siguiente enlace seguro y responde la encuesta: "
+    ), "\n¡Gracias por tu participación! 😊"
+    q_saludo, q_cuerpo, q_cierre = (urllib.parse.quote(t, safe='') for t in (saludo, cuerpo, cierre))
+    mensajes = [saludo + n + cuerpo + e + cierre for n, e in zip(nombres, enlaces)]
+    whatsapp = [
+        f"https://web.whatsapp.com/send?phone={cel}&text={q_saludo}{urllib.parse.quote(n, safe='')}{q_cuerpo}{urllib.parse.quote(e, safe='')}{q_cierre}"
+        for cel, n, e in zip(celulares, nombres, enlaces)
+    ]
+    return pd.DataFrame({
+        "NOMBRE COMPLETO": nombres.to_numpy(), "CEDULA": cedulas.to_numpy(), "CARGO": texto("CARGO").to_numpy(),
+        "DEPARTAMENTO": texto("DEPARTAMENTO").to_numpy(), "CELULAR": celulares.to_numpy(),
+        "ENLACE": enlaces, "MENSAJE": mensajes, "WHATSAPP": whatsapp,
+    }, columns=COLUMNAS_ENLACES)
+
+def exportar_enlaces(enlaces, formato="csv"):
+    """Enlaces y mensajes como CSV (UTF-8 con BOM, abre bien en Excel) o XLSX. Retorna bytes."""
+    if formato == "xlsx":
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+            enlaces.to_excel(writer, index=False, sheet_name="Pendientes clima")
+        return buffer.getvalue()
+    return enlaces.to_csv(index=False).encode("utf-8-sig")
 
 def render_clima_page(cedula, token):
     # --- OCULTAR MENÚ Y ENCABEZADO ---
@@ -74,6 +140,14 @@ def render_clima_page(cedula, token):
             datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             *[str(respuestas[p]) for p in preguntas]
         ]
-        sheet.append_row(fila)
+        respuesta = sheet.append_row(fila)
+        # El cubo de resultados suma esta fila ya, sin esperar a releer la hoja
+        try:
+            registrar_respuesta(fila, respuesta)
+        except (sqlite3.Error, ValueError) as e:
+            # La respuesta ya quedó en la hoja; el tablero la sumará al sincronizar
+            st.warning(f"Los resultados del tablero se actualizarán en la próxima lectura de la hoja ({type(e).__name__}: {e}).")
+        get_clima_laboral.clear()  # el tablero relee la hoja con esta respuesta
+        get_cubo_clima.clear()
         st.success("¡Encuesta registrada! Gracias por tu honestidad y participación.")
         st.balloons()
\ No newline at end of file
@@ -0,0 +1,282 @@
+import os
+import re
+import json
+import uuid
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from contextlib import contextmanager
+import pandas as pd
+from modules.cache_store import cache_path
+
+# Cubo materializado de la encuesta de clima (hoja 4_clima_laboral): por cada
+# (CARGO, DEPARTAMENTO, PREGUNTA, PERIODO) guarda conteo, suma y suma de cuadrados de las
+# respuestas numéricas. La hoja solo crece (append_row), así que el cubo recuerda cuántas filas
+# ya sumó (con la huella de cada una) y en cada lectura agrega solo las nuevas; el tablero
+# calcula medias, varianzas y el mapa de calor sobre los grupos, sin recorrer las respuestas.
+# Si la hoja cambia por debajo (filas borradas o editadas, otras columnas) se reconstruye entero.
+# Vive en SQLite (.cache/clima/cubo.sqlite): sumar una respuesta es un upsert de sus grupos,
+# no reescribir el cubo, y las transacciones reemplazan el file_lock entre procesos.
+# Cada proceso guarda el último cubo leído (grupos y estadísticas) mientras su versión no cambie.
+
+CLAVES = ["CARGO", "DEPARTAMENTO", "PREGUNTA", "PERIODO"]
+SEP = "\x1f"
+SIN_PERIODO = "SIN FECHA"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+CREATE TABLE IF NOT EXISTS huellas (fila INTEGER PRIMARY KEY, huella TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS preguntas (orden INTEGER PRIMARY KEY, pregunta TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS grupos (
+    cargo TEXT, departamento TEXT, pregunta TEXT, periodo TEXT,
+    n INTEGER NOT NULL, suma REAL NOT NULL, suma2 REAL NOT NULL,
+    PRIMARY KEY (cargo, departamento, pregunta, periodo)
+);
+"""
+_UPSERT = """
+INSERT INTO grupos VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (cargo, departamento, pregunta, periodo)
+DO UPDATE SET n = n + excluded.n, suma = suma + excluded.suma, suma2 = suma2 + excluded.suma2
+"""
+
+_memoria = {"version": None, "estado": None, "verificada": None}
+_memoria_lock = threading.Lock()
+_conexion = {"ruta": None, "conn": None}
+_conexion_lock = threading.RLock()  # una conexión por proceso; entre procesos, las transacciones
+
+@contextmanager
+def _conectar():
+    """Conexión del proceso al cubo (Streamlit corre cada rerun en otro hilo: no por hilo)."""
+    ruta = cache_path("clima", "cubo.sqlite")
+    with _conexion_lock:
+        if _conexion["ruta"] != ruta or not os.path.exists(ruta):
+            if _conexion["conn"] is not None:
+                _conexion["conn"].close()
+            conn = sqlite3.connect(ruta, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # es una caché: se reconstruye desde la hoja
+            conn.executescript(_ESQUEMA)
+            _conexion.update(ruta=ruta, conn=conn)
+        yield _conexion["conn"]
+
+def _meta(conn):
+    valores = dict(conn.execute("SELECT clave, valor FROM meta"))
+    return json.loads(valores.get("columnas", "[]")), int(valores.get("filas", 0)), valores.get("version")
+
+def _generacion(conn):
+    """Cambia solo al reconstruir el cubo: las huellas guardadas de una generación no cambian."""
+    encontrada = conn.execute("SELECT valor FROM meta WHERE clave = 'generacion'").fetchone()
+    return encontrada[0] if encontrada else None
+
+def _coincide(conn, df_clima, columnas, guardadas, filas):
+    """
+    La lectura y el cubo tienen las mismas columnas y las mismas filas en común (todas las huellas
+    guardadas, no solo la última: una fila editada o borrada más arriba obliga a reconstruir).
+    El proceso recuerda el hash rápido por fila de la última lectura verificada; las filas que
+    no cambiaron desde entonces no se vuelven a comparar con las huellas.
+    """
+    if guardadas != columnas:
+        return False
+    compartidas = min(filas, len(df_clima))
+    if compartidas == 0:
+        return True
+    comunes = df_clima.iloc[:compartidas]
+    rapidas = pd.util.hash_pandas_object(comunes, index=False).to_numpy()
+    generacion = _generacion(conn)
+    desde = 0
+    with _memoria_lock:
+        previa = _memoria["verificada"]
+    if previa is not None and previa[0] == generacion:
+        n = min(len(previa[1]), compartidas)
+        desde = n if np.array_equal(previa[1][:n], rapidas[:n]) else 0
+    if desde < compartidas:
+        en_cubo = [h for (h,) in conn.execute(
+            "SELECT huella FROM huellas WHERE fila >= ? AND fila < ? ORDER BY fila", (desde, compartidas))]
+        if en_cubo != _huellas(comunes.iloc[desde:]):
+            return False
+    with _memoria_lock:
+        _memoria["verificada"] = (generacion, rapidas)
+    return True
+
+def _texto(valor):
+    """Un valor de una columna sin tipo uniforme como texto (ver _columna_texto)."""
+    if valor is None or valor is pd.NA or (isinstance(valor, float) and valor != valor):
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    texto = str(valor)
+    if isinstance(valor, str):
+        texto = texto.strip()
+        if texto.isdigit():
+            return texto.lstrip("0") or "0"
+    return texto
+
+def _columna_texto(serie):
+    """Columna como texto, igual venga de append_row ("007", "7") o de get_all_records (7, 7.0)."""
+    if pd.api.types.is_integer_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        return serie.astype(str)
+    if pd.api.types.is_float_dtype(serie):
+        entero = serie.notna() & (serie % 1 == 0)
+        return serie.astype(str).mask(entero, serie[entero].astype("int64").astype(str)).fillna("")
+    return serie.map(_texto)
+
+def _huellas(filas):
+    """Huella de cada fila de `filas`, columna por columna (igual a _huella de cada fila)."""
+    if filas.empty or not len(filas.columns):
+        return []
+    columnas = [_columna_texto(filas[c]) for c in filas.columns]
+    unidas = columnas[0].str.cat(columnas[1:], sep=SEP)
+    return [hashlib.sha1(v.encode("utf-8")).hexdigest() for v in unidas]
+
+def _columna_fecha(columnas):
+    return next((c for c in columnas if "FECHA" in str(c).upper()), None)
+
+def _sumar(conn, filas, desde):
+    """Agrega al cubo las respuestas de `filas` (DataFrame con las columnas de la hoja; la primera es la fila `desde`)."""
+    conn.executemany("INSERT INTO huellas VALUES (?, ?)", enumerate(_huellas(filas), start=desde))
+    preguntas = [c for c in filas.columns if str(c).startswith("¿")]
+    if filas.empty or not preguntas:
+        return
+    fecha = _columna_fecha(filas.columns)
+    base = pd.DataFrame({
+        "CARGO": filas["CARGO"].astype(str) if "CARGO" in filas.columns else "",
+        "DEPARTAMENTO": filas["DEPARTAMENTO"].astype(str) if "DEPARTAMENTO" in filas.columns else "",
+        "PERIODO": filas[fecha].astype(str).str[:7].replace("", SIN_PERIODO) if fecha else SIN_PERIODO,
+    }, index=filas.index)
+    largo = base.join(filas[preguntas]).melt(id_vars=["CARGO", "DEPARTAMENTO", "PERIODO"], var_name="PREGUNTA", value_name="VALOR")
+    largo["VALOR"] = pd.to_numeric(largo["VALOR"], errors="coerce")
+    largo = largo.dropna(subset=["VALOR"])
+    largo["CUADRADO"] = largo["VALOR"] ** 2
+    agregado = largo.groupby(CLAVES).agg(N=("VALOR", "size"), SUMA=("VALOR", "sum"), SUMA2=("CUADRADO", "sum"))
+    conn.executemany(_UPSERT, (
+        (*clave, int(n), float(suma), float(suma2))
+        for clave, (n, suma, suma2) in zip(agregado.index, agregado.itertuples(index=False))
+    ))
+    con_respuestas = set(agregado.index.get_level_values("PREGUNTA"))
+    conn.executemany("INSERT OR IGNORE INTO preguntas (pregunta) VALUES (?)", ((p,) for p in preguntas if p in con_respuestas))
+
+def _cerrar_version(conn, columnas, filas):
+    version = uuid.uuid4().hex
+    conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+        ("columnas", json.dumps(columnas, ensure_ascii=False)), ("filas", str(filas)), ("version", version)
+    ])
+    return version
+
+def _estado(conn, version):
+    """Cubo de la versión actual: de la memoria del proceso o leído de la base (O(grupos))."""
+    with _memoria_lock:
+        if version is not None and version == _memoria["version"]:
+            return _memoria["estado"]
+    columnas, filas, _ = _meta(conn)
+    grupos = pd.read_sql_query(
+        "SELECT cargo AS CARGO, departamento AS DEPARTAMENTO, pregunta AS PREGUNTA, periodo AS PERIODO,"
+        " n AS N, suma AS SUMA, suma2 AS SUMA2 FROM grupos", conn
+    )
+    estado = {
+        "version": version, "columnas": columnas, "filas": filas, "grupos": grupos,
+        "preguntas": [p for (p,) in conn.execute("SELECT pregunta FROM preguntas ORDER BY orden")],
+        "resumenes": {},
+    }
+    with _memoria_lock:
+        _memoria.update(version=version, estado=estado)
+    return estado
+
+def sincronizar(df_clima):
+    """
+    Pone el cubo al día con `df_clima` (la hoja completa, en orden). Solo suma las filas que no
+    ha visto; reconstruye si las filas ya sumadas cambiaron. Si `df_clima` es una lectura más vieja
+    que el cubo (otra sesión ya sumó respuestas nuevas) y coincide con él, retorna el cubo tal cual.
+    Compara las filas en común con sus huellas, así que es O(respuestas): llamarla una vez por
+    lectura de la hoja (ver clima.get_cubo_clima), no en cada rerun. Retorna el estado del cubo.
+    """
+    columnas = [str(c) for c in df_clima.columns]
+    total = len(df_clima)
+    with _conectar() as conn:
+        guardadas, filas, version = _meta(conn)
+        valido = _coincide(conn, df_clima, columnas, guardadas, filas)
+        if not valido or filas < total:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                guardadas, filas, version = _meta(conn)  # otro proceso pudo escribir mientras tanto
+                valido = _coincide(conn, df_clima, columnas, guardadas, filas)
+                if not valido:
+                    conn.execute("DELETE FROM grupos")
+                    conn.execute("DELETE FROM huellas")
+                    conn.execute("DELETE FROM preguntas")
+                    conn.execute("INSERT OR REPLACE INTO meta VALUES ('generacion', ?)", (uuid.uuid4().hex,))
+                    filas = 0
+                if filas < total or not valido:
+                    _sumar(conn, df_clima.iloc[filas:], filas)
+                    version = _cerrar_version(conn, columnas, total)
+                    # El cubo quedó igual a esta lectura: la próxima solo compara lo que cambie
+                    verificada = (_generacion(conn), pd.util.hash_pandas_object(df_clima, index=False).to_numpy())
+                    with _memoria_lock:
+                        _memoria["verificada"] = verificada
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return _estado(conn, version)
+
+def registrar_respuesta(fila, respuesta_append):
+    """
+    Suma al cubo una fila recién agregada con append_row (valores en el orden de la hoja).
+    Solo si es la fila siguiente a las ya sumadas; si no, la próxima sincronización la toma.
+    """
+    updates = respuesta_append.get("updates") if isinstance(respuesta_append, dict) else None
+    rango = updates.get("updatedRange", "") if isinstance(updates, dict) else ""
+    encontrado = re.search(r"![A-Z]+(\d+)", rango)
+    if not encontrado:
+        return False
+    posicion = int(encontrado.group(1)) - 2  # fila 1 = encabezados
+    with _conectar() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columnas, filas, _ = _meta(conn)
+            if not columnas or filas != posicion:
+                conn.execute("ROLLBACK")
+                return False
+            valores = list(fila)[:len(columnas)]
+            valores += [""] * (len(columnas) - len(valores))
+            _sumar(conn, pd.DataFrame([valores], columns=columnas), filas)
+            _cerrar_version(conn, columnas, filas + 1)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return True
+
+def tabla_grupos(estado, periodo=None):
+    """Grupos del cubo como DataFrame (CARGO, DEPARTAMENTO, PREGUNTA, PERIODO, N, SUMA, SUMA2)."""
+    tabla = estado["grupos"]
+    if periodo is not None:
+        tabla = tabla[tabla["PERIODO"] == periodo]
+    return tabla
+
+def periodos(estado):
+    return sorted(estado["grupos"]["PERIODO"].unique(), reverse=True)
+
+def estadisticas(estado, por=(), periodo=None):
+    """
+    Media, varianza muestral y desviación por PREGUNTA (y por las columnas `por`) sumando los
+    grupos del cubo: O(grupos), y se calcula una vez por versión del cubo. La varianza queda
+    vacía con menos de dos respuestas. No modificar el resultado: lo comparten los reruns.
+    """
+    clave = (tuple(por), periodo)
+    resumen = estado["resumenes"].get(clave)
+    if resumen is not None:
+        return resumen
+    tabla = tabla_grupos(estado, periodo)
+    llaves = list(por) + ["PREGUNTA"]
+    if tabla.empty:
+        resumen = pd.DataFrame(columns=llaves + ["N", "MEDIA", "VARIANZA", "DESVIACION"])
+    else:
+        total = tabla.groupby(llaves, as_index=False)[["N", "SUMA", "SUMA2"]].sum()
+        total["MEDIA"] = total["SUMA"] / total["N"]
+        varianza = (total["SUMA2"] - total["SUMA"] ** 2 / total["N"]) / (total["N"] - 1)
+        total["VARIANZA"] = varianza.clip(lower=0).where(total["N"] > 1)
+        total["DESVIACION"] = total["VARIANZA"] ** 0.5
+        resumen = total[llaves + ["N", "MEDIA", "VARIANZA", "DESVIACION"]]
+    estado["resumenes"][clave] = resumen
+    return resumen
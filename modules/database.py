@@ -53,6 +53,21 @@ def get_evaluaciones():
         st.error(f"Error leyendo hoja de evaluaciones: {e}")
         return pd.DataFrame()
 
+@st.cache_data(ttl=300)
+def get_clima_laboral():
+    """Respuestas de la hoja 4_clima_laboral, con los encabezados tal cual (las preguntas empiezan con ¿)."""
+    try:
+        client = connect_to_drive()
+        if not client:
+            st.error("No se pudo conectar a Google Drive.")
+            return pd.DataFrame()
+        spreadsheet = client.open_by_key(SPREADSHEET_ID)
+        sheet = spreadsheet.worksheet("4_clima_laboral")
+        return pd.DataFrame(sheet.get_all_records())
+    except Exception as e:
+        st.error(f"Error leyendo hoja de clima laboral: {e}")
+        return pd.DataFrame()
+
 # --- NUEVAS FUNCIONES DE MEMORIA ---
 
 def init_memory():
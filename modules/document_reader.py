@@ -1,25 +1,57 @@
 import streamlit as st
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 import io
+import os
+import glob
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import PyPDF2
 from docx import Document
 import time
-# CORRECCIÓN: Importar la función de autenticación desde el lugar correcto (auth.py)
-from modules.auth import get_google_creds
+from modules.drive_client import get_drive_client
+from modules.cache_store import cache_path, atomic_write, read_text
+from modules.drive_manager import get_drive_index, list_all_files
 
-# MEJORA: Cachear el servicio de Drive para no reconectar constantemente
-@st.cache_resource(show_spinner="Conectando a Google Drive...")
 def get_drive_service():
-    """Obtiene el servicio de Drive usando las credenciales centralizadas."""
-    creds = get_google_creds()
-    if creds:
-        return build('drive', 'v3', credentials=creds)
+    """Obtiene el servicio de Drive compartido (ver modules/drive_client.py)."""
+    service = get_drive_client()
+    if service:
+        return service
     st.error("Fallo en la autenticación con Google para el lector de documentos.")
     return None
 
-def download_file_content(file_id):
-    service = get_drive_service()
+MAX_DESCARGAS_PARALELAS = 4
+PAGINAS_POR_TAREA = 20
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def _contexto_procesos():
+    """forkserver (o spawn en Windows): un fork del servidor multihilo puede heredar locks tomados."""
+    metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(metodo)
+
+def _get_process_pool():
+    """Pool de procesos compartido para extraer texto de PDFs (CPU) fuera del GIL."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1), mp_context=_contexto_procesos())
+        return _process_pool
+
+def _descartar_process_pool(pool):
+    """Olvida un pool roto para que la próxima extracción cree uno nuevo."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def download_file_content(file_id, service=None):
+    service = service or get_drive_service()
     if not service: return None
     request = service.files().get_media(fileId=file_id)
     fh = io.BytesIO()
@@ -30,56 +62,142 @@ def download_file_content(file_id):
     fh.seek(0)
     return fh
 
-def read_pdf(file_id):
+def _extraer_paginas_pdf(pdf_bytes, inicio, fin):
+    """Extrae el texto de las páginas [inicio, fin) de un PDF. Se ejecuta en el pool de procesos."""
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [(reader.pages[i].extract_text() or "") + "\n" for i in range(inicio, fin)]
+
+def _pdf_text(fh, paralelo=False):
+    reader = PyPDF2.PdfReader(fh)
+    total = len(reader.pages)
+    if paralelo and total > PAGINAS_POR_TAREA:
+        pdf_bytes = fh.getvalue()
+        pool = _get_process_pool()
+        try:
+            futures = [
+                pool.submit(_extraer_paginas_pdf, pdf_bytes, i, min(i + PAGINAS_POR_TAREA, total))
+                for i in range(0, total, PAGINAS_POR_TAREA)
+            ]
+            return "".join("".join(f.result()) for f in futures)
+        except BrokenProcessPool:
+            # Si el pool no está disponible, se extrae en el hilo actual y el próximo llamado lo recrea
+            _descartar_process_pool(pool)
+    return "".join((page.extract_text() or "") + "\n" for page in reader.pages)
+
+def _docx_text(fh):
+    doc = Document(fh)
+    return "\n".join([para.text for para in doc.paragraphs])
+
+def read_pdf(file_id, service=None, paralelo=False):
     try:
-        fh = download_file_content(file_id)
+        fh = download_file_content(file_id, service)
         if not fh: return "Error: No se pudo descargar el archivo PDF."
-        reader = PyPDF2.PdfReader(fh)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return _pdf_text(fh, paralelo)
     except Exception as e:
         return f"Error leyendo PDF: {e}"
 
-def read_docx(file_id):
+def read_docx(file_id, service=None):
     try:
-        fh = download_file_content(file_id)
+        fh = download_file_content(file_id, service)
         if not fh: return "Error: No se pudo descargar el archivo DOCX."
-        doc = Document(fh)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        return text
+        return _docx_text(fh)
     except Exception as e:
         return f"Error leyendo DOCX: {e}"
 
-def get_company_context(folder_id):
+def _texto_cache_path(file):
+    """
+    Ruta en caché del texto extraído de un archivo de Drive, por (id, md5Checksum/modifiedTime).
+    Los Google Docs nativos no tienen md5, por eso se usa modifiedTime como respaldo.
+    """
+    version = file.get('md5Checksum') or file.get('modifiedTime')
+    if not version:
+        return None
+    return cache_path("textos", f"{file['id']}_{hashlib.sha1(version.encode()).hexdigest()[:16]}.txt")
+
+def _guardar_texto_cache(file, path, texto):
+    for viejo in glob.glob(os.path.join(os.path.dirname(path), f"{glob.escape(file['id'])}_*.txt")):
+        if viejo != path:
+            try:
+                os.remove(viejo)
+            except FileNotFoundError:
+                pass
+    atomic_write(path, texto)
+
+def _leer_archivo(file, service):
+    """
+    Descarga y extrae un archivo en un hilo del pool. Retorna (texto, desde_cache);
+    texto es None si el tipo no es soportado. `service` se resuelve en el hilo del script:
+    aquí st.error no tiene ScriptRunContext y se perdería.
+    MEJORA: Solo se descargan archivos nuevos o modificados; el resto sale de la caché en disco.
+    """
+    es_pdf = "pdf" in file['mimeType']
+    es_docx = "word" in file['mimeType'] or "document" in file['mimeType']
+    if not es_pdf and not es_docx:
+        return None, False
+    path = _texto_cache_path(file)
+    if path:
+        texto = read_text(path)
+        if texto is not None:
+            return texto, True
+    tipo = "PDF" if es_pdf else "DOCX"
+    try:
+        fh = download_file_content(file['id'], service)
+        if not fh: return f"Error: No se pudo descargar el archivo {tipo}.", False
+        texto = _pdf_text(fh, paralelo=True) if es_pdf else _docx_text(fh)
+    except Exception as e:
+        return f"Error leyendo {tipo}: {e}", False
+    if path:
+        _guardar_texto_cache(file, path, texto)
+    return texto, False
+
+def get_company_context(folder_id, status=None):
     """
     Busca manuales en la carpeta indicada y crea el contexto para la IA.
     Ahora con reintentos ante errores de red.
+    MEJORA: Descargas en paralelo (acotadas), extracción de PDFs en un pool de procesos
+    y progreso por archivo en el st.status recibido. El texto extraído se guarda en
+    disco por (id, md5Checksum/modifiedTime), así que un arranque en caliente no descarga nada.
     """
     service = get_drive_service()
     if not service:
         st.error("No se pudo obtener el servicio de Drive para leer el contexto de la compañía.")
         return ""
-    query = f"('{folder_id}' in parents) and (name contains 'MANUAL' or name contains 'Estructura')"
-    max_retries = 3
-    for intento in range(max_retries):
-        try:
-            results = service.files().list(q=query, fields="files(id, name, mimeType)").execute()
-            break
-        except Exception as e:
-            if intento < max_retries - 1:
-                time.sleep(2)
-            else:
-                st.error(f"Error de red al leer archivos de Drive: {e}")
-                return ""
-    files = results.get('files', [])
-    full_context = ""
-    for file in files:
-        if "pdf" in file['mimeType']:
-            full_context += f"\n--- CONTENIDO DE {file['name']} ---\n"
-            full_context += read_pdf(file['id'])
-        elif "word" in file['mimeType'] or "document" in file['mimeType']:
-            full_context += f"\n--- CONTENIDO DE {file['name']} ---\n"
-            full_context += read_docx(file['id'])
-    return full_context
+    index = get_drive_index()
+    if index and index.contains(folder_id):
+        # MEJORA: La carpeta de la app se lista desde el índice local sincronizado de Drive
+        files = [
+            f for f in index.children(folder_id)
+            if "manual" in f['name'].lower() or "estructura" in f['name'].lower()
+        ]
+    else:
+        query = f"('{folder_id}' in parents) and (name contains 'MANUAL' or name contains 'Estructura')"
+        max_retries = 3
+        for intento in range(max_retries):
+            try:
+                files = list(list_all_files(service, query, "id, name, mimeType, md5Checksum, modifiedTime"))
+                break
+            except Exception as e:
+                if intento < max_retries - 1:
+                    time.sleep(2)
+                else:
+                    st.error(f"Error de red al leer archivos de Drive: {e}")
+                    return ""
+    if status and files:
+        status.write(f"📂 {len(files)} archivos encontrados. Descargando...")
+    partes = [None] * len(files)
+    en_cache = 0
+    with ThreadPoolExecutor(max_workers=MAX_DESCARGAS_PARALELAS) as executor:
+        futures = {executor.submit(_leer_archivo, file, service): i for i, file in enumerate(files)}
+        for n, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            texto, desde_cache = future.result()
+            if texto is None:
+                continue
+            en_cache += desde_cache
+            partes[i] = f"\n--- CONTENIDO DE {files[i]['name']} ---\n" + texto
+            if status:
+                origen = "⚡ caché" if desde_cache else "✅"
+                status.write(f"{origen} ({n}/{len(files)}) {files[i]['name']}: {len(texto)} caracteres")
+    if status and en_cache:
+        status.write(f"{en_cache} de {len(files)} archivos sin cambios, leídos desde caché.")
+    return "".join(p for p in partes if p)
@@ -0,0 +1,88 @@
+import os
+import time
+import threading
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build_from_document
+from modules.auth import get_google_creds
+
+# Fábrica única del cliente de Drive para drive_manager y document_reader.
+# - Se construye desde un documento de descubrimiento empaquetado (discovery/drive.v3.json,
+#   el estático de google-api-python-client sin descripciones), sin red ni búsqueda de archivos.
+# - Un solo Resource por proceso. httplib2.Http no es thread-safe, así que cada petición toma
+#   una conexión libre de un pool compartido y la devuelve al terminar. Streamlit ejecuta cada
+#   rerun en un hilo nuevo: con un Http por hilo la conexión keep-alive casi nunca se reutilizaba.
+
+DISCOVERY_PATH = os.path.join(os.path.dirname(__file__), "discovery", "drive.v3.json")
+HTTP_TIMEOUT = 60
+HTTP_POOL_SIZE = 8  # conexiones libres que se conservan; con más peticiones simultáneas se abren extra
+
+_service = None
+_service_lock = threading.Lock()
+_cold_start = {}
+
+class _PooledHttp:
+    """
+    Objeto http para googleapiclient: cada request() usa un AuthorizedHttp libre del pool
+    (o uno nuevo si están todos ocupados) y lo devuelve para que lo reutilice otro hilo.
+    """
+
+    def __init__(self, creds, size=HTTP_POOL_SIZE):
+        self.credentials = creds
+        self._size = size
+        self._libres = []
+        self._lock = threading.Lock()
+        self.creados = 0
+
+    def _nuevo(self):
+        http = httplib2.Http(timeout=HTTP_TIMEOUT)
+        # Drive usa 308 en las subidas reanudables; no debe seguirse como redirección
+        http.redirect_codes = http.redirect_codes - {308}
+        self.creados += 1
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=http)
+
+    def request(self, *args, **kwargs):
+        with self._lock:
+            http = self._libres.pop() if self._libres else None
+            if http is None:
+                http = self._nuevo()
+        try:
+            return http.request(*args, **kwargs)
+        finally:
+            with self._lock:
+                if len(self._libres) < self._size:
+                    self._libres.append(http)  # LIFO: la más reciente sigue con la conexión abierta
+
+    def close(self):
+        with self._lock:
+            libres, self._libres = self._libres, []
+        for http in libres:
+            http.close()
+
+def get_drive_client():
+    """Cliente de Drive compartido y seguro entre hilos. Retorna None si no hay credenciales."""
+    global _service
+    if _service is not None:
+        return _service
+    with _service_lock:
+        if _service is None:
+            creds = get_google_creds()
+            if not creds:
+                return None
+            inicio = time.perf_counter()
+            with open(DISCOVERY_PATH, "r", encoding="utf-8") as f:
+                document = f.read()
+            leido = time.perf_counter()
+
+            _service = build_from_document(document, http=_PooledHttp(creds))
+            fin = time.perf_counter()
+            _cold_start.update({
+                "lectura_ms": round((leido - inicio) * 1000, 2),
+                "construccion_ms": round((fin - leido) * 1000, 2),
+                "total_ms": round((fin - inicio) * 1000, 2),
+            })
+    return _service
+
+def get_cold_start_stats():
+    """Tiempos del arranque en frío del cliente (vacío si aún no se ha construido)."""
+    return dict(_cold_start)
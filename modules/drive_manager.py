@@ -1,124 +1,454 @@
 import streamlit as st
 import os
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
-from modules.auth import get_google_creds  # <-- MEJORA: Import centralizado
+import glob
+import time
+import threading
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload, MediaIoBaseUpload
+from modules.drive_client import get_drive_client  # <-- MEJORA: Cliente único compartido
+from modules.cache_store import cache_path, read_json, write_json, file_lock, atomic_write, evict_lru, bump_stats
 import io
+import hashlib
+
+APP_ROOT_NAME = 'SERVINET_APP_DATA'
+MANUALS_FOLDER_NAME = 'MANUAL_FUNCIONES'
+ORGANIGRAMA_FILENAME = 'Organigrama_Cargos.pdf'
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+FILE_FIELDS = "id, name, mimeType, parents, md5Checksum, modifiedTime, createdTime, trashed"
+SYNC_MIN_INTERVAL = 30  # segundos entre consultas al feed de cambios
+FOLDER_VALIDATION_INTERVAL = 600  # segundos entre verificaciones de la carpeta memorizada
+DOWNLOAD_CACHE_MAX_BYTES = int(os.environ.get("DRIVE_CACHE_MAX_MB", 200)) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # múltiplo de 256 KB, requerido por Drive
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024  # por encima de este tamaño la subida es reanudable por bloques
+BATCH_MAX_REQUESTS = 100  # límite de Drive por lote HTTP
+PUBLIC_CACHE_TTL = int(os.environ.get("DRIVE_PUBLIC_TTL_H", 24)) * 3600  # se revalida que siga público
+
+_public_files = None
+_public_files_lock = threading.Lock()
+
+_folder_memo = {}
+_folder_memo_lock = threading.Lock()
 
-@st.cache_resource(show_spinner="Conectando a Google Drive...")
 def get_drive_service():
-    """Obtiene el servicio de Drive usando las credenciales centralizadas."""
-    creds = get_google_creds()
-    if creds:
-        return build('drive', 'v3', credentials=creds)
+    """Obtiene el servicio de Drive compartido (ver modules/drive_client.py)."""
+    service = get_drive_client()
+    if service:
+        return service
     st.error("Fallo en la autenticación con Google.")
     return None
 
-def upload_manual_to_drive(file_path, folder_id):
+def _q(value):
+    """Escapa un valor para usarlo entre comillas simples en una query de Drive."""
+    return str(value).replace("\\", "\\\\").replace("'", "\\'")
+
+def list_all_files(service, query, fields="id, name"):
+    """files().list con paginación completa (sigue nextPageToken)."""
+    page_token = None
+    while True:
+        results = service.files().list(
+            q=query,
+            fields=f"nextPageToken, files({fields})",
+            pageSize=1000,
+            pageToken=page_token
+        ).execute()
+        yield from results.get('files', [])
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+class DriveIndex:
+    """
+    Índice local de metadatos del árbol SERVINET_APP_DATA.
+    La primera vez recorre el árbol completo; después se actualiza de forma incremental
+    con el feed de cambios de Drive (changes().getStartPageToken / changes().list).
+    Se persiste en disco para que un reinicio no obligue a recorrer todo de nuevo.
+    """
+
+    def __init__(self, service, path):
+        self.service = service
+        self._path = path
+        self._lock = threading.RLock()
+        self._last_sync = 0.0
+        state = read_json(path, {})
+        self.root_id = state.get("root_id")
+        self.page_token = state.get("page_token")
+        self.files = state.get("files", {})
+
+    def _save(self):
+        write_json(self._path, {"root_id": self.root_id, "page_token": self.page_token, "files": self.files})
+
+    def _scan_folder(self, folder_id):
+        pendientes = [folder_id]
+        while pendientes:
+            actual = pendientes.pop()
+            for f in list_all_files(self.service, f"'{actual}' in parents and trashed=false", FILE_FIELDS):
+                self.files[f['id']] = f
+                if f['mimeType'] == FOLDER_MIME:
+                    pendientes.append(f['id'])
+
+    def _full_scan(self):
+        # El token se pide antes de listar para no perder cambios ocurridos durante el recorrido
+        token = self.service.changes().getStartPageToken().execute()['startPageToken']
+        self.files = {}
+        self.root_id = None
+        query = f"name='{APP_ROOT_NAME}' and mimeType='{FOLDER_MIME}' and trashed=false"
+        roots = list(list_all_files(self.service, query, FILE_FIELDS))
+        if roots:
+            self.root_id = roots[0]['id']
+            self.files[self.root_id] = roots[0]
+            self._scan_folder(self.root_id)
+        self.page_token = token
+
+    def _remove(self, file_id):
+        pendientes = [file_id]
+        while pendientes:
+            actual = pendientes.pop()
+            if self.files.pop(actual, None) is None:
+                continue
+            pendientes.extend(fid for fid, f in self.files.items() if actual in f.get('parents', []))
+
+    def _apply_change(self, change):
+        file_id = change['fileId']
+        f = change.get('file')
+        if change.get('removed') or not f or f.get('trashed'):
+            self._remove(file_id)
+            if file_id == self.root_id:
+                self.page_token = None  # La raíz desapareció: se recorre todo en la próxima sync
+            return
+        if not self.root_id and f.get('name') == APP_ROOT_NAME and f.get('mimeType') == FOLDER_MIME:
+            self.page_token = None
+            return
+        if file_id == self.root_id or any(p in self.files for p in f.get('parents', [])):
+            nuevo = file_id not in self.files
+            self.files[file_id] = f
+            # Una carpeta movida al árbol trae contenido que no genera cambios propios
+            if nuevo and f.get('mimeType') == FOLDER_MIME:
+                self._scan_folder(file_id)
+        else:
+            self._remove(file_id)
+
+    def _apply_changes(self):
+        page_token = self.page_token
+        while page_token:
+            results = self.service.changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                pageSize=1000,
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))"
+            ).execute()
+            for change in results.get('changes', []):
+                self._apply_change(change)
+                if self.page_token is None:
+                    return
+            if 'newStartPageToken' in results:
+                self.page_token = results['newStartPageToken']
+                return
+            page_token = results.get('nextPageToken')
+
+    def sync(self, force=False):
+        """Trae los cambios pendientes (como mucho una vez cada SYNC_MIN_INTERVAL segundos)."""
+        with self._lock:
+            if not force and time.monotonic() - self._last_sync < SYNC_MIN_INTERVAL:
+                return
+            try:
+                if self.page_token and self.root_id:
+                    self._apply_changes()
+                if not self.page_token or not self.root_id:
+                    self._full_scan()
+            except HttpError as e:
+                if e.resp.status not in (400, 404, 410):
+                    raise
+                self._full_scan()  # Token inválido o expirado
+            self._last_sync = time.monotonic()
+            self._save()
+
+    def contains(self, file_id):
+        self.sync()
+        with self._lock:
+            return file_id in self.files
+
+    def children(self, parent_id, name=None, mime_type=None):
+        """Hijos de una carpeta desde el índice, del más reciente al más antiguo."""
+        self.sync()
+        with self._lock:
+            result = [
+                f for f in self.files.values()
+                if parent_id in f.get('parents', [])
+                and (name is None or f['name'] == name)
+                and (mime_type is None or f['mimeType'] == mime_type)
+            ]
+        return sorted(result, key=lambda f: f.get('modifiedTime', ''), reverse=True)
+
+    def upsert(self, file_meta):
+        """Registra en el índice un archivo que acabamos de crear o modificar."""
+        with self._lock:
+            if file_meta.get('mimeType') == FOLDER_MIME and file_meta.get('name') == APP_ROOT_NAME and not self.root_id:
+                self.root_id = file_meta['id']
+            self.files[file_meta['id']] = file_meta
+            self._save()
+
+    def discard(self, file_id):
+        with self._lock:
+            self._remove(file_id)
+            self._save()
+
+@st.cache_resource(show_spinner=False)
+def get_drive_index():
+    """Índice de Drive compartido por todas las sesiones del proceso."""
     service = get_drive_service()
-    if not service: return None
-    file_metadata = {
-        'name': os.path.basename(file_path),
-        'parents': [folder_id]
-    }
-    media = MediaFileUpload(file_path, mimetype='application/pdf')
-    try:
-        file = service.files().create(
-            body=file_metadata,
+    if not service:
+        return None
+    return DriveIndex(service, cache_path("drive_index.json"))
+
+def find_files_by_name(name, folder_id, mime_type=None):
+    """
+    Busca archivos por nombre dentro de una carpeta. Responde desde el índice local si la
+    carpeta pertenece al árbol de la app; si no, consulta Drive directamente (paginado).
+    """
+    index = get_drive_index()
+    if index and index.contains(folder_id):
+        return index.children(folder_id, name=name, mime_type=mime_type)
+    service = get_drive_service()
+    if not service: return []
+    query = f"'{folder_id}' in parents and name='{_q(name)}' and trashed=false"
+    if mime_type:
+        query += f" and mimeType='{mime_type}'"
+    return list(list_all_files(service, query, FILE_FIELDS))
+
+def _index_upsert(file_meta):
+    index = get_drive_index()
+    if index and file_meta:
+        index.upsert(file_meta)
+
+def manual_filename(cargo):
+    """Nombre del PDF del manual en Drive para un cargo."""
+    return f"Manual_{cargo.replace(' ', '_').upper()}.pdf"
+
+def _pdf_media(pdf, mimetype='application/pdf'):
+    """
+    Construye el media_body para bytes, un buffer o (compatibilidad) una ruta en disco.
+    Los archivos grandes se suben de forma reanudable en bloques de UPLOAD_CHUNK_SIZE.
+    """
+    if isinstance(pdf, str):
+        resumable = os.path.getsize(pdf) > RESUMABLE_THRESHOLD
+        return MediaFileUpload(pdf, mimetype=mimetype, chunksize=UPLOAD_CHUNK_SIZE, resumable=resumable)
+    fh = io.BytesIO(pdf) if isinstance(pdf, (bytes, bytearray)) else pdf
+    fh.seek(0, io.SEEK_END)
+    size = fh.tell()
+    fh.seek(0)
+    return MediaIoBaseUpload(fh, mimetype=mimetype, chunksize=UPLOAD_CHUNK_SIZE, resumable=size > RESUMABLE_THRESHOLD)
+
+def _content_md5(pdf):
+    """md5 del PDF (bytes, buffer o ruta), comparable con md5Checksum de Drive."""
+    if isinstance(pdf, str):
+        with open(pdf, "rb") as f:
+            return hashlib.md5(f.read()).hexdigest()
+    if isinstance(pdf, (bytes, bytearray)):
+        return hashlib.md5(pdf).hexdigest()
+    return hashlib.md5(pdf.getvalue()).hexdigest()
+
+def upload_pdf_to_drive(pdf, filename, folder_id, replace=True):
+    """
+    Sube un PDF desde memoria (bytes o buffer) a una carpeta de Drive.
+    Si replace=True y ya existe un archivo con ese nombre, se actualiza su contenido
+    (conserva el ID y los permisos compartidos); si el contenido es idéntico no se sube nada.
+    Retorna (file_id, md5Checksum).
+    """
+    service = get_drive_service()
+    if not service: return None, None
+    existentes = find_files_by_name(filename, folder_id) if replace else []
+    md5 = _content_md5(pdf)
+    if existentes and existentes[0].get('md5Checksum') == md5:
+        # MEJORA: Contenido idéntico al de Drive (p. ej. PDF servido desde la caché de render): no se sube
+        bump_stats("drive", subidas_omitidas=1)
+        return existentes[0]['id'], md5
+    media = _pdf_media(pdf)
+    if existentes:
+        request = service.files().update(
+            fileId=existentes[0]['id'],
             media_body=media,
-            fields='id',
+            fields=FILE_FIELDS,
             supportsAllDrives=True
-        ).execute()
-        return file.get('id')
+        )
+    else:
+        request = service.files().create(
+            body={'name': filename, 'parents': [folder_id]},
+            media_body=media,
+            fields=FILE_FIELDS,
+            supportsAllDrives=True
+        )
+    # execute() recorre los bloques de una subida reanudable y reintenta errores transitorios
+    file = request.execute(num_retries=3)
+    _index_upsert(file)
+    return file.get('id'), file.get('md5Checksum')
+
+def upload_manual_to_drive(pdf, folder_id, filename=None):
+    """
+    Sube el manual (bytes, buffer o ruta) a Drive. Retorna (file_id, md5Checksum).
+    Si no se indica filename y pdf es una ruta, se usa el nombre del archivo.
+    """
+    filename = filename or os.path.basename(pdf)
+    try:
+        return upload_pdf_to_drive(pdf, filename, folder_id)
     except Exception as e:
         st.error(f"Error subiendo a Drive: {e}")
-        return None
+        return None, None
 
 def find_manual_in_drive(cargo, folder_id):
-    service = get_drive_service()
-    if not service: return None
-    filename = f"Manual_{cargo.replace(' ', '_').upper()}.pdf"
-    query = (
-        f"'{folder_id}' in parents and name='{filename}' and trashed=false"
-    )
-    results = service.files().list(
-        q=query,
-        fields="files(id, name)"
-    ).execute()
-    files = results.get('files', [])
+    files = find_files_by_name(manual_filename(cargo), folder_id)
     if files:
         return files[0]['id']
     return None
 
-def download_manual_from_drive(file_id):
-    service = get_drive_service()
-    if not service: return b""
+def _download_bytes(service, file_id):
     request = service.files().get_media(fileId=file_id, supportsAllDrives=True)
     fh = io.BytesIO()
     downloader = MediaIoBaseDownload(fh, request)
     done = False
     while not done:
         status, done = downloader.next_chunk()
-    fh.seek(0)
-    return fh.read()
+    return fh.getvalue()
+
+def _file_md5(service, file_id):
+    index = get_drive_index()
+    if index and index.contains(file_id):
+        md5 = index.files[file_id].get('md5Checksum')
+        if md5:
+            return md5
+    return service.files().get(fileId=file_id, fields="md5Checksum", supportsAllDrives=True).execute().get('md5Checksum')
+
+def _evict_download_cache(directory):
+    """Borra los archivos menos usados recientemente hasta quedar bajo DOWNLOAD_CACHE_MAX_BYTES."""
+    evict_lru(directory, DOWNLOAD_CACHE_MAX_BYTES, "*.pdf")
+
+def download_manual_from_drive(file_id):
+    """
+    Descarga un archivo de Drive.
+    MEJORA: Caché LRU en disco por (id, md5Checksum) con tamaño máximo; un acierto
+    solo cuesta leer el archivo local (y a lo sumo un files().get si no está indexado).
+    Un 403/404 saca el archivo de la caché de públicos.
+    """
+    service = get_drive_service()
+    if not service: return b""
+    try:
+        return _download_cached(service, file_id)
+    except HttpError as e:
+        if e.resp.status in (403, 404):
+            forget_public([file_id])  # ya no es accesible: la próxima publicación no se omite
+        raise
+
+def _download_cached(service, file_id):
+    md5 = _file_md5(service, file_id)
+    if not md5:
+        return _download_bytes(service, file_id)
+    path = cache_path("descargas", f"{file_id}_{md5}.pdf")
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # El mtime hace de marca de "uso reciente"
+        return data
+    except FileNotFoundError:
+        pass
+    data = _download_bytes(service, file_id)
+    directory = os.path.dirname(path)
+    with file_lock("descargas"):
+        for viejo in glob.glob(os.path.join(directory, f"{glob.escape(file_id)}_*.pdf")):
+            if viejo != path:
+                os.remove(viejo)
+        atomic_write(path, data)
+        _evict_download_cache(directory)
+    return data
+
+def _create_folder_unique(service, name, parent_id=None):
+    """
+    Crea una carpeta y resuelve carreras con otros servidores: si aparecen varias con el
+    mismo nombre, se conserva la más antigua y se borra la que acabamos de crear.
+    """
+    body = {'name': name, 'mimeType': FOLDER_MIME}
+    query = f"name='{_q(name)}' and mimeType='{FOLDER_MIME}' and trashed=false"
+    if parent_id:
+        body['parents'] = [parent_id]
+        query += f" and '{parent_id}' in parents"
+    created = service.files().create(body=body, fields=FILE_FIELDS).execute()
+    candidates = sorted(
+        list_all_files(service, query, FILE_FIELDS),
+        key=lambda f: (f.get('createdTime', ''), f['id'])
+    )
+    keeper = candidates[0] if candidates else created
+    if keeper['id'] != created['id']:
+        service.files().delete(fileId=created['id']).execute()
+    _index_upsert(keeper)
+    return keeper['id']
+
+def _resolve_manuals_folder(service):
+    index = get_drive_index()
+    index.sync()
+    parent_id = index.root_id or _create_folder_unique(service, APP_ROOT_NAME)
+    folders = index.children(parent_id, name=MANUALS_FOLDER_NAME, mime_type=FOLDER_MIME)
+    if folders:
+        return min(folders, key=lambda f: (f.get('createdTime', ''), f['id']))['id']
+    return _create_folder_unique(service, MANUALS_FOLDER_NAME, parent_id)
+
+def _folder_is_valid(service, folder_id):
+    """Verificación barata (files().get) de que la carpeta memorizada sigue existiendo."""
+    try:
+        f = service.files().get(fileId=folder_id, fields="id, mimeType, trashed").execute()
+    except HttpError as e:
+        if e.resp.status == 404:
+            return False
+        raise
+    return f.get('mimeType') == FOLDER_MIME and not f.get('trashed')
 
 def get_or_create_manuals_folder():
     """
     Busca o crea la subcarpeta 'MANUAL_FUNCIONES' dentro de 'SERVINET_APP_DATA' en Mi unidad.
+    MEJORA: El ID se resuelve una vez, se memoriza en el proceso y en disco (compartido entre
+    procesos) y solo se revalida cada FOLDER_VALIDATION_INTERVAL segundos. La creación va
+    bajo un lock entre procesos para no duplicar la carpeta.
     """
+    with _folder_memo_lock:
+        memo = _folder_memo.get(MANUALS_FOLDER_NAME)
+    if memo and time.time() - memo['validated_at'] < FOLDER_VALIDATION_INTERVAL:
+        return memo['id']
     service = get_drive_service()
     if not service: return None
-    # Busca la carpeta principal
-    parent_query = "name='SERVINET_APP_DATA' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-    parent_results = service.files().list(q=parent_query, fields="files(id, name)").execute()
-    parents = parent_results.get('files', [])
-    if not parents:
-        # Si no existe la carpeta principal, la crea
-        parent_metadata = {'name': 'SERVINET_APP_DATA', 'mimeType': 'application/vnd.google-apps.folder'}
-        parent = service.files().create(body=parent_metadata, fields='id').execute()
-        parent_id = parent.get('id')
-    else:
-        parent_id = parents[0]['id']
-    # Busca la subcarpeta de manuales dentro de la principal
-    folder_query = f"name='MANUAL_FUNCIONES' and mimeType='application/vnd.google-apps.folder' and '{parent_id}' in parents and trashed=false"
-    folder_results = service.files().list(q=folder_query, fields="files(id, name)").execute()
-    folders = folder_results.get('files', [])
-    if folders:
-        return folders[0]['id']
-    # Si no existe, la crea dentro de la principal
-    file_metadata = {'name': 'MANUAL_FUNCIONES', 'mimeType': 'application/vnd.google-apps.folder', 'parents': [parent_id]}
-    folder = service.files().create(body=file_metadata, fields='id').execute()
-    return folder.get('id')
-
-def upload_organigrama_to_drive(file_path, folder_id):
-    """Sube el PDF del organigrama a Drive."""
+    path = cache_path("folders.json")
+    entry = read_json(path, {}).get(MANUALS_FOLDER_NAME)
+    if not entry or time.time() - entry['validated_at'] >= FOLDER_VALIDATION_INTERVAL:
+        with file_lock("folders"):
+            # Otro proceso pudo resolverla mientras esperábamos el lock
+            state = read_json(path, {})
+            entry = state.get(MANUALS_FOLDER_NAME)
+            if not entry or time.time() - entry['validated_at'] >= FOLDER_VALIDATION_INTERVAL:
+                if entry and _folder_is_valid(service, entry['id']):
+                    entry = {'id': entry['id'], 'validated_at': time.time()}
+                else:
+                    entry = {'id': _resolve_manuals_folder(service), 'validated_at': time.time()}
+                state[MANUALS_FOLDER_NAME] = entry
+                write_json(path, state)
+    with _folder_memo_lock:
+        _folder_memo[MANUALS_FOLDER_NAME] = entry
+    return entry['id']
+
+def upload_organigrama_to_drive(pdf, folder_id):
+    """Sube el PDF del organigrama (bytes, buffer o ruta) a Drive. Retorna (file_id, md5Checksum)."""
     service = get_drive_service()
-    if not service: return None
-    file_metadata = {
-        'name': 'Organigrama_Cargos.pdf',
-        'parents': [folder_id]
-    }
-    media = MediaFileUpload(file_path, mimetype='application/pdf')
-    # Borra versiones anteriores
-    query = f"'{folder_id}' in parents and name='Organigrama_Cargos.pdf' and trashed=false"
-    results = service.files().list(q=query, fields="files(id)").execute()
-    for f in results.get('files', []):
-        service.files().delete(fileId=f['id']).execute()
-    file = service.files().create(
-        body=file_metadata,
-        media_body=media,
-        fields='id',
-        supportsAllDrives=True
-    ).execute()
-    return file.get('id')
+    if not service: return None, None
+    anteriores = find_files_by_name(ORGANIGRAMA_FILENAME, folder_id)
+    md5 = _content_md5(pdf)
+    vigente = next((f for f in anteriores if f.get('md5Checksum') == md5), None)
+    # Borra versiones anteriores (en un solo lote HTTP), salvo la que ya tiene este mismo contenido
+    sobrantes = [f['id'] for f in anteriores if f is not vigente]
+    if sobrantes:
+        delete_files(sobrantes)
+    if vigente:
+        bump_stats("drive", subidas_omitidas=1)
+        return vigente['id'], md5
+    return upload_pdf_to_drive(pdf, ORGANIGRAMA_FILENAME, folder_id, replace=False)
 
 def find_organigrama_in_drive(folder_id):
     """Busca el PDF del organigrama en Drive."""
-    service = get_drive_service()
-    if not service: return None
-    query = f"'{folder_id}' in parents and name='Organigrama_Cargos.pdf' and trashed=false"
-    results = service.files().list(q=query, fields="files(id)").execute()
-    files = results.get('files', [])
+    files = find_files_by_name(ORGANIGRAMA_FILENAME, folder_id)
     if files:
         return files[0]['id']
     return None
@@ -127,24 +457,126 @@ def download_organigrama_from_drive(file_id):
     """Descarga el PDF del organigrama desde Drive."""
     return download_manual_from_drive(file_id)
 
+def run_batch(service, requests):
+    """
+    Ejecuta varias peticiones en lotes HTTP de Drive (new_batch_http_request), de a
+    BATCH_MAX_REQUESTS. `requests` es una lista de (clave, HttpRequest) con claves únicas.
+    Retorna {clave: (respuesta, excepción)}.
+    """
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    for i in range(0, len(requests), BATCH_MAX_REQUESTS):
+        batch = service.new_batch_http_request(callback=callback)
+        for key, request in requests[i:i + BATCH_MAX_REQUESTS]:
+            batch.add(request, request_id=str(key))
+        batch.execute()
+    return results
+
+def delete_files(file_ids):
+    """Borra varios archivos en lotes. Retorna {file_id: True/False}."""
+    service = get_drive_service()
+    if not service: return {}
+    file_ids = list(dict.fromkeys(file_ids))
+    results = run_batch(service, [(fid, service.files().delete(fileId=fid)) for fid in file_ids])
+    index = get_drive_index()
+    estado = {}
+    for fid in file_ids:
+        _, error = results.get(fid, (None, True))
+        # 404: ya no existía, el resultado es el mismo
+        estado[fid] = error is None or (isinstance(error, HttpError) and error.resp.status == 404)
+        if estado[fid] and index:
+            index.discard(fid)
+    forget_public([fid for fid, borrado in estado.items() if borrado])
+    return estado
+
+def get_files_metadata(file_ids, fields=FILE_FIELDS):
+    """Metadatos de varios archivos en lotes. Los que fallan (p. ej. 404) no aparecen en el resultado."""
+    service = get_drive_service()
+    if not service: return {}
+    file_ids = list(dict.fromkeys(file_ids))
+    requests = [(fid, service.files().get(fileId=fid, fields=fields, supportsAllDrives=True)) for fid in file_ids]
+    return {fid: resp for fid, (resp, error) in run_batch(service, requests).items() if error is None}
+
+def _public_cache():
+    """
+    {file_id: momento en que se publicó}. Las entradas vencidas (PUBLIC_CACHE_TTL) se descartan.
+    Una entrada se olvida antes si publicar falla o si Drive responde 403/404 al descargar el
+    archivo; un permiso 'anyone' quitado desde Drive (fuera de la app) solo se nota al vencer.
+    """
+    global _public_files
+    if _public_files is None:
+        guardado = read_json(cache_path("publicos.json"), {})
+        # Formato anterior (lista sin fecha): se tratan como vencidas y se vuelven a publicar
+        _public_files = guardado if isinstance(guardado, dict) else {}
+    vencimiento = time.time() - PUBLIC_CACHE_TTL
+    for fid in [fid for fid, cuando in _public_files.items() if cuando < vencimiento]:
+        del _public_files[fid]
+    return _public_files
+
+def _mark_public(file_ids):
+    with _public_files_lock:
+        cache = _public_cache()
+        ahora = time.time()
+        cache.update((fid, ahora) for fid in file_ids)
+        write_json(cache_path("publicos.json"), cache)
+
+def forget_public(file_ids):
+    """Olvida que estos archivos son públicos (p. ej. su enlace público falló o se borraron)."""
+    with _public_files_lock:
+        cache = _public_cache()
+        if any(cache.pop(fid, None) is not None for fid in list(file_ids)):
+            write_json(cache_path("publicos.json"), cache)
+
+def _public_permission_request(service, file_id):
+    return service.permissions().create(
+        fileId=file_id,
+        body={
+            'type': 'anyone',
+            'role': 'reader'
+        },
+        fields='id',
+        supportsAllDrives=True
+    )
+
+def set_files_public(file_ids):
+    """
+    Publica varios archivos (cualquiera con el enlace puede verlos) en lotes HTTP.
+    Los que ya se sabe que son públicos se omiten. Retorna {file_id: True/False}.
+    """
+    service = get_drive_service()
+    if not service: return {}
+    with _public_files_lock:
+        ya_publicos = _public_cache().keys() & set(file_ids)
+    pendientes = [fid for fid in dict.fromkeys(file_ids) if fid not in ya_publicos]
+    results = run_batch(service, [(fid, _public_permission_request(service, fid)) for fid in pendientes])
+    ok = [fid for fid in pendientes if results.get(fid, (None, True))[1] is None]
+    if ok:
+        _mark_public(ok)
+    if len(ok) < len(pendientes):
+        forget_public([fid for fid in pendientes if fid not in ok])
+    estado = {fid: True for fid in ya_publicos}
+    estado.update({fid: fid in ok for fid in pendientes})
+    return estado
+
 def set_file_public(file_id):
     """
     Cambia los permisos del archivo en Drive para que cualquiera con el enlace pueda verlo.
+    MEJORA: Si ya se publicó antes no se repite la escritura del permiso.
     """
+    with _public_files_lock:
+        if file_id in _public_cache():
+            return True
     service = get_drive_service()
     if not service:
         return False
     try:
-        service.permissions().create(
-            fileId=file_id,
-            body={
-                'type': 'anyone',
-                'role': 'reader'
-            },
-            fields='id',
-            supportsAllDrives=True
-        ).execute()
+        _public_permission_request(service, file_id).execute()
+        _mark_public([file_id])
         return True
     except Exception as e:
+        forget_public([file_id])
         st.error(f"Error al cambiar permisos en Drive: {e}")
         return False
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Índice de la línea de reporte (JEFE_DIRECTO -> NOMBRE COMPLETO), construido una vez por
+# versión de BD EMPLEADOS y compartido por el organigrama, el ruteo de evaluaciones y reportes.
+# - padre[i]: posición del jefe de i (-1 en las raíces).
+# - Recorrido de Euler en preorden: entrada[i] y salida[i] delimitan el subárbol de i en `orden`.
+#   "¿j está bajo i?" y "tamaño del equipo de i" son O(1); "todos los subordinados de i" es O(k)
+#   (un corte de `orden`) y la cadena de mando es O(profundidad).
+# - Los ciclos (A reporta a B y B a A) se cortan en su primer miembro, que queda como raíz, y los
+#   jefes que no existen en la base dejan al empleado como raíz (huérfano); ambos se reportan en
+#   lugar de perder nodos en silencio.
+
+MAX_INDICES = 4
+
+_indices = OrderedDict()
+_indices_lock = threading.Lock()
+
+def clave_nombre(nombre):
+    """Nombre normalizado (espacios y mayúsculas) para cruzar JEFE_DIRECTO con NOMBRE COMPLETO."""
+    if nombre is None or (isinstance(nombre, float) and nombre != nombre):
+        return ""
+    return " ".join(str(nombre).split()).upper()
+
+def _vacio(valor):
+    return valor is None or valor == "" or (isinstance(valor, float) and valor != valor)
+
+class HierarchyIndex:
+    """Jerarquía sobre nodos identificados por `claves`, con el padre de cada uno en `padres`."""
+
+    def __init__(self, claves, padres, etiquetas=None, normalizar=None):
+        """
+        claves: identificador de cada nodo; si se repite, los hijos cuelgan de la primera aparición.
+        padres: clave del padre de cada nodo (vacía o None = raíz).
+        etiquetas: texto a mostrar por nodo (por defecto la clave).
+        normalizar: función aplicada a las claves de consulta (p. ej. clave_nombre).
+        """
+        self.claves = list(claves)
+        self.etiquetas = list(etiquetas) if etiquetas is not None else self.claves
+        self._normalizar = normalizar or (lambda clave: clave)
+        self.posicion = {}
+        for i, clave in enumerate(self.claves):
+            self.posicion.setdefault(clave, i)
+        self.duplicados = sorted({c for i, c in enumerate(self.claves) if self.posicion[c] != i}, key=str)
+
+        padre = [-1] * len(self.claves)
+        self.huerfanos = []  # nodos cuyo padre no existe
+        for i, clave_padre in enumerate(padres):
+            if _vacio(clave_padre):
+                continue
+            j = self.posicion.get(clave_padre)
+            if j is None:
+                self.huerfanos.append(i)
+            elif j != i:
+                padre[i] = j
+        self.ciclos = self._cortar_ciclos(padre)
+        self._recorrer(padre)
+
+    @staticmethod
+    def _cortar_ciclos(padre):
+        """Detecta los ciclos siguiendo los punteros al padre; corta cada uno en su menor posición."""
+        estado = [0] * len(padre)  # 0 sin visitar, 1 en el camino actual, 2 resuelto
+        ciclos = []
+        for inicio in range(len(padre)):
+            if estado[inicio]:
+                continue
+            camino = []
+            v = inicio
+            while v != -1 and estado[v] == 0:
+                estado[v] = 1
+                camino.append(v)
+                v = padre[v]
+            if v != -1 and estado[v] == 1:
+                ciclo = camino[camino.index(v):]
+                padre[min(ciclo)] = -1
+                ciclos.append(ciclo)
+            for u in camino:
+                estado[u] = 2
+        return ciclos
+
+    def _recorrer(self, padre):
+        n = len(padre)
+        self.hijos = [[] for _ in range(n)]
+        self.raices = []
+        for i, p in enumerate(padre):
+            (self.hijos[p] if p >= 0 else self.raices).append(i)
+        entrada, profundidad, orden = [0] * n, [0] * n, []
+        for raiz in self.raices:
+            pila = [(raiz, 0)]
+            while pila:
+                v, nivel = pila.pop()
+                entrada[v] = len(orden)
+                profundidad[v] = nivel
+                orden.append(v)
+                pila.extend((h, nivel + 1) for h in reversed(self.hijos[v]))
+        tamano = [1] * n
+        for v in reversed(orden):
+            if padre[v] >= 0:
+                tamano[padre[v]] += tamano[v]
+        self.padre = np.array(padre, dtype=np.int64)
+        self.entrada = np.array(entrada, dtype=np.int64)
+        self.salida = self.entrada + np.array(tamano, dtype=np.int64)
+        self.profundidad = np.array(profundidad, dtype=np.int64)
+        self.orden = np.array(orden, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.claves)
+
+    def indice(self, clave):
+        """Posición del nodo con esa clave (normalizada), o None."""
+        return self.posicion.get(self._normalizar(clave))
+
+    def jefe(self, i):
+        p = int(self.padre[i])
+        return None if p < 0 else p
+
+    def es_ancestro(self, i, j):
+        """True si i está por encima de j (o es j). O(1)."""
+        return bool(self.entrada[i] <= self.entrada[j] < self.salida[i])
+
+    def tamano_equipo(self, i):
+        """Subordinados directos e indirectos de i. O(1)."""
+        return int(self.salida[i] - self.entrada[i] - 1)
+
+    def directos(self, i):
+        return list(self.hijos[i])
+
+    def subordinados(self, i):
+        """Todos los subordinados de i en preorden. O(k)."""
+        return self.orden[self.entrada[i] + 1:self.salida[i]].tolist()
+
+    def cadena_de_mando(self, i):
+        """Jefes de i desde el inmediato hasta la raíz. O(profundidad)."""
+        cadena = []
+        p = int(self.padre[i])
+        while p >= 0:
+            cadena.append(p)
+            p = int(self.padre[p])
+        return cadena
+
+    def etiqueta(self, i):
+        return self.etiquetas[i]
+
+    @classmethod
+    def desde_empleados(cls, df):
+        """Índice de personas de BD EMPLEADOS (NOMBRE COMPLETO / JEFE_DIRECTO)."""
+        nombres = df["NOMBRE COMPLETO"].tolist() if "NOMBRE COMPLETO" in df.columns else []
+        jefes = df["JEFE_DIRECTO"].tolist() if "JEFE_DIRECTO" in df.columns else [""] * len(nombres)
+        return cls([clave_nombre(n) for n in nombres], [clave_nombre(j) for j in jefes],
+                   etiquetas=nombres, normalizar=clave_nombre)
+
+def _fingerprint(df):
+    columnas = [c for c in ("NOMBRE COMPLETO", "JEFE_DIRECTO") if c in df.columns]
+    digest = hashlib.sha1("|".join(columnas).encode("utf-8"))
+    if len(df) and columnas:
+        digest.update(pd.util.hash_pandas_object(df[columnas], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def get_jerarquia(df):
+    """Índice de la línea de reporte para `df`; se reconstruye solo cuando cambian nombres o jefes."""
+    huella = _fingerprint(df)
+    with _indices_lock:
+        indice = _indices.get(huella)
+        if indice is not None:
+            _indices.move_to_end(huella)
+            return indice
+    indice = HierarchyIndex.desde_empleados(df)
+    with _indices_lock:
+        _indices[huella] = indice
+        while len(_indices) > MAX_INDICES:
+            _indices.popitem(last=False)
+    return indice
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Backends intercambiables para los flujos de IA.
+# - OpenAIBackend: producción (API real o cualquier endpoint compatible vía base_url).
+# - StubBackend: respuestas deterministas y válidas para pruebas de carga sin red.
+# Se elige con la variable de entorno LLM_BACKEND ("openai" por defecto o "stub").
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+class LLMBackendError(Exception):
+    """Error de un backend de IA. Conserva el status HTTP y los headers de rate-limit."""
+
+    def __init__(self, message, status_code=None, headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = {str(k).lower(): v for k, v in (headers or {}).items()}
+
+
+class LLMResult:
+    """Respuesta normalizada de un backend."""
+
+    def __init__(self, text, total_tokens=0, headers=None):
+        self.text = text
+        self.total_tokens = total_tokens
+        self.headers = {str(k).lower(): v for k, v in (headers or {}).items()}
+
+
+class OpenAIBackend:
+    name = "openai"
+
+    def __init__(self, api_key, base_url=None):
+        import openai
+        self._openai = openai
+        # Los reintentos y la espera los maneja el limitador de ai_brain.
+        self._client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=60)
+
+    def complete(self, messages, model=DEFAULT_MODEL, temperature=None, json_mode=False):
+        kwargs = {"model": model, "messages": messages}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+        try:
+            raw = self._client.chat.completions.with_raw_response.create(**kwargs)
+        except self._openai.APIStatusError as e:
+            raise LLMBackendError(str(e), e.status_code, dict(e.response.headers)) from e
+        except self._openai.APIConnectionError as e:
+            raise LLMBackendError(str(e)) from e
+        response = raw.parse()
+        total_tokens = response.usage.total_tokens if response.usage else 0
+        return LLMResult(response.choices[0].message.content or "", total_tokens, dict(raw.headers))
+
+
+# --- STUB LOCAL ---
+
+_OPCIONES_LIKERT = ["1 - Nunca", "2 - Rara vez", "3 - A veces", "4 - Frecuentemente", "5 - Siempre"]
+
+
+def _stub_evaluation():
+    temas = ["habilidades técnicas", "comunicación", "liderazgo", "trabajo en equipo", "cumplimiento de KPIs",
+             "innovación", "servicio al cliente", "pertenencia", "manejo del estrés", "aprendizaje continuo"]
+    preguntas = []
+    for i in range(30):
+        preguntas.append({
+            "texto": f"Pregunta {i + 1}: ¿Con qué frecuencia el colaborador demuestra {temas[i % len(temas)]}?",
+            "tipo": "likert",
+            "opciones": list(_OPCIONES_LIKERT),
+        })
+    return json.dumps({"preguntas": preguntas}, ensure_ascii=False)
+
+
+def _stub_section(titulo):
+    t = titulo.lower()
+    if "objetivo" in t:
+        return '<div class="mission-text">Garantizar la operación eficiente del cargo alineada con la estrategia de SERVINET.</div>'
+    if "funciones" in t:
+        items = "".join(f"<li>Función principal {i}</li>" for i in range(1, 7))
+        return f'<ul class="function-list">{items}</ul>'
+    if "kpi" in t:
+        filas = "".join(
+            f"<tr><td>KPI {i}</td><td>Mensual</td><td>95%</td><td>Mensual</td></tr>" for i in range(1, 5)
+        )
+        return f"<table><tr><th>KPI</th><th>Fórmula/Descripción</th><th>Meta</th><th>Frecuencia</th></tr>{filas}</table>"
+    if "perfil" in t:
+        return (
+            "<table>"
+            "<tr><th>Nivel educativo</th><td>Profesional o tecnólogo en áreas afines</td></tr>"
+            "<tr><th>Experiencia requerida</th><td>2 años en cargos similares</td></tr>"
+            "<tr><th>Conocimientos</th><td><ul><li>Redes</li><li>Ofimática</li></ul></td></tr>"
+            "<tr><th>Idiomas</th><td>Español nativo, inglés básico</td></tr>"
+            "</table>"
+        )
+    if "competencias" in t or "habilidades" in t:
+        tags = "".join(f'<span class="skill-tag">Competencia {i}</span>' for i in range(1, 6))
+        return f"<div>{tags}</div>"
+    return "<ul><li>Contenido generado por el stub local.</li><li>Sin conexión a la API.</li></ul>"
+
+
+def _stub_report():
+    return (
+        "### Reporte ejecutivo (stub)\n"
+        "1. 🏆 Nivel de competencia: 80%\n"
+        "2. 🧠 Estado emocional: estable\n"
+        "3. 🎓 Plan de capacitación: liderazgo, comunicación, herramientas técnicas\n"
+        "4. ⚠️ Alerta de retención: Bajo\n"
+    )
+
+
+def stub_response_text(prompt, json_mode=False):
+    """Texto canónico que devuelve el stub para un prompt dado (determinista)."""
+    if json_mode:
+        return _stub_evaluation()
+    marker = 'Genera únicamente el contenido para la sección "'
+    if marker in prompt:
+        titulo = prompt.split(marker, 1)[1].split('"', 1)[0]
+        return _stub_section(titulo)
+    if "Describe brevemente en una línea" in prompt:
+        return "Cargo responsable de ejecutar y coordinar los procesos de su área."
+    return _stub_report()
+
+
+class StubBackend:
+    """
+    Backend en proceso sin red. Latencia y tasa de error configurables;
+    con la misma semilla y el mismo orden de llamadas el resultado es idéntico.
+    """
+    name = "stub"
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def complete(self, messages, model=DEFAULT_MODEL, temperature=None, json_mode=False):
+        prompt = "\n".join(m.get("content", "") for m in messages)
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000.0)
+        if fail:
+            raise LLMBackendError(
+                "Stub: límite de tasa simulado",
+                status_code=429,
+                headers={"retry-after": "1", "x-ratelimit-remaining-requests": "0"},
+            )
+        text = stub_response_text(prompt, json_mode=json_mode)
+        return LLMResult(text, (len(prompt) + len(text)) // 4, {})
+
+
+def _stub_handler(backend):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+            try:
+                result = backend.complete(body.get("messages", []), body.get("model", DEFAULT_MODEL), json_mode=json_mode)
+            except LLMBackendError as e:
+                payload = json.dumps({"error": {"message": str(e), "type": "rate_limit"}}).encode()
+                self.send_response(e.status_code or 500)
+                for k, v in e.headers.items():
+                    self.send_header(k, v)
+            else:
+                payload = json.dumps({
+                    "id": "chatcmpl-" + hashlib.md5(result.text.encode()).hexdigest()[:12],
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", DEFAULT_MODEL),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": result.text}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": result.total_tokens,
+                              "total_tokens": result.total_tokens},
+                }, ensure_ascii=False).encode()
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve_stub(host="127.0.0.1", port=0, **stub_kwargs):
+    """
+    Levanta un servidor HTTP local compatible con /v1/chat/completions respaldado por StubBackend.
+    Útil para probar el SDK real de OpenAI apuntando OPENAI_BASE_URL a http://host:port/v1.
+    Retorna el servidor (server.server_address tiene el puerto asignado).
+    """
+    server = ThreadingHTTPServer((host, port), _stub_handler(StubBackend(**stub_kwargs)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def get_backend(api_key=None):
+    """Crea el backend configurado por entorno. Retorna None si falta la API key de OpenAI."""
+    kind = os.environ.get("LLM_BACKEND", "openai").strip().lower()
+    if kind == "stub":
+        return StubBackend(
+            latency_ms=float(os.environ.get("LLM_STUB_LATENCY_MS", 0)),
+            jitter_ms=float(os.environ.get("LLM_STUB_JITTER_MS", 0)),
+            error_rate=float(os.environ.get("LLM_STUB_ERROR_RATE", 0)),
+            seed=int(os.environ.get("LLM_STUB_SEED", 0)),
+        )
+    if not api_key:
+        return None
+    return OpenAIBackend(api_key, base_url=os.environ.get("OPENAI_BASE_URL") or None)
@@ -0,0 +1,498 @@
+import hashlib
+import textwrap
+import threading
+from collections import OrderedDict
+import pandas as pd
+from modules.hierarchy import HierarchyIndex, get_jerarquia
+
+# Modelo del organigrama por cargos (pages/1_📊_Organigrama.py), construido una vez por versión
+# de BD EMPLEADOS y compartido por todas las sesiones del proceso. La clave es una huella de las
+# columnas que usa el árbol: los reruns de la página (cualquier widget de la pestaña de fichas)
+# reutilizan la tabla de cargos, el árbol y la opción de ECharts ya armados.
+
+COLUMNAS_MODELO = ["CARGO", "DEPARTAMENTO", "NOMBRE COMPLETO", "CORREO", "CELULAR", "JEFE_DIRECTO"]
+MAX_MODELOS = 4  # versiones de la base que se conservan (p. ej. antes y después de una edición)
+
+COLORES_DEPARTAMENTO = {
+    "ADMINISTRATIVO": "#fef9c3", "OPERATIVO": "#dcfce7", "FINANZAS": "#fee2e2",
+    "COMERCIAL": "#dbeafe", "RRHH": "#fce7f3", "TECNOLOGÍA": "#f3e8ff",
+    "LOGÍSTICA": "#d1fae5", "DIRECCIÓN": "#fef08a", "JURÍDICO": "#fbcfe8",
+    "MARKETING": "#ffedd5", "OTROS": "#f1f5f9"
+}
+
+_modelos = OrderedDict()
+_modelos_lock = threading.Lock()
+_personas = OrderedDict()
+_personas_lock = threading.Lock()
+
+def wrap_text_node(text, width=20):
+    if not isinstance(text, str): return ""
+    return "\n".join(textwrap.wrap(text, width=width))
+
+def color_por_departamento(depto):
+    return COLORES_DEPARTAMENTO.get(str(depto).strip().upper(), "#f1f5f9")
+
+def fingerprint_empleados(df):
+    """Huella de las columnas de BD EMPLEADOS que usa el organigrama (hash vectorizado por fila)."""
+    columnas = [c for c in COLUMNAS_MODELO if c in df.columns]
+    digest = hashlib.sha1("|".join(columnas).encode("utf-8"))
+    if len(df):
+        digest.update(pd.util.hash_pandas_object(df[columnas], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _jefe_por_cargo(df):
+    """
+    Jefe directo más frecuente de cada (CARGO, DEPARTAMENTO). En empate gana el menor, igual
+    que Series.mode()[0]; los grupos sin jefe no aparecen.
+    """
+    conteos = df.groupby(["CARGO", "DEPARTAMENTO", "JEFE_DIRECTO"]).size().rename("n").reset_index()
+    conteos = conteos.sort_values(["n", "JEFE_DIRECTO"], ascending=[False, True], kind="mergesort")
+    return conteos.drop_duplicates(["CARGO", "DEPARTAMENTO"]).set_index(["CARGO", "DEPARTAMENTO"])["JEFE_DIRECTO"]
+
+def tabla_cargos(df):
+    """
+    Una fila por (CARGO, DEPARTAMENTO) con las listas de nombres, correos y celulares, el jefe
+    del cargo (por mayoría) y el cargo de ese jefe (PARENT_CARGO).
+    """
+    grupos = df.groupby(["CARGO", "DEPARTAMENTO"])
+    claves = grupos.size().index
+    posiciones = grupos.indices
+    nombres, correos, celulares = (df[c].tolist() for c in ("NOMBRE COMPLETO", "CORREO", "CELULAR"))
+    jefes = _jefe_por_cargo(df).to_dict()
+    nombre_a_cargo = dict(zip(nombres, df["CARGO"].tolist()))
+
+    filas = []
+    for clave in claves:
+        idx = posiciones[clave]
+        jefe = jefes.get(clave)
+        filas.append({
+            "CARGO": clave[0],
+            "DEPARTAMENTO": clave[1],
+            "NOMBRE_COMPLETO": [nombres[i] for i in idx],
+            "CORREO": [correos[i] for i in idx],
+            "CELULAR": [celulares[i] for i in idx],
+            "JEFE_DIRECTO_CARGO": jefe,
+            "PARENT_CARGO": nombre_a_cargo.get(jefe),
+        })
+    return pd.DataFrame(filas, columns=[
+        "CARGO", "DEPARTAMENTO", "NOMBRE_COMPLETO", "CORREO", "CELULAR", "JEFE_DIRECTO_CARGO", "PARENT_CARGO"
+    ])
+
+def arbol_cargos(cargos):
+    """
+    Árbol de cargos {name, data, children}; con varias raíces cuelgan de un nodo SERVINET.
+    Retorna (árbol, ciclos): un ciclo de cargos (A bajo B y B bajo A) se corta en su primer
+    cargo, que queda como raíz, en vez de desaparecer del organigrama.
+    """
+    nodes = {}
+    for registro in cargos.to_dict("records"):
+        nodes[registro["CARGO"]] = {"name": registro["CARGO"], "data": registro, "children": []}
+    lista = list(nodes.values())
+    indice = HierarchyIndex([n["name"] for n in lista], [n["data"].get("PARENT_CARGO") for n in lista])
+    for i, node in enumerate(lista):
+        node["children"] = [lista[h] for h in indice.hijos[i]]
+    forest = [lista[r] for r in indice.raices]
+    ciclos = [[lista[i]["name"] for i in ciclo] for ciclo in indice.ciclos]
+    if len(forest) > 1:
+        return {"name": "SERVINET", "data": {"CARGO": "SERVINET", "DEPARTAMENTO": "DIRECCIÓN", "NOMBRE_COMPLETO": []}, "children": forest}, ciclos
+    return (forest[0] if forest else {}), ciclos
+
+def _nodo_echarts(node):
+    data = node["data"]
+    cargo, depto, empleados = data.get("CARGO", "N/A"), data.get("DEPARTAMENTO", "OTROS"), data.get("NOMBRE_COMPLETO", [])
+    formatted_label = f"{{title|{wrap_text_node(cargo, 18)}}}\n{{hr|}}\n{{subtitle|{len(empleados)} Personas}}"
+    return {
+        "name": formatted_label, "value": len(empleados),
+        "itemStyle": {"color": color_por_departamento(depto), "borderColor": "#3b82f6", "borderWidth": 1.5, "borderRadius": 12, "shadowBlur": 10, "shadowColor": "rgba(0,0,0,0.08)"},
+        "tooltip_info": {
+            "cargo": cargo, "departamento": depto,
+            "empleados": [{"nombre": n, "correo": c, "celular": cel} for n, c, cel in zip(empleados, data.get("CORREO", []), data.get("CELULAR", []))]
+        },
+        "children": []
+    }
+
+def format_node_for_echarts(root):
+    """Árbol de cargos -> nodos de la serie tree de ECharts (recorrido iterativo, sin límite de profundidad)."""
+    salida = _nodo_echarts(root)
+    pila = [(root, salida)]
+    while pila:
+        node, destino = pila.pop()
+        for child in node.get("children", []):
+            formateado = _nodo_echarts(child)
+            destino["children"].append(formateado)
+            pila.append((child, formateado))
+    return salida
+
+def _serie_tree(data, **ajustes):
+    serie = {"type": "tree", "data": [data], "left": '2%', "right": '2%', "top": '8%', "bottom": '8%', "orient": 'TB', "layout": 'orthogonal', "symbol": 'rect', "symbolSize": [220, 65], "roam": True, "initialTreeDepth": 3, "expandAndCollapse": True, "edgeShape": "polyline", "edgeForkPosition": "50%", "lineStyle": {"color": "#94a3b8", "width": 1.5},
+        "label": {"show": True, "position": 'inside', "color": '#1e293b', "fontSize": 14, "rich": {
+                "title": {"color": "#003d6e", "fontSize": 15, "fontWeight": "bold", "align": "center", "lineHeight": 18},
+                "hr": {"borderColor": "#cbd5e1", "width": "100%", "borderWidth": 0.5, "height": 0, "margin": [4, 0, 4, 0]},
+                "subtitle": {"color": "#475569", "fontSize": 11, "align": "center", "lineHeight": 12}
+        }}, "animationDurationUpdate": 600
+    }
+    serie.update(ajustes)
+    return serie
+
+def opcion_echarts(tree_data):
+    """Opción completa de st_echarts para el organigrama por cargos."""
+    return {
+        "tooltip": {
+            "trigger": 'item', "triggerOn": 'mousemove|click', "enterable": True,
+            "formatter": """
+                function(params) {
+                    var info = params.data.tooltip_info; if (!info) return '';
+                    var html = `<div style="font-family: sans-serif; min-width: 280px; max-height: 350px; overflow-y: auto; padding: 12px; border-radius: 8px; background: white; box-shadow: 0 4px 12px rgba(0,0,0,0.15);">
+                                <h4 style="margin:0 0 8px 0; color: #1e3a8a; border-bottom: 2px solid #3b82f6; padding-bottom: 6px;">${info.cargo}</h4>
+                                <div style="font-size: 12px; color: #475569; margin-bottom: 10px;"><b>Departamento:</b> ${info.departamento} | <b>Total:</b> ${info.empleados.length}</div>
+                                <table style="width: 100%; border-collapse: collapse; font-size: 12px;">`;
+                    info.empleados.forEach(function(emp) { html += `<tr style="border-bottom: 1px solid #e2e8f0;"><td style="padding: 6px 4px; color: #334155;"><b>${emp.nombre}</b></td></tr>`; });
+                    html += `</table></div>`; return html;
+                }
+            """
+        },
+        "series": [_serie_tree(format_node_for_echarts(tree_data))]
+    }
+
+# --- VISTA LIGERA (CARGA BAJO DEMANDA) ---
+# La opción completa lleva todos los cargos y, en cada nodo, la lista de empleados del tooltip:
+# crece con la plantilla y viaja entera al navegador en cada render. La vista ligera envía solo
+# los primeros NIVELES_INICIALES niveles con conteos (personas del cargo y a cargo). Un clic en
+# un nodo vuelve a Python (evento de st_echarts): se agregan sus hijos a la opción y sus
+# empleados se muestran aparte, así el navegador solo recibe lo que se está viendo.
+
+NIVELES_INICIALES = 2
+EVENTO_CLIC = "function(params) { return params.data && params.data.id !== undefined ? [params.data.id, Date.now()] : undefined; }"
+
+def _escapar(texto):
+    return str(texto).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+class OrgModel:
+    """Tabla de cargos, árbol y opción de ECharts de una versión de BD EMPLEADOS (solo lectura)."""
+
+    def __init__(self, df, fingerprint):
+        self.fingerprint = fingerprint
+        self.cargos = tabla_cargos(df)
+        self.arbol, self.ciclos = arbol_cargos(self.cargos)
+        self.opcion = opcion_echarts(self.arbol) if self.arbol else None
+        self._indexar()
+
+    def _indexar(self):
+        """Ids en preorden (la raíz es 0), hijos, padre, nivel y totales del subárbol por nodo."""
+        self.nodos, self.hijos, self.padre, self.nivel = [], [], [], []
+        pila = [(self.arbol, -1)] if self.arbol else []
+        while pila:
+            node, padre = pila.pop()
+            i = len(self.nodos)
+            self.nodos.append(node)
+            self.hijos.append([])
+            self.padre.append(padre)
+            self.nivel.append(self.nivel[padre] + 1 if padre >= 0 else 0)
+            if padre >= 0:
+                self.hijos[padre].append(i)
+            pila.extend((child, i) for child in reversed(node.get("children", [])))
+        self.personas = [len(n["data"].get("NOMBRE_COMPLETO", [])) for n in self.nodos]
+        self.personas_subarbol = list(self.personas)
+        self.cargos_subarbol = [0] * len(self.nodos)
+        for i in range(len(self.nodos) - 1, 0, -1):  # preorden: cada hijo va después de su padre
+            p = self.padre[i]
+            self.personas_subarbol[p] += self.personas_subarbol[i]
+            self.cargos_subarbol[p] += self.cargos_subarbol[i] + 1
+
+    def descendientes(self, i):
+        pila, salida = list(self.hijos[i]), []
+        while pila:
+            j = pila.pop()
+            salida.append(j)
+            pila.extend(self.hijos[j])
+        return salida
+
+    def empleados(self, i):
+        """Empleados del cargo `i` como filas {nombre, correo, celular} (para mostrar bajo demanda)."""
+        data = self.nodos[i]["data"]
+        return [{"nombre": n, "correo": c, "celular": cel}
+                for n, c, cel in zip(data.get("NOMBRE_COMPLETO", []), data.get("CORREO", []), data.get("CELULAR", []))]
+
+    def _nodo_ligero(self, i, abierto):
+        data = self.nodos[i]["data"]
+        cargo, depto = data.get("CARGO", "N/A"), data.get("DEPARTAMENTO", "OTROS")
+        ocultos = len(self.hijos[i]) if not abierto else 0
+        subtitulo = f"{self.personas[i]} Personas" + (f" · ▸ {ocultos} cargos" if ocultos else "")
+        a_cargo = self.personas_subarbol[i] - self.personas[i]
+        return {
+            "id": str(i),
+            "name": f"{{title|{wrap_text_node(cargo, 18)}}}\n{{hr|}}\n{{subtitle|{subtitulo}}}",
+            "value": self.personas[i],
+            "itemStyle": {"color": color_por_departamento(depto), "borderColor": "#3b82f6", "borderWidth": 1.5, "borderRadius": 12,
+                          "borderType": "dashed" if ocultos else "solid"},
+            "tooltip": {"formatter": (
+                f"<b>{_escapar(cargo)}</b><br/>Departamento: {_escapar(depto)}<br/>"
+                f"Personas: {self.personas[i]} · A cargo: {a_cargo} en {self.cargos_subarbol[i]} cargos<br/>"
+                f"<i>Clic para {'ver empleados' if not self.hijos[i] else 'expandir/contraer y ver empleados'}</i>"
+            )},
+            "children": []
+        }
+
+    def opcion_ligera(self, expandidos=(), niveles=NIVELES_INICIALES):
+        """
+        Opción de la vista ligera: los primeros `niveles` niveles más los hijos de los nodos en
+        `expandidos` (ids). Sin listas de empleados; el tamaño depende solo de lo visible.
+        """
+        if not self.nodos:
+            return None
+        expandidos = set(expandidos)
+
+        def abierto(i):
+            return self.nivel[i] < niveles - 1 or i in expandidos
+
+        raiz = self._nodo_ligero(0, abierto(0))
+        pila = [(0, raiz)]
+        while pila:
+            i, destino = pila.pop()
+            if not abierto(i):
+                continue
+            for j in self.hijos[i]:
+                formateado = self._nodo_ligero(j, abierto(j))
+                destino["children"].append(formateado)
+                pila.append((j, formateado))
+        return {
+            "tooltip": {"trigger": 'item', "triggerOn": 'mousemove', "enterable": False},
+            "series": [_serie_tree(raiz, initialTreeDepth=-1, expandAndCollapse=False)]
+        }
+
+# --- ORGANIGRAMA POR PERSONAS ---
+# Cada empleado bajo su JEFE_DIRECTO (índice de modules.hierarchy). Con cientos de personas no se
+# puede enviar el árbol entero: el navegador recibe una serie `graph` con solo los nodos visibles y
+# sus coordenadas ya calculadas en Python (sin layout del lado del cliente).
+# - Nivel de detalle: un jefe cerrado muestra "▸ N a cargo"; uno abierto con más de MAX_DIRECTOS
+#   reportes los agrupa por departamento, y cada grupo se abre por separado.
+# - Búsqueda: abre solo la cadena de mando de la persona buscada.
+# El agrupado por departamento se calcula una vez por versión de los datos; el layout de cada
+# estado (nodos abiertos + selección) se guarda en una caché pequeña del modelo.
+
+MAX_DIRECTOS = 12
+MAX_LAYOUTS = 32
+RAIZ = "raiz"
+ANCHO_NODO, ALTO_NIVEL = 210, 120
+
+def _clave_persona(i):
+    return f"p:{i}"
+
+def _clave_grupo(padre, depto):
+    return f"g:{padre}:{depto}"
+
+class PersonOrgModel:
+    """Organigrama por personas de una versión de BD EMPLEADOS (solo lectura)."""
+
+    def __init__(self, df, fingerprint):
+        self.fingerprint = fingerprint
+        self.jerarquia = get_jerarquia(df)
+        n = len(self.jerarquia)
+        columna = lambda c: df[c].fillna("").astype(str).tolist() if c in df.columns else [""] * n
+        self.cargos = columna("CARGO")
+        self.departamentos = [d.strip().upper() or "OTROS" for d in columna("DEPARTAMENTO")]
+        self.correos = columna("CORREO")
+        # Reportes agrupados por departamento solo donde hacen falta (jefes con muchos directos)
+        self.grupos = {}
+        for padre, hijos in [(RAIZ, self.jerarquia.raices)] + list(enumerate(self.jerarquia.hijos)):
+            if len(hijos) > MAX_DIRECTOS:
+                por_depto = {}
+                for h in hijos:
+                    por_depto.setdefault(self.departamentos[h], []).append(h)
+                self.grupos[str(padre)] = dict(sorted(por_depto.items()))
+        self._layouts = OrderedDict()
+        self._layouts_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.jerarquia)
+
+    def _equipo(self, hijos):
+        return len(hijos) + sum(self.jerarquia.tamano_equipo(h) for h in hijos)
+
+    def _hijos_visibles(self, clave, expandidos):
+        """Claves de los hijos que se dibujan bajo `clave`: personas o grupos por departamento."""
+        if clave.startswith("g:"):
+            _, padre, depto = clave.split(":", 2)
+            miembros = self.grupos[padre][depto] if clave in expandidos else []
+            return [_clave_persona(h) for h in miembros]
+        if clave == RAIZ:
+            padre, hijos = RAIZ, self.jerarquia.raices
+        elif clave in expandidos:
+            padre = int(clave[2:])
+            hijos = self.jerarquia.hijos[padre]
+        else:
+            return []
+        grupos = self.grupos.get(str(padre))
+        if grupos is None:
+            return [_clave_persona(h) for h in hijos]
+        return [_clave_grupo(padre, depto) for depto in grupos]
+
+    def _arbol_visible(self, expandidos):
+        """Preorden de (clave, clave del padre) con lo que se ve para el conjunto `expandidos`."""
+        raices = self.jerarquia.raices
+        inicio = RAIZ if len(raices) != 1 else _clave_persona(raices[0])
+        visibles, pila = [], [(inicio, None)]
+        while pila:
+            clave, padre = pila.pop()
+            visibles.append((clave, padre))
+            pila.extend((h, clave) for h in reversed(self._hijos_visibles(clave, expandidos)))
+        return visibles
+
+    def _layout(self, visibles):
+        """Layout ordenado: hojas en columnas consecutivas, cada padre centrado sobre sus hijos."""
+        hijos = {clave: [] for clave, _ in visibles}
+        for clave, padre in visibles:
+            if padre is not None:
+                hijos[padre].append(clave)
+        x, y, columna = {}, {}, 0
+        for clave, padre in visibles:
+            y[clave] = y[padre] + 1 if padre is not None else 0
+            if not hijos[clave]:
+                x[clave] = columna
+                columna += 1
+        for clave, _ in reversed(visibles):
+            if hijos[clave]:
+                x[clave] = (x[hijos[clave][0]] + x[hijos[clave][-1]]) / 2
+        return x, y, columna
+
+    def _nodo(self, clave, expandidos, seleccion):
+        if clave == RAIZ:
+            total = len(self)
+            return {"name": f"{{title|SERVINET}}\n{{subtitle|{total} Personas}}", "color": color_por_departamento("DIRECCIÓN"),
+                    "tooltip": f"<b>SERVINET</b><br/>Personas: {total}", "abierto": True}
+        if clave.startswith("g:"):
+            _, padre, depto = clave.split(":", 2)
+            miembros = self.grupos[padre][depto]
+            abierto = clave in expandidos
+            return {"name": f"{{title|{wrap_text_node(depto, 20)}}}\n{{subtitle|{len(miembros)} directos{'' if abierto else ' · ▸'}}}",
+                    "color": color_por_departamento(depto), "abierto": abierto,
+                    "tooltip": (f"<b>{_escapar(depto)}</b><br/>Directos: {len(miembros)} · Equipo total: {self._equipo(miembros)}"
+                                f"<br/><i>Clic para {'contraer' if abierto else 'ver las personas'}</i>")}
+        i = int(clave[2:])
+        hijos = self.jerarquia.hijos[i]
+        abierto = clave in expandidos or not hijos
+        nombre = self.jerarquia.etiqueta(i)
+        subtitulo = wrap_text_node(self.cargos[i], 26).split("\n")[0] + ("" if abierto else f" · ▸ {self.jerarquia.tamano_equipo(i)} a cargo")
+        return {"name": f"{{title|{wrap_text_node(nombre, 22)}}}\n{{subtitle|{subtitulo}}}",
+                "color": color_por_departamento(self.departamentos[i]), "abierto": abierto, "seleccionado": i == seleccion,
+                "tooltip": (f"<b>{_escapar(nombre)}</b><br/>{_escapar(self.cargos[i])} · {_escapar(self.departamentos[i])}<br/>"
+                            f"{_escapar(self.correos[i])}<br/>Directos: {len(hijos)} · Equipo total: {self.jerarquia.tamano_equipo(i)}")}
+
+    def opcion(self, expandidos=(), seleccion=None):
+        """
+        Opción de st_echarts para los nodos visibles con `expandidos` (claves "p:<i>" y
+        "g:<jefe>:<depto>"); `seleccion` (posición) se resalta y centra la vista.
+        """
+        if not len(self):
+            return None
+        expandidos = frozenset(expandidos)
+        clave_cache = (expandidos, seleccion)
+        with self._layouts_lock:
+            opcion = self._layouts.get(clave_cache)
+            if opcion is not None:
+                self._layouts.move_to_end(clave_cache)
+                return opcion
+
+        visibles = self._arbol_visible(expandidos)
+        x, y, columnas = self._layout(visibles)
+        posicion = {clave: k for k, (clave, _) in enumerate(visibles)}
+        nodos, enlaces = [], []
+        for clave, padre in visibles:
+            info = self._nodo(clave, expandidos, seleccion)
+            nodos.append({
+                "id": clave, "name": info["name"], "x": x[clave] * ANCHO_NODO, "y": y[clave] * ALTO_NIVEL,
+                "itemStyle": {"color": info["color"], "borderRadius": 10,
+                              "borderColor": "#dc2626" if info.get("seleccionado") else "#3b82f6",
+                              "borderWidth": 3 if info.get("seleccionado") else 1.5,
+                              "borderType": "solid" if info["abierto"] else "dashed"},
+                "tooltip": {"formatter": info["tooltip"]},
+            })
+            if padre is not None:
+                enlaces.append({"source": posicion[padre], "target": posicion[clave]})
+
+        foco = _clave_persona(seleccion) if seleccion is not None and _clave_persona(seleccion) in x else visibles[0][0]
+        opcion = {
+            "tooltip": {"trigger": "item", "triggerOn": "mousemove", "enterable": False},
+            "series": [{
+                "type": "graph", "layout": "none", "roam": True, "data": nodos, "links": enlaces,
+                "symbol": "rect", "symbolSize": [190, 56], "nodeScaleRatio": 0.6,
+                "center": [x[foco] * ANCHO_NODO, y[foco] * ALTO_NIVEL], "zoom": min(max(1, columnas / 6), 20),
+                "label": {"show": True, "position": "inside", "rich": {
+                    "title": {"color": "#003d6e", "fontSize": 13, "fontWeight": "bold", "align": "center", "lineHeight": 16},
+                    "subtitle": {"color": "#475569", "fontSize": 10, "align": "center", "lineHeight": 12}
+                }},
+                "lineStyle": {"color": "#94a3b8", "width": 1.2}, "emphasis": {"focus": "adjacency"},
+                "animationDurationUpdate": 400
+            }]
+        }
+        with self._layouts_lock:
+            self._layouts[clave_cache] = opcion
+            while len(self._layouts) > MAX_LAYOUTS:
+                self._layouts.popitem(last=False)
+        return opcion
+
+    def alternar(self, expandidos, clave):
+        """Abre o cierra `clave`; al cerrar se cierran también los nodos y grupos que cuelgan de ella."""
+        expandidos = set(expandidos)
+        if clave not in expandidos:
+            expandidos.add(clave)
+            return expandidos
+        expandidos.discard(clave)
+        if clave.startswith("p:"):
+            raices = [int(clave[2:])]
+        else:
+            _, padre, depto = clave.split(":", 2)
+            raices = self.grupos[padre][depto]
+
+        def cuelga(otra):
+            jefe = otra.split(":")[1]
+            return jefe != RAIZ and any(self.jerarquia.es_ancestro(r, int(jefe)) for r in raices)
+        return {c for c in expandidos if not cuelga(c)}
+
+    def iniciales(self):
+        """Claves abiertas al cargar: la raíz (o las raíces) con su primer nivel de reportes."""
+        raices = self.jerarquia.raices
+        return {_clave_persona(raices[0])} if len(raices) == 1 else set()
+
+    def camino(self, i):
+        """Claves a abrir para que se vea la persona `i`: su cadena de mando y los grupos intermedios."""
+        cadena = self.jerarquia.cadena_de_mando(i)
+        claves = set()
+        for sub, jefe in zip([i] + cadena, cadena):
+            claves.add(_clave_persona(jefe))
+            if str(jefe) in self.grupos:
+                claves.add(_clave_grupo(jefe, self.departamentos[sub]))
+        tope = cadena[-1] if cadena else i
+        if RAIZ in self.grupos and len(self.jerarquia.raices) != 1:
+            claves.add(_clave_grupo(RAIZ, self.departamentos[tope]))
+        return claves
+
+def get_person_model(df):
+    """Organigrama por personas para `df`; se construye solo cuando cambia la huella de los datos."""
+    huella = fingerprint_empleados(df)
+    with _personas_lock:
+        modelo = _personas.get(huella)
+        if modelo is not None:
+            _personas.move_to_end(huella)
+            return modelo
+    modelo = PersonOrgModel(df, huella)
+    with _personas_lock:
+        _personas[huella] = modelo
+        while len(_personas) > MAX_MODELOS:
+            _personas.popitem(last=False)
+    return modelo
+
+def get_org_model(df):
+    """Modelo del organigrama para `df`; se construye solo cuando cambia la huella de los datos."""
+    huella = fingerprint_empleados(df)
+    with _modelos_lock:
+        modelo = _modelos.get(huella)
+        if modelo is not None:
+            _modelos.move_to_end(huella)
+            return modelo
+    modelo = OrgModel(df, huella)
+    with _modelos_lock:
+        _modelos[huella] = modelo
+        while len(_modelos) > MAX_MODELOS:
+            _modelos.popitem(last=False)
+    return modelo
@@ -1,33 +1,749 @@
 from fpdf import FPDF
-from weasyprint import HTML
-from jinja2 import Environment, FileSystemLoader
+from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
+from weasyprint.urls import URLFetcher, URLFetcherResponse
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+import io
 import os
 import re
 import datetime
-from bs4 import BeautifulSoup
+import time
+import uuid
+import hashlib
+import threading
+import mimetypes
+import multiprocessing
+import multiprocessing.connection
+from concurrent.futures import Future
+from collections import OrderedDict, deque
+from pathlib import Path
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+from lxml import html as lxml_html
+from PyPDF2 import PdfReader, PdfWriter
+import pandas as pd
+from modules.cache_store import cache_path, atomic_write, file_lock, evict_lru, bump_stats, read_stats
+
+# --- REGISTRO DE PLANTILLAS ---
+# Un solo Environment por proceso: las plantillas se compilan una vez y el bytecode se guarda
+# en .cache/jinja para los siguientes procesos. En producción no se revisa el disco en cada
+# render; con SERVINET_ENV=development las plantillas se recargan al editarlas.
+# Los bloques <style> y los <link> a hojas locales (p. ej. modules/fontawesome) se separan de
+# la plantilla y se pre-parsean una sola vez como CSS de WeasyPrint, que se pasa en
+# `stylesheets` en cada render.
+
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(TEMPLATE_DIR)
+DEV_MODE = os.environ.get("SERVINET_ENV", "").strip().lower() in ("dev", "development")
+
+# Hosts a los que el render puede salir (fotos de empleados en foto_url). Todo lo demás se rechaza.
+PDF_ALLOWED_HOSTS = {
+    h.strip().lower()
+    for h in os.environ.get("PDF_ALLOWED_HOSTS", "drive.google.com,lh3.googleusercontent.com").split(",")
+    if h.strip()
+}
+ASSET_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+_STYLE_RE = re.compile(r"<style[^>]*>(.*?)</style>", re.DOTALL | re.IGNORECASE)
+_LINK_RE = re.compile(r"""<link[^>]*rel=["']stylesheet["'][^>]*href=["'](?!https?:)([^"']+)["'][^>]*>\s*""", re.IGNORECASE)
+_registry_lock = threading.Lock()
+_jinja_env = None
+_stylesheets = {}
+_template_versions = {}
+
+class AssetURLFetcher(URLFetcher):
+    """
+    url_fetcher de WeasyPrint: sirve archivos del proyecto desde una caché en memoria y solo
+    permite red hacia PDF_ALLOWED_HOSTS, así el render no depende de la conexión.
+    """
+
+    def __init__(self):
+        super().__init__(timeout=10)
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_lock = threading.Lock()
+
+    def _cached(self, url, version):
+        with self._cache_lock:
+            entry = self._cache.get(url)
+            if entry and entry[0] == version:
+                self._cache.move_to_end(url)
+                return entry[1], entry[2]
+        return None
+
+    def _store(self, url, version, body, content_type):
+        with self._cache_lock:
+            old = self._cache.pop(url, None)
+            if old:
+                self._cache_bytes -= len(old[1])
+            self._cache[url] = (version, body, content_type)
+            self._cache_bytes += len(body)
+            while self._cache_bytes > ASSET_CACHE_MAX_BYTES and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted[1])
+
+    def fetch(self, url, headers=None):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme == "data":
+            return super().fetch(url, headers)
+        if scheme == "file":
+            path = os.path.realpath(url2pathname(parts.path))
+            if not path.startswith(PROJECT_DIR + os.sep):
+                raise ValueError(f"Archivo fuera del proyecto bloqueado: {url}")
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+            hit = self._cached(url, version)
+            if hit is None:
+                with open(path, "rb") as f:
+                    hit = (f.read(), mimetypes.guess_type(path)[0] or "application/octet-stream")
+                self._store(url, version, *hit)
+        elif scheme in ("http", "https"):
+            if (parts.hostname or "").lower() not in PDF_ALLOWED_HOSTS:
+                raise ValueError(f"Acceso de red no permitido durante el render: {url}")
+            hit = self._cached(url, None)
+            if hit is None:
+                response = super().fetch(url, headers)
+                try:
+                    hit = (response.read(), response.content_type)
+                finally:
+                    response.close()
+                self._store(url, None, *hit)
+        else:
+            raise ValueError(f"Protocolo no permitido durante el render: {url}")
+        body, content_type = hit
+        return URLFetcherResponse(url, body, {"Content-Type": content_type})
+
+# Compartidos por todos los renders del proceso: la caché de recursos y las fuentes de @font-face.
+url_fetcher = AssetURLFetcher()
+font_config = FontConfiguration()
+
+class _StyleSplittingLoader(FileSystemLoader):
+    """FileSystemLoader que retira los <style> y <link> locales de la fuente y los registra como CSS aparte."""
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        _template_versions[template] = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+        links = tuple(_LINK_RE.findall(source))
+        css_text = "\n".join(_STYLE_RE.findall(source))
+        with _registry_lock:
+            cached = _stylesheets.get(template)
+            if cached is None or cached[0] != (links, css_text):
+                sheets = [
+                    CSS(url=Path(TEMPLATE_DIR, href).as_uri(), url_fetcher=url_fetcher, font_config=font_config)
+                    for href in links
+                ]
+                if css_text:
+                    sheets.append(CSS(string=css_text, base_url=TEMPLATE_DIR, url_fetcher=url_fetcher, font_config=font_config))
+                _stylesheets[template] = ((links, css_text), sheets)
+        return _STYLE_RE.sub("", _LINK_RE.sub("", source)), filename, uptodate
+
+def get_template_env():
+    """Environment de Jinja compartido por todo el proceso."""
+    global _jinja_env
+    if _jinja_env is None:
+        with _registry_lock:
+            if _jinja_env is None:
+                _jinja_env = Environment(
+                    loader=_StyleSplittingLoader(TEMPLATE_DIR),
+                    bytecode_cache=FileSystemBytecodeCache(os.path.dirname(cache_path("jinja", "bytecode"))),
+                    auto_reload=DEV_MODE,
+                )
+    return _jinja_env
+
+def get_template(name):
+    """Plantilla compilada (se compila una vez por proceso)."""
+    return get_template_env().get_template(name)
+
+def get_template_stylesheets(name):
+    """Hojas de estilo pre-parseadas de los <link> locales y <style> de la plantilla."""
+    if name not in _stylesheets:
+        get_template(name)
+    return _stylesheets[name][1]
+
+# --- SALIDA OPTIMIZADA ---
+# Con PDF_OPTIMIZE=1 (por defecto) los PDFs salen más livianos para WhatsApp y Drive:
+# - el logo se reduce una vez por proceso a LOGO_MAX_PX (se muestra a ~50 px) y se guarda en
+#   .cache/assets;
+# - el cuerpo usa solo DejaVu Sans de modules/fonts (más Font Awesome en los íconos) en vez de
+#   lo que fontconfig elija para 'Segoe UI'/Roboto/Helvetica; WeasyPrint incrusta solo los
+#   glifos usados (full_fonts=False);
+# - WeasyPrint recomprime las imágenes (optimize_images, jpeg_quality, dpi) y reutiliza las
+#   imágenes decodificadas entre renders del proceso (cache).
+# PDF_OPTIMIZE=0 vuelve a la salida anterior. benchmarks/bench_pdf_optimizado.py compara ambas.
+
+PDF_OPTIMIZE = os.environ.get("PDF_OPTIMIZE", "1").strip().lower() not in ("0", "false", "no")
+PDF_JPEG_QUALITY = int(os.environ.get("PDF_JPEG_QUALITY", 80))
+PDF_DPI = int(os.environ.get("PDF_DPI", 150))
+LOGO_PATH = os.path.join(PROJECT_DIR, "logo_servinet.jpg")
+LOGO_MAX_PX = 200
+
+_FUENTES_OPTIMIZADAS = """
+@font-face { font-family: 'DejaVu Sans'; src: url(fonts/DejaVuSans.ttf); }
+@font-face { font-family: 'DejaVu Sans'; font-weight: bold; src: url(fonts/DejaVuSans-Bold.ttf); }
+@font-face { font-family: 'DejaVu Sans'; font-style: italic; src: url(fonts/DejaVuSans-Oblique.ttf); }
+@font-face { font-family: 'DejaVu Sans'; font-weight: bold; font-style: italic; src: url(fonts/DejaVuSans-BoldOblique.ttf); }
+body { font-family: 'DejaVu Sans', sans-serif; }
+"""
+_logos = {}
+_image_cache = {}
+_optimized_sheet = None
+
+def logo_url():
+    """Ruta absoluta del logo para las plantillas (reducido en modo optimizado); None si no existe."""
+    if not os.path.exists(LOGO_PATH):
+        return None
+    if not PDF_OPTIMIZE:
+        return LOGO_PATH
+    stat = os.stat(LOGO_PATH)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _registry_lock:
+        cached = _logos.get(version)
+        if cached and os.path.exists(cached):
+            return cached
+        from PIL import Image
+        path = cache_path("assets", f"logo_{stat.st_mtime_ns:x}_{stat.st_size:x}_{LOGO_MAX_PX}.jpg")
+        if not os.path.exists(path):
+            with Image.open(LOGO_PATH) as im:
+                im = im.convert("RGB")
+                im.thumbnail((LOGO_MAX_PX, LOGO_MAX_PX), Image.LANCZOS)
+                buffer = io.BytesIO()
+                im.save(buffer, "JPEG", quality=85, optimize=True, progressive=True)
+            atomic_write(path, buffer.getvalue())
+        _logos[version] = path
+        return path
+
+def _pdf_options(name):
+    """Argumentos de write_pdf para la plantilla `name` según el modo de salida."""
+    global _optimized_sheet
+    options = {"stylesheets": list(get_template_stylesheets(name)), "font_config": font_config}
+    if PDF_OPTIMIZE:
+        if _optimized_sheet is None:
+            _optimized_sheet = CSS(string=_FUENTES_OPTIMIZADAS, base_url=TEMPLATE_DIR,
+                                   url_fetcher=url_fetcher, font_config=font_config)
+        options["stylesheets"].append(_optimized_sheet)  # al final: gana sobre el body de la plantilla
+        options.update(optimize_images=True, jpeg_quality=PDF_JPEG_QUALITY, dpi=PDF_DPI,
+                       full_fonts=False, cache=_image_cache)
+    return options
+
+# --- CACHÉ DE RENDER POR CONTENIDO ---
+# Clave = hash del HTML final + versión de la plantilla. Si el HTML no cambió (p. ej. un
+# organigrama regenerado sin cambios de personal) se devuelven los mismos bytes del PDF
+# anterior sin pasar por WeasyPrint; como los bytes son idénticos, upload_pdf_to_drive
+# detecta por md5 que el archivo en Drive ya está al día y tampoco lo sube.
+# Los PDFs viven en .cache/pdf_render (compartido por los workers) con desalojo LRU.
+
+RENDER_CACHE_VERSION = "1"  # subir si cambia algo que afecta al PDF y no está en el HTML
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("PDF_RENDER_CACHE_MAX_MB", 100)) * 1024 * 1024
+
+def render_template_html(name, **context):
+    return get_template(name).render(**context)
+
+def render_cache_key(name, html_content):
+    get_template(name)  # asegura que la versión de la plantilla esté registrada
+    modo = "opt" if PDF_OPTIMIZE else "std"  # el modo de salida cambia el PDF sin cambiar el HTML
+    digest = hashlib.sha256(f"{RENDER_CACHE_VERSION}:{modo}:{name}:{_template_versions[name]}\n".encode("utf-8"))
+    digest.update(html_content.encode("utf-8"))
+    return digest.hexdigest()
+
+def _render_cache_get(key):
+    path = cache_path("pdf_render", f"{key}.pdf")
+    try:
+        with open(path, "rb") as f:
+            pdf = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)  # marca de uso para el LRU
+    except FileNotFoundError:
+        pass
+    return pdf
+
+def _render_cache_put(key, pdf):
+    path = cache_path("pdf_render", f"{key}.pdf")
+    atomic_write(path, pdf)
+    with file_lock("pdf_render"):
+        evict_lru(os.path.dirname(path), RENDER_CACHE_MAX_BYTES, "*.pdf")
+
+def render_cache_stats():
+    """
+    Estadísticas de la caché de render (aciertos, renders, subidas omitidas, tamaño en disco) y
+    tamaño y tiempo medio de los renders reales.
+    """
+    directory = os.path.dirname(cache_path("pdf_render", "x.pdf"))
+    archivos = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".pdf")]
+    stats = read_stats("pdf_render")
+    return {
+        "aciertos": stats.get("aciertos", 0),
+        "renders": stats.get("renders", 0),
+        "subidas_omitidas": read_stats("drive").get("subidas_omitidas", 0),
+        "entradas": len(archivos),
+        "bytes": sum(os.path.getsize(f) for f in archivos if os.path.exists(f)),
+        "kb_medio": round(stats.get("bytes_render", 0) / 1024 / stats["renders"], 1) if stats.get("renders") else None,
+        "ms_medio": round(stats.get("ms_render", 0) / stats["renders"]) if stats.get("renders") else None,
+    }
+
+def render_html_pdf(name, html_content, key=None):
+    """HTML final de una plantilla -> bytes del PDF, usando la caché por contenido."""
+    key = key or render_cache_key(name, html_content)
+    pdf = _render_cache_get(key)
+    if pdf is not None:
+        bump_stats("pdf_render", aciertos=1)
+        return pdf
+    inicio = time.perf_counter()
+    pdf = HTML(string=html_content, base_url=TEMPLATE_DIR, url_fetcher=url_fetcher).write_pdf(**_pdf_options(name))
+    ms = round((time.perf_counter() - inicio) * 1000)
+    _render_cache_put(key, pdf)
+    bump_stats("pdf_render", renders=1, bytes_render=len(pdf), ms_render=ms)
+    return pdf
+
+def render_template_pdf(name, target=None, **context):
+    """
+    Renderiza la plantilla con WeasyPrint usando el CSS pre-parseado, el url_fetcher local
+    y la caché por contenido. Sin target retorna los bytes del PDF; con target los escribe
+    en esa ruta o archivo.
+    """
+    pdf = render_html_pdf(name, render_template_html(name, **context))
+    if target is None:
+        return pdf
+    if isinstance(target, str):
+        with open(target, "wb") as f:
+            f.write(pdf)
+    else:
+        target.write(pdf)
+
+def _parts_cache_key(keys):
+    return keys[0] if len(keys) == 1 else hashlib.sha256("|".join(keys).encode("utf-8")).hexdigest()
+
+def _merge_pdfs(pdfs):
+    writer = PdfWriter()
+    for pdf in pdfs:
+        for page in PdfReader(io.BytesIO(pdf)).pages:
+            writer.add_page(page)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+def render_parts_pdf(name, html_parts, keys=None):
+    """
+    Renderiza varias partes HTML de la misma plantilla una tras otra (memoria acotada a la
+    parte más grande) y las une en un solo PDF. Cada parte y el resultado usan la caché.
+    """
+    keys = keys or [render_cache_key(name, h) for h in html_parts]
+    if len(html_parts) == 1:
+        return render_html_pdf(name, html_parts[0], keys[0])
+    key = _parts_cache_key(keys)
+    pdf = _render_cache_get(key)
+    if pdf is None:
+        pdf = _merge_pdfs([render_html_pdf(name, h, k) for h, k in zip(html_parts, keys)])
+        _render_cache_put(key, pdf)
+    return pdf
+
+# --- SERVICIO DE RENDER EN PROCESOS ---
+# write_pdf es CPU intensivo; los renders se envían a procesos worker compartidos para no
+# bloquear el hilo de la sesión ni competir por el GIL. Cada trabajo tiene un id que la página
+# consulta (render_status / wait_render). Cada worker tiene un tope de memoria virtual
+# (RLIMIT_AS): PDF_RENDER_MEMORY_MB sumado a lo que mide el worker al arrancar.
+# Cada worker es un proceso propio con su canal: un hilo despachador le asigna un trabajo a la
+# vez y mide RENDER_TIMEOUT desde que lo toma (no desde que se encoló). Un trabajo atascado
+# termina solo su worker, que se reemplaza; los renders de las demás sesiones siguen.
+# Los workers arrancan con forkserver (spawn en Windows): un fork del servidor multihilo
+# puede heredar locks tomados por otros hilos (logging, clientes HTTP, fontconfig).
+
+RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", 2))
+RENDER_TIMEOUT = float(os.environ.get("PDF_RENDER_TIMEOUT", 180))
+RENDER_MEMORY_MB = int(os.environ.get("PDF_RENDER_MEMORY_MB", 768))
+RENDER_JOB_TTL = 600  # segundos que se conserva un resultado no reclamado
+
+class RenderError(Exception):
+    """Falla, expiración o id desconocido de un trabajo de render."""
+
+class _RenderTimeout(Exception):
+    pass
+
+class _WorkerCaido(Exception):
+    pass
+
+def _render_context():
+    return multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+def _render_worker_init(memory_mb):
+    """
+    Inicializador de cada worker: limita su memoria virtual (RLIMIT_AS) a la que mide al arrancar
+    más memory_mb. El worker sale del forkserver (o de spawn), no del servidor: lo medido es el
+    intérprete con este módulo ya importado (WeasyPrint, Pango, Jinja), así que memory_mb es el
+    margen para el render en sí, no un tope absoluto del proceso.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        current = 0
+    try:
+        import resource
+        limit = current + memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass  # Windows o límite no permitido: el worker corre sin tope
+
+def _render_worker_main(conn, memory_mb):
+    """Bucle del worker: recibe (name, html_parts, keys), responde (True, pdf) o (False, excepción)."""
+    _render_worker_init(memory_mb)
+    while True:
+        try:
+            mensaje = conn.recv()
+        except EOFError:
+            return
+        if mensaje is None:
+            return
+        try:
+            respuesta = (True, render_parts_pdf(*mensaje))
+        except BaseException as e:
+            respuesta = (False, e)
+        try:
+            conn.send(respuesta)
+        except Exception as e:  # excepción no serializable
+            conn.send((False, RuntimeError(f"{type(respuesta[1]).__name__}: {e}")))
+
+class _RenderJob:
+    def __init__(self, kind, future, payload=None, cached=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.future = future
+        self.payload = payload  # (name, html_parts, keys) hasta que un worker lo toma
+        self.cached = cached
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.error = None
+
+class _RenderWorker:
+    """Un proceso de render con su canal; ejecuta un trabajo a la vez."""
+
+    def __init__(self, context, memory_mb):
+        self.conn, hijo = context.Pipe()
+        self.process = context.Process(target=_render_worker_main, args=(hijo, memory_mb), daemon=True)
+        self.process.start()
+        hijo.close()
+        self.job = None
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join(5)
+        self.conn.close()
+
+class RenderService:
+    """Workers de render PDF con ids de trabajo, consulta de estado y timeouts por trabajo."""
+
+    def __init__(self, workers=RENDER_WORKERS, timeout=RENDER_TIMEOUT, memory_mb=RENDER_MEMORY_MB):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self._context = _render_context()
+        self._workers = []
+        self._queue = deque()
+        self._jobs = {}
+        self._durations = {}  # kind -> duración media (s), para estimar el progreso
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._dispatcher = None
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="pdf-render-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def _assign(self):
+        """Entrega trabajos en cola a workers libres (crea workers hasta self.workers)."""
+        while self._queue:
+            worker = next((w for w in self._workers if w.job is None), None)
+            if worker is None and len(self._workers) < self.workers:
+                try:
+                    worker = _RenderWorker(self._context, self.memory_mb)
+                except Exception as e:  # sin procesos disponibles: falla el trabajo, no el despachador
+                    job = self._queue.popleft()
+                    if job.future.set_running_or_notify_cancel():
+                        job.future.set_exception(_WorkerCaido(f"No se pudo iniciar el proceso de render: {e}"))
+                    continue
+                self._workers.append(worker)
+            if worker is None:
+                return
+            job = self._queue.popleft()
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                worker.conn.send(job.payload)
+            except (OSError, ValueError):
+                self._replace(worker, job, _WorkerCaido("El proceso de render terminó inesperadamente."))
+                continue
+            job.payload = None
+            job.started = time.monotonic()
+            worker.job = job
+
+    def _replace(self, worker, job, exc):
+        """Termina un worker (caído o atascado), falla solo su trabajo y deja lugar a uno nuevo."""
+        worker.stop()
+        self._workers.remove(worker)
+        worker.job = None
+        if not job.future.done():
+            job.future.set_exception(exc)
+
+    def _collect(self, worker):
+        job = worker.job
+        try:
+            ok, valor = worker.conn.recv()
+        except (EOFError, OSError):
+            self._replace(worker, job, _WorkerCaido("El proceso de render terminó inesperadamente."))
+            return
+        worker.job = None
+        if ok:
+            job.future.set_result(valor)
+        else:
+            job.future.set_exception(valor)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._lock:
+                self._assign()
+                ocupados = [w for w in self._workers if w.job is not None]
+            if not ocupados:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            esperables = [w.conn for w in ocupados] + [w.process.sentinel for w in ocupados]
+            listos = multiprocessing.connection.wait(esperables, timeout=0.5)
+            with self._lock:
+                now = time.monotonic()
+                for worker in ocupados:
+                    if worker.conn in listos:
+                        self._collect(worker)
+                    elif worker.process.sentinel in listos:
+                        self._replace(worker, worker.job, _WorkerCaido("El proceso de render terminó inesperadamente."))
+                    elif now - worker.job.started > self.timeout:
+                        self._replace(worker, worker.job, _RenderTimeout())
+
+    def submit(self, kind, *args, **kwargs):
+        """
+        Encola un render ('manual', 'organigrama' u 'organigrama_master'). Retorna el id del trabajo.
+        Si la plantilla se divide en partes (organigrama por departamento) el worker las renderiza
+        en secuencia y las une.
+        """
+        if kind not in _RENDER_KINDS:
+            raise ValueError(f"Tipo de render desconocido: {kind}")
+        # La plantilla se llena aquí (rápido) para consultar la caché antes de ocupar un worker;
+        # al worker solo viaja el HTML final.
+        name, contexto = _RENDER_KINDS[kind](*args, **kwargs)
+        html_parts = [render_template_html(name, **c) for c in (contexto if isinstance(contexto, list) else [contexto])]
+        keys = [render_cache_key(name, h) for h in html_parts]
+        cached = _render_cache_get(_parts_cache_key(keys))
+        if cached is not None:
+            bump_stats("pdf_render", aciertos=1)
+        future = Future()
+        with self._lock:
+            self._prune()
+            if cached is not None:
+                future.set_result(cached)
+                job = _RenderJob(kind, future, cached=True)
+            else:
+                job = _RenderJob(kind, future, payload=(name, html_parts, keys))
+                self._queue.append(job)
+            self._jobs[job.id] = job
+        if cached is None:
+            self._ensure_dispatcher()
+            self._wake.set()
+        return job.id
+
+    def _job(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise RenderError(f"Trabajo de render desconocido o expirado: {job_id}")
+        return job
+
+    def _settle(self, job):
+        """Actualiza el estado del trabajo: registra fin, error o timeout."""
+        if job.finished is not None or not job.future.done():
+            return
+        now = job.finished = time.monotonic()
+        if job.future.cancelled():
+            job.error = "Render cancelado."
+            return
+        exc = job.future.exception()
+        if exc is None:
+            if not job.cached:  # los aciertos de caché no cuentan para la duración esperada
+                duration = now - (job.started or job.submitted)
+                prev = self._durations.get(job.kind)
+                self._durations[job.kind] = duration if prev is None else 0.7 * prev + 0.3 * duration
+        elif isinstance(exc, _RenderTimeout):
+            job.error = f"El render superó el tiempo límite ({int(self.timeout)} s)."
+        elif isinstance(exc, MemoryError):
+            job.error = f"El render superó el límite de memoria ({self.memory_mb} MB)."
+        elif isinstance(exc, _WorkerCaido):
+            job.error = str(exc)
+        else:
+            job.error = f"{type(exc).__name__}: {exc}"
+
+    def status(self, job_id):
+        """Estado del trabajo: estado (pendiente|en_proceso|listo|error), progreso estimado 0-1, segundos y error."""
+        with self._lock:
+            job = self._job(job_id)
+            self._settle(job)
+            elapsed = (job.finished or time.monotonic()) - job.submitted
+            if job.error:
+                estado, progreso = "error", 1.0
+            elif job.finished is not None:
+                estado, progreso = "listo", 1.0
+            elif job.started is None:
+                estado, progreso = "pendiente", 0.0
+            else:
+                estado = "en_proceso"
+                esperado = self._durations.get(job.kind, 10.0)
+                progreso = min((time.monotonic() - job.started) / esperado, 0.95)
+            return {"id": job_id, "estado": estado, "progreso": progreso,
+                    "segundos": round(elapsed, 1), "error": job.error}
+
+    def result(self, job_id):
+        """Bytes del PDF de un trabajo terminado; lo retira del registro. Lanza RenderError si falló."""
+        with self._lock:
+            job = self._job(job_id)
+            self._settle(job)
+            if job.finished is None:
+                raise RenderError(f"El trabajo {job_id} aún no termina.")
+            del self._jobs[job_id]
+            if job.error:
+                raise RenderError(job.error)
+            return job.future.result()
+
+    def _prune(self):
+        """Descarta resultados que nadie reclamó en RENDER_JOB_TTL (todo trabajo termina: hay timeout)."""
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            self._settle(job)
+            if job.finished is not None and now - job.finished > RENDER_JOB_TTL:
+                del self._jobs[job_id]
+
+_render_service = None
+_render_service_lock = threading.Lock()
+
+def get_render_service():
+    """Servicio de render compartido por todas las sesiones del proceso."""
+    global _render_service
+    if _render_service is None:
+        with _render_service_lock:
+            if _render_service is None:
+                _render_service = RenderService()
+    return _render_service
+
+def submit_render(kind, *args, **kwargs):
+    return get_render_service().submit(kind, *args, **kwargs)
+
+def render_status(job_id):
+    return get_render_service().status(job_id)
+
+def wait_render(job_id, on_progress=None, poll_interval=0.25):
+    """
+    Espera un trabajo consultando su estado; on_progress(status) se llama en cada consulta
+    (p. ej. para mover una barra de progreso). Retorna los bytes del PDF o lanza RenderError.
+    """
+    service = get_render_service()
+    while True:
+        status = service.status(job_id)
+        if on_progress:
+            on_progress(status)
+        if status["estado"] in ("listo", "error"):
+            return service.result(job_id)
+        time.sleep(poll_interval)
+
+# --- EXPORTACIÓN RÁPIDA DE TEXTO (FPDF) ---
+# Para documentos masivos de solo texto (p. ej. la ficha de cada empleado) no hace falta
+# WeasyPrint: FPDF escribe miles de páginas por minuto. DejaVu (normal, negrita, itálica) se
+# registra una sola vez por documento en el constructor, no en header() de cada página, y la
+# exportación masiva pone todos los registros en un mismo documento, así las métricas de las
+# fuentes y el logo se cargan una vez por exportación.
+
+FONT_DIR = os.path.join(TEMPLATE_DIR, "fonts")
+FUENTES_TEXTO = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf", "I": "DejaVuSans-Oblique.ttf"}
 
 class PDF(FPDF):
+    """FPDF con encabezado (logo + título), pie con número de página y DejaVu ya registrada."""
+
+    def __init__(self, titulo="Manual de Funciones", **kwargs):
+        super().__init__(**kwargs)
+        self.titulo = titulo
+        self.familia = "DejaVu"
+        for style, archivo in FUENTES_TEXTO.items():
+            font_path = os.path.join(FONT_DIR, archivo)
+            if not os.path.exists(font_path):
+                self.familia = "helvetica"  # fuente estándar si faltan los TTF
+                break
+            self.add_font("DejaVu", style, font_path)
+        self.logo = logo_url()
+
     def header(self):
-        # Asegúrate de que la fuente DejaVu está registrada
-        if 'dejavu' not in self.font_families:
-            # La ruta puede necesitar ajuste dependiendo de dónde guardes la fuente
-            font_path = os.path.join(os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf')
-            if os.path.exists(font_path):
-                self.add_font('DejaVu', '', font_path, uni=True)
-        
-        logo_path = 'logo_servinet.jpg'
-        if os.path.exists(logo_path):
-            self.image(logo_path, 10, 8, 33)
-        
-        self.set_font('DejaVu', 'B', 15)
+        if self.logo:
+            self.image(self.logo, 10, 8, 33)
+        self.set_font(self.familia, 'B', 15)
         self.cell(80)
-        self.cell(30, 10, 'Manual de Funciones', 0, 0, 'C')
+        self.cell(30, 10, self.titulo, align='C')
         self.ln(20)
 
     def footer(self):
         self.set_y(-15)
-        self.set_font('DejaVu', 'I', 8)
-        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+        self.set_font(self.familia, 'I', 8)
+        self.cell(0, 10, f'Página {self.page_no()}', align='C')
+
+def _texto_celda(valor):
+    if valor is None or (isinstance(valor, float) and valor != valor):  # None o NaN
+        return ""
+    return str(valor).strip()
+
+def export_text_pdf(documentos, titulo):
+    """
+    Varios documentos de texto en un solo PDF, cada uno desde una página nueva.
+    documentos: iterable de dicts {"titulo": str, "campos": [(etiqueta, valor)], "texto": str opcional}.
+    Retorna los bytes del PDF.
+    """
+    pdf = PDF(titulo=titulo)
+    pdf.set_auto_page_break(True, margin=20)
+    for doc in documentos:
+        pdf.add_page()
+        pdf.set_font(pdf.familia, 'B', 13)
+        pdf.multi_cell(0, 8, _texto_celda(doc.get("titulo")), new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(2)
+        ancho_valor = pdf.epw - 55
+        for etiqueta, valor in doc.get("campos", []):
+            pdf.set_font(pdf.familia, 'B', 10)
+            pdf.cell(55, 7, f"{etiqueta}:")
+            pdf.set_font(pdf.familia, '', 10)
+            texto = _texto_celda(valor)
+            # multi_cell parte el texto en líneas (costoso); solo se usa si el valor no cabe en una
+            if pdf.get_string_width(texto) < ancho_valor:
+                pdf.cell(ancho_valor, 7, texto, new_x="LMARGIN", new_y="NEXT")
+            else:
+                pdf.multi_cell(ancho_valor, 7, texto, new_x="LMARGIN", new_y="NEXT")
+        if doc.get("texto"):
+            pdf.ln(4)
+            pdf.set_font(pdf.familia, '', 10)
+            pdf.multi_cell(0, 6, doc["texto"], new_x="LMARGIN", new_y="NEXT")
+    return bytes(pdf.output())
+
+# Columnas de BD EMPLEADOS que van en la ficha impresa, con su etiqueta
+FICHA_CAMPOS = [
+    ("CEDULA", "Cédula"), ("CARGO", "Cargo"), ("DEPARTAMENTO", "Departamento"),
+    ("JEFE_DIRECTO", "Jefe Directo"), ("SEDE", "Sede"), ("MODALIDAD", "Modalidad"),
+    ("ESTADO", "Estado"), ("CORREO", "Correo"), ("CELULAR", "Celular"),
+    ("DIRECCIÓN DE RESIDENCIA", "Dirección de Residencia"), ("BANCO", "Banco"),
+    ("FECHA_INGRESO", "Fecha de Ingreso"), ("FECHA_NACIMIENTO", "Fecha de Nacimiento"),
+    ("ESTADO_CIVIL", "Estado Civil"), ("HIJOS", "Hijos"),
+]
+
+def export_fichas_pdf(df_empleados):
+    """Fichas de todos los empleados de df_empleados (una por página) en un solo PDF; retorna bytes."""
+    campos = [(col, etiqueta) for col, etiqueta in FICHA_CAMPOS if col in df_empleados.columns]
+    documentos = (
+        {"titulo": row.get("NOMBRE COMPLETO", ""), "campos": [(etiqueta, row[col]) for col, etiqueta in campos]}
+        for row in df_empleados.to_dict("records")
+    )
+    return export_text_pdf(documentos, "Ficha de Empleado")
 
 def clean_html_to_text(html):
     text = re.sub(r'<.*?>', '', html)
@@ -38,10 +754,7 @@ def clean_html_to_text(html):
 
 def create_manual_pdf(cargo, perfil_html, empleado=None):
     pdf = PDF()
-    font_path = os.path.join(os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf')
-    if os.path.exists(font_path):
-        pdf.add_font('DejaVu', '', font_path, uni=True)
-    pdf.set_font('DejaVu', '', 12)
+    pdf.set_font(pdf.familia, '', 12)
     pdf.add_page()
     
     clean_text = clean_html_to_text(perfil_html)
@@ -62,7 +775,8 @@ def create_manual_pdf_from_html(html_content, cargo, empleado=None):
         filename += f"_{empleado.replace(' ', '_')}"
     filename += ".pdf"
     abs_path = os.path.abspath(filename)
-    HTML(string=html_content).write_pdf(abs_path)
+    options = {"optimize_images": True, "jpeg_quality": PDF_JPEG_QUALITY, "dpi": PDF_DPI, "cache": _image_cache} if PDF_OPTIMIZE else {}
+    HTML(string=html_content, base_url=TEMPLATE_DIR, url_fetcher=url_fetcher).write_pdf(abs_path, **options)
     return abs_path
 
 def extract_section(html, section_title):
@@ -72,29 +786,39 @@ def extract_section(html, section_title):
         return match.group(1).strip()
     return ""
 
+def _manual_render_args(data, cargo=None, empleado=None):
+    return "manual_template.html", data
+
 def create_manual_pdf_from_template(data, cargo, empleado=None):
-    template_dir = os.path.dirname(__file__)
-    env = Environment(loader=FileSystemLoader(template_dir))
-    template = env.get_template("manual_template.html")
-    
-    html_content = template.render(data)
-    
-    filename = f"Manual_{cargo.replace(' ', '_').upper()}.pdf"
-    abs_path = os.path.abspath(filename)
-    
-    HTML(string=html_content, base_url=template_dir).write_pdf(abs_path)
-    
-    return abs_path
+    """
+    Renderiza manual_template.html con `data` y retorna el PDF en memoria (bytes),
+    listo para subir con upload_manual_to_drive sin pasar por disco.
+    """
+    name, context = _manual_render_args(data, cargo, empleado)
+    return render_template_pdf(name, **context)
 
-# --- MEJORA 2: FUNCIÓN COMPLETA Y CONECTADA PARA EL PDF DEL ORGANIGRAMA ---
-def export_organigrama_pdf(cargos_info, descripcion_general, empresa_nombre="SERVINET", filename="Organigrama_Cargos.pdf"):
+def build_manual_data(cargo, departamento, perfil_html, codigo, version="1.0 IA", **extras):
     """
-    Genera un PDF profesional del organigrama usando la nueva plantilla unificada y corregida.
+    Contexto de manual_template.html a partir del HTML generado por la IA.
+    `extras` completa la ficha del cargo (jefe_inmediato, subordinados, modalidad, sede).
     """
-    template_dir = os.path.dirname(__file__)
-    env = Environment(loader=FileSystemLoader(template_dir))
-    template = env.get_template("organigrama_template.html")
-    logo_path = os.path.abspath("logo_servinet.jpg") if os.path.exists("logo_servinet.jpg") else None
+    now = datetime.datetime.now()
+    logo_path = logo_url()
+    cargo_dict = {
+        "nombre": cargo,
+        "area": departamento,
+        "jefe_inmediato": extras.get("jefe_inmediato", ""),
+        "subordinados": extras.get("subordinados", ""),
+        "modalidad": extras.get("modalidad", ""),
+        "sede": extras.get("sede", ""),
+        **extraer_manual(perfil_html)
+    }
+    doc_dict = {"codigo": codigo, "version": version, "fecha": now.strftime("%d/%m/%Y")}
+    return {"cargo": cargo_dict, "doc": doc_dict, "logo_url": logo_path, "perfil_html": perfil_html}
+
+# --- MEJORA 2: FUNCIÓN COMPLETA Y CONECTADA PARA EL PDF DEL ORGANIGRAMA ---
+def _organigrama_render_args(cargos_info, descripcion_general, empresa_nombre="SERVINET"):
+    logo_path = logo_url()
 
     # MEJORA: Paleta de colores para los departamentos, unificada y profesional
     colores_departamento = {
@@ -111,75 +835,115 @@ def export_organigrama_pdf(cargos_info, descripcion_general, empresa_nombre="SER
         "OTROS": "#9ca3af"           # Gris
     }
 
-    html_content = template.render(
+    return "organigrama_template.html", dict(
         cargos_info=cargos_info,
         descripcion_general=descripcion_general,
         empresa=empresa_nombre,
         colores_depto=colores_departamento, # Pasamos la paleta de colores
         logo_url=logo_path,
-        now=datetime.datetime.now()
+        now=datetime.date.today()  # Solo la fecha: regenerar el mismo día sin cambios reutiliza la caché
     )
-    HTML(string=html_content, base_url=template_dir).write_pdf(filename)
-    return filename
 
-def export_organigrama_pdf_master(df_empleados, descripcion_general, empresa_nombre="SERVINET", filename="Organigrama_Cargos.pdf"):
+def export_organigrama_pdf(cargos_info, descripcion_general, empresa_nombre="SERVINET", filename=None):
     """
-    Genera un PDF profesional del organigrama usando la plantilla master.
+    Genera un PDF profesional del organigrama usando la nueva plantilla unificada y corregida.
+    Sin filename retorna los bytes del PDF; con filename lo escribe en disco y retorna la ruta.
     """
-    from jinja2 import Environment, FileSystemLoader
-    from weasyprint import HTML
-    import datetime
-    import os
+    name, context = _organigrama_render_args(cargos_info, descripcion_general, empresa_nombre)
+    pdf = render_template_pdf(name, filename, **context)
+    return pdf if filename is None else filename
 
-    template_dir = os.path.dirname(__file__)
-    env = Environment(loader=FileSystemLoader(template_dir))
-    template = env.get_template("organigrama_template.html")
-    logo_path = os.path.abspath("logo_servinet.jpg") if os.path.exists("logo_servinet.jpg") else None
+# Columnas de BD EMPLEADOS -> campos de cada tarjeta del organigrama (con su valor por defecto)
+_CAMPOS_TARJETA = {
+    "NOMBRE COMPLETO": ("nombre", ""),
+    "CORREO": ("email", ""),
+    "CELULAR": ("telefono", ""),
+    "SEDE": ("ubicacion", ""),
+    "MODALIDAD": ("modalidad", "Oficina"),
+    "FOTO_URL": ("foto_url", ""),
+}
+ORGANIGRAMA_MODOS = ("unico", "paginas", "por_departamento")
 
-    # Agrupa empleados por departamento y cargo
+def agrupar_organigrama(df_empleados):
+    """
+    Agrupa empleados por departamento y cargo: {depto: [{cargo, descripcion, empleados}]}.
+    Departamentos y cargos quedan en el orden de su primera aparición.
+    """
+    n = len(df_empleados)
+    def columna(nombre, defecto):
+        return df_empleados[nombre].tolist() if nombre in df_empleados.columns else [defecto] * n
+    columnas = {destino: columna(origen, defecto) for origen, (destino, defecto) in _CAMPOS_TARJETA.items()}
+    empleados = [dict(zip(columnas, valores)) for valores in zip(*columnas.values())]
+    descripciones = columna("DESCRIPCION_CARGO", "")
+
+    claves = pd.DataFrame({
+        "depto": columna("DEPARTAMENTO", "OTROS"),
+        "cargo": columna("CARGO", "Sin Cargo"),
+    })
+    grupos = claves.groupby(["depto", "cargo"], sort=False, dropna=False).indices
     data_grouped = {}
-    for _, row in df_empleados.iterrows():
-        depto = row.get("DEPARTAMENTO", "OTROS")
-        cargo = row.get("CARGO", "Sin Cargo")
-        if depto not in data_grouped:
-            data_grouped[depto] = []
-        # Busca si ya existe el cargo en el departamento
-        cargo_entry = next((c for c in data_grouped[depto] if c["cargo"] == cargo), None)
-        emp_dict = {
-            "nombre": row.get("NOMBRE COMPLETO", ""),
-            "email": row.get("CORREO", ""),
-            "telefono": row.get("CELULAR", ""),
-            "ubicacion": row.get("SEDE", ""),
-            "modalidad": row.get("MODALIDAD", "Oficina"),
-            "foto_url": row.get("FOTO_URL", ""),
-        }
-        if cargo_entry:
-            cargo_entry["empleados"].append(emp_dict)
-        else:
-            cargo_entry = {
-                "cargo": cargo,
-                "descripcion": row.get("DESCRIPCION_CARGO", ""),  # O usa IA si quieres
-                "empleados": [emp_dict]
-            }
-            data_grouped[depto].append(cargo_entry)
-
-    # KPIs
-    total_empleados = len(df_empleados)
-    total_departamentos = len(data_grouped)
-    fecha_actual = datetime.datetime.now().strftime("%d/%m/%Y %H:%M")
-
-    html_content = template.render(
+    for (depto, cargo), posiciones in sorted(grupos.items(), key=lambda kv: kv[1][0]):
+        data_grouped.setdefault(depto, []).append({
+            "cargo": cargo,
+            "descripcion": descripciones[posiciones[0]],  # O usa IA si quieres
+            "empleados": [empleados[i] for i in posiciones]
+        })
+    return data_grouped
+
+def _organigrama_master_render_args(df_empleados, descripcion_general, empresa_nombre="SERVINET", modo="unico"):
+    """
+    modo: "unico" (un documento continuo), "paginas" (cada departamento empieza en página nueva)
+    o "por_departamento" (cada departamento se renderiza aparte y luego se unen; acota memoria
+    y tiempo de WeasyPrint con plantillas grandes, y cada parte usa la caché por separado).
+    """
+    if modo not in ORGANIGRAMA_MODOS:
+        raise ValueError(f"Modo de organigrama desconocido: {modo}")
+    logo_path = logo_url()
+    data_grouped = agrupar_organigrama(df_empleados)
+
+    # Solo la fecha: un organigrama regenerado el mismo día sin cambios reutiliza la caché de render
+    hoy = datetime.date.today()
+    base = dict(
         empresa=empresa_nombre,
         logo_url=logo_path,
-        now=datetime.datetime.now(),
+        now=hoy,
         descripcion_general=descripcion_general,
-        data_grouped=data_grouped,
-        total_empleados=total_empleados,
-        total_departamentos=total_departamentos,
-        fecha_actual=fecha_actual
+        total_empleados=len(df_empleados),
+        total_departamentos=len(data_grouped),
+        fecha_actual=hoy.strftime("%d/%m/%Y"),
+        salto_por_depto=modo == "paginas",
     )
-    HTML(string=html_content, base_url=template_dir).write_pdf(filename)
-    return filename
+    if modo != "por_departamento" or len(data_grouped) < 2:
+        return "organigrama_template.html", dict(base, data_grouped=data_grouped)
+    partes = [
+        dict(base, data_grouped={depto: cargos}, mostrar_encabezado=i == 0)
+        for i, (depto, cargos) in enumerate(data_grouped.items())
+    ]
+    return "organigrama_template.html", partes
+
+def export_organigrama_pdf_master(df_empleados, descripcion_general, empresa_nombre="SERVINET", filename=None, modo="unico"):
+    """
+    Genera un PDF profesional del organigrama usando la plantilla master (ver modos en
+    _organigrama_master_render_args).
+    Sin filename retorna los bytes del PDF; con filename lo escribe en disco y retorna la ruta.
+    """
+    name, contexto = _organigrama_master_render_args(df_empleados, descripcion_general, empresa_nombre, modo)
+    if isinstance(contexto, list):
+        pdf = render_parts_pdf(name, [render_template_html(name, **c) for c in contexto])
+        if filename is None:
+            return pdf
+        with open(filename, "wb") as f:
+            f.write(pdf)
+        return filename
+    pdf = render_template_pdf(name, filename, **contexto)
+    return pdf if filename is None else filename
+
+# Renders que acepta el servicio de procesos: cada uno arma (plantilla, contexto).
+_RENDER_KINDS = {
+    "manual": _manual_render_args,
+    "organigrama": _organigrama_render_args,
+    "organigrama_master": _organigrama_master_render_args,
+}
 
 # --- BLOQUE DE EJEMPLO, AHORA CORRECTAMENTE COMENTADO PARA NO CAUSAR ERRORES ---
 """
@@ -225,167 +989,170 @@ for _, row in df_cargos.iterrows():
 
 # Puedes poner esto en modules/pdf_generator.py o al inicio de tu página
 
-def _find_section_by_title(soup, titles):
+# --- EXTRACCIÓN DEL MANUAL (UNA SOLA PASADA) ---
+# El HTML de generate_role_profile_by_sections se parsea una vez con lxml; en el mismo
+# recorrido se indexan las secciones por título normalizado, los <th> de la tabla de perfil
+# y las clases conocidas (mission-text, function-list, skill-tag).
+
+MANUAL_FIELDS = ("mision", "funciones", "educacion", "experiencia", "conocimientos", "idiomas", "competencias", "kpis")
+
+def _texto(el, separator=""):
+    """Equivalente a get_text(strip=True) de BeautifulSoup."""
+    return separator.join(t.strip() for t in el.itertext() if t.strip())
+
+def _clases(el):
+    return (el.get("class") or "").split()
+
+def _items_o_parrafos(section):
+    items = [_texto(li) for li in section.iter("li")]
+    if items:
+        return items
+    return [_texto(p) for p in section.iter("p") if _texto(p)]
+
+class _IndiceManual:
+    """Índice del HTML construido en un solo recorrido del árbol."""
+
+    def __init__(self, html):
+        self.mission = None
+        self.function_list = None
+        self.skill_tags = []
+        self.ths = []        # (texto en minúsculas, th)
+        self.sections = []   # (título normalizado, sección)
+        if not html or not html.strip():
+            return
+        root = lxml_html.fragment_fromstring(html, create_parent="div")
+        for el in root.iter():
+            if not isinstance(el.tag, str):
+                continue  # comentarios e instrucciones de procesamiento
+            clases = _clases(el)
+            if el.tag == "th":
+                self.ths.append((_texto(el).lower(), el))
+            if not clases:
+                continue
+            if self.mission is None and "mission-text" in clases:
+                self.mission = el
+            if self.function_list is None and el.tag == "ul" and "function-list" in clases:
+                self.function_list = el
+            if "skill-tag" in clases:
+                self.skill_tags.append(el)
+            if "section" in clases:
+                titulo = next((t for t in el.iter() if t is not el and isinstance(t.tag, str) and "section-title" in _clases(t)), None)
+                if titulo is not None:
+                    self.sections.append((_texto(titulo).lower(), el))
+
+    def section(self, variantes):
+        for titulo, section in self.sections:
+            if any(v in titulo for v in variantes):
+                return section
+        return None
+
+    def valor_th(self, clave):
+        for texto, th in self.ths:
+            if clave in texto:
+                td = next(th.itersiblings("td"), None)
+                if td is not None:
+                    return td
+        return None
+
+    def valor_en_seccion(self, variantes, patron):
+        section = self.section(variantes)
+        if section is not None:
+            match = re.search(patron, _texto(section, " "), re.IGNORECASE)
+            if match:
+                return match.group(1).strip()
+        return ""
+
+def extraer_manual(html):
     """
-    Busca una sección por posibles títulos (case-insensitive, lista de variantes).
-    Devuelve el tag de la sección o None.
+    Extrae todos los campos del manual en una sola pasada.
+    Retorna un dict con las claves de MANUAL_FIELDS (mismo resultado que las funciones extraer_*).
     """
-    for section in soup.find_all(class_="section"):
-        title_tag = section.find(class_="section-title")
-        if title_tag:
-            title_text = title_tag.get_text(strip=True).lower()
-            for t in titles:
-                if t.lower() in title_text:
-                    return section
-    return None
+    idx = _IndiceManual(html)
+
+    if idx.mission is not None:
+        mision = _texto(idx.mission)
+    else:
+        mision = ""
+        section = idx.section(["propósito principal", "objetivo del cargo", "misión"])
+        if section is not None:
+            for tag in section:
+                if tag.tag in ("div", "p") and _clases(tag) != ["section-title"]:
+                    mision = _texto(tag)
+                    break
+
+    if idx.function_list is not None:
+        funciones = [_texto(li) for li in idx.function_list.iter("li")]
+    else:
+        section = idx.section(["funciones", "responsabilidades"])
+        funciones = _items_o_parrafos(section) if section is not None else []
+
+    td = idx.valor_th("educativo")
+    educacion = _texto(td) if td is not None else idx.valor_en_seccion(
+        ["perfil", "educación"], r"nivel educativo[:\-]?\s*(.+?)(?:\s{2,}|$)")
+
+    td = idx.valor_th("experiencia")
+    experiencia = _texto(td) if td is not None else idx.valor_en_seccion(
+        ["perfil", "experiencia"], r"experiencia requerida[:\-]?\s*(.+?)(?:\s{2,}|$)")
+
+    td = idx.valor_th("conocimientos")
+    if td is not None:
+        ul = next(td.iter("ul"), None)
+        conocimientos = [_texto(li) for li in ul.iter("li")] if ul is not None else [_texto(td)]
+    else:
+        section = idx.section(["perfil", "conocimientos"])
+        conocimientos = _items_o_parrafos(section) if section is not None else []
 
+    td = idx.valor_th("idioma")
+    idiomas = _texto(td) if td is not None else idx.valor_en_seccion(
+        ["idioma", "idiomas"], r"idiomas?[:\-]?\s*(.+?)(?:\s{2,}|$)")
+
+    if idx.skill_tags:
+        competencias = [_texto(tag) for tag in idx.skill_tags]
+    else:
+        section = idx.section(["competencias", "habilidades"])
+        competencias = _items_o_parrafos(section) if section is not None else []
+
+    kpis = []
+    for titulo, section in idx.sections:
+        if "kpi" in titulo or "indicador" in titulo:
+            table = next(section.iter("table"), None)
+            if table is not None:
+                for row in list(table.iter("tr"))[1:]:  # omite encabezado
+                    cols = list(row.iter("td"))
+                    if len(cols) >= 3:
+                        kpis.append({
+                            "nombre": _texto(cols[0]),
+                            "frecuencia": _texto(cols[1]),
+                            "meta": _texto(cols[2])
+                        })
+                break
+
+    return {
+        "mision": mision, "funciones": funciones, "educacion": educacion, "experiencia": experiencia,
+        "conocimientos": conocimientos, "idiomas": idiomas, "competencias": competencias, "kpis": kpis,
+    }
+
+# Compatibilidad: accesos por campo (cada uno hace su propia pasada; preferir extraer_manual).
 def extraer_mision(html):
-    soup = BeautifulSoup(html, "html.parser")
-    # Busca por clase específica primero
-    mission = soup.find(class_="mission-text")
-    if mission:
-        return mission.get_text(strip=True)
-    # Fallback: busca por título de sección
-    section = _find_section_by_title(soup, ["propósito principal", "objetivo del cargo", "misión"])
-    if section:
-        # Busca el primer <div> o <p> después del título
-        for tag in section.find_all(["div", "p"], recursive=False):
-            if tag.get("class") != ["section-title"]:
-                return tag.get_text(strip=True)
-    return ""
+    return extraer_manual(html)["mision"]
 
 def extraer_funciones(html):
-    soup = BeautifulSoup(html, "html.parser")
-    # Busca por clase
-    ul = soup.find("ul", class_="function-list")
-    if ul:
-        return [li.get_text(strip=True) for li in ul.find_all("li")]
-    # Fallback: busca por sección
-    section = _find_section_by_title(soup, ["funciones", "responsabilidades"])
-    if section:
-        items = []
-        for li in section.find_all("li"):
-            items.append(li.get_text(strip=True))
-        if items:
-            return items
-        # Fallback: busca <p> en la sección
-        for p in section.find_all("p"):
-            if p.get_text(strip=True):
-                items.append(p.get_text(strip=True))
-        return items
-    return []
+    return extraer_manual(html)["funciones"]
 
 def extraer_educacion(html):
-    soup = BeautifulSoup(html, "html.parser")
-    # Busca por tabla
-    for th in soup.find_all("th"):
-        if "educativo" in th.get_text(strip=True).lower():
-            td = th.find_next_sibling("td")
-            if td:
-                return td.get_text(strip=True)
-    # Fallback: busca por sección
-    section = _find_section_by_title(soup, ["perfil", "educación"])
-    if section:
-        text = section.get_text(separator=" ", strip=True)
-        match = re.search(r"nivel educativo[:\-]?\s*(.+?)(?:\s{2,}|$)", text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    return ""
+    return extraer_manual(html)["educacion"]
 
 def extraer_experiencia(html):
-    soup = BeautifulSoup(html, "html.parser")
-    for th in soup.find_all("th"):
-        if "experiencia" in th.get_text(strip=True).lower():
-            td = th.find_next_sibling("td")
-            if td:
-                return td.get_text(strip=True)
-    section = _find_section_by_title(soup, ["perfil", "experiencia"])
-    if section:
-        text = section.get_text(separator=" ", strip=True)
-        match = re.search(r"experiencia requerida[:\-]?\s*(.+?)(?:\s{2,}|$)", text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    return ""
+    return extraer_manual(html)["experiencia"]
 
 def extraer_conocimientos(html):
-    soup = BeautifulSoup(html, "html.parser")
-    for th in soup.find_all("th"):
-        if "conocimientos" in th.get_text(strip=True).lower():
-            td = th.find_next_sibling("td")
-            if td:
-                # Busca <ul> o lista dentro del td
-                ul = td.find("ul")
-                if ul:
-                    return [li.get_text(strip=True) for li in ul.find_all("li")]
-                # Si no hay lista, devuelve el texto plano
-                return [td.get_text(strip=True)]
-    section = _find_section_by_title(soup, ["perfil", "conocimientos"])
-    if section:
-        items = []
-        for li in section.find_all("li"):
-            items.append(li.get_text(strip=True))
-        if items:
-            return items
-        # Fallback: busca <p>
-        for p in section.find_all("p"):
-            if p.get_text(strip=True):
-                items.append(p.get_text(strip=True))
-        return items
-    return []
+    return extraer_manual(html)["conocimientos"]
 
 def extraer_idiomas(html):
-    soup = BeautifulSoup(html, "html.parser")
-    for th in soup.find_all("th"):
-        if "idioma" in th.get_text(strip=True).lower():
-            td = th.find_next_sibling("td")
-            if td:
-                return td.get_text(strip=True)
-    section = _find_section_by_title(soup, ["idioma", "idiomas"])
-    if section:
-        text = section.get_text(separator=" ", strip=True)
-        match = re.search(r"idiomas?[:\-]?\s*(.+?)(?:\s{2,}|$)", text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    return ""
+    return extraer_manual(html)["idiomas"]
 
 def extraer_competencias(html):
-    soup = BeautifulSoup(html, "html.parser")
-    # Busca por clase
-    tags = soup.find_all(class_="skill-tag")
-    if tags:
-        return [tag.get_text(strip=True) for tag in tags]
-    # Fallback: busca por sección
-    section = _find_section_by_title(soup, ["competencias", "habilidades"])
-    if section:
-        items = []
-        for li in section.find_all("li"):
-            items.append(li.get_text(strip=True))
-        if items:
-            return items
-        # Fallback: busca <p>
-        for p in section.find_all("p"):
-            if p.get_text(strip=True):
-                items.append(p.get_text(strip=True))
-        return items
-    return []
+    return extraer_manual(html)["competencias"]
 
 def extraer_kpis(html):
-    soup = BeautifulSoup(html, "html.parser")
-    # Busca la tabla de KPIs
-    for section in soup.find_all(class_="section"):
-        title_tag = section.find(class_="section-title")
-        if title_tag and ("kpi" in title_tag.get_text(strip=True).lower() or "indicador" in title_tag.get_text(strip=True).lower()):
-            table = section.find("table")
-            if table:
-                kpis = []
-                for row in table.find_all("tr")[1:]:  # omite encabezado
-                    cols = row.find_all("td")
-                    if len(cols) >= 3:
-                        kpis.append({
-                            "nombre": cols[0].get_text(strip=True),
-                            "frecuencia": cols[1].get_text(strip=True),
-                            "meta": cols[2].get_text(strip=True)
-                        })
-                return kpis
-    return []
-
+    return extraer_manual(html)["kpis"]
@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
 import datetime
-import textwrap
 from streamlit_echarts import st_echarts 
 import base64
 import urllib.parse
+from functools import partial
 
 # --- IMPORTACIÓN DE MÓDULOS LOCALES ---
 try:
@@ -18,8 +18,10 @@ try:
         download_manual_from_drive,
         set_file_public
     )
-    from modules.ai_brain import client as openai_client
-    from modules.pdf_generator import export_organigrama_pdf, export_organigrama_pdf_master
+    from modules.ai_brain import describe_cargo, summarize_organigrama
+    from modules.org_model import get_org_model, get_person_model, EVENTO_CLIC
+    from modules.hierarchy import get_jerarquia
+    from modules.pdf_generator import submit_render, wait_render, RenderError, export_fichas_pdf
 except ImportError as e:
     st.error(f"Error al importar módulos locales: {e}. Verifica que la carpeta 'modules' y los archivos existan.")
     st.stop()
@@ -45,20 +47,6 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- FUNCIONES GLOBALES ---
-def wrap_text_node(text, width=20):
-    if not isinstance(text, str): return ""
-    return "\n".join(textwrap.wrap(text, width=width))
-
-def color_por_departamento(depto):
-    colores = {
-        "ADMINISTRATIVO": "#fef9c3", "OPERATIVO": "#dcfce7", "FINANZAS": "#fee2e2",
-        "COMERCIAL": "#dbeafe", "RRHH": "#fce7f3", "TECNOLOGÍA": "#f3e8ff",
-        "LOGÍSTICA": "#d1fae5", "DIRECCIÓN": "#fef08a", "JURÍDICO": "#fbcfe8",
-        "MARKETING": "#ffedd5", "OTROS": "#f1f5f9"
-    }
-    return colores.get(str(depto).strip().upper(), "#f1f5f9")
-
 # --- ENCABEZADO ---
 col_logo, col_title = st.columns([1, 6])
 with col_logo:
@@ -75,7 +63,7 @@ if df.empty:
     st.stop()
 
 manuals_folder_id = get_or_create_manuals_folder()
-tab1, tab2 = st.tabs(["🌳 Organigrama por Cargos", "👤 Ficha Técnica & Edición"])
+tab1, tab_personas, tab2 = st.tabs(["🌳 Organigrama por Cargos", "🧑‍🤝‍🧑 Organigrama por Personas", "👤 Ficha Técnica & Edición"])
 
 # ======================================================================
 # TAB 1: ORGANIGRAMA "SUPER PROFESIONAL"
@@ -84,78 +72,57 @@ with tab1:
     st.markdown("### 🔹 Mapa Estructural por Cargos")
     st.info("💡 **Interacción:** El organigrama muestra la jerarquía real de **CARGOS**. Haz clic o pasa el mouse sobre un cargo para ver la lista de empleados.")
 
-    # 1. Agrupar empleados por cargo y determinar el jefe del cargo (por mayoría)
-    df_cargos = (
-        df.groupby(["CARGO", "DEPARTAMENTO"], as_index=False)
-        .agg(
-            NOMBRE_COMPLETO=("NOMBRE COMPLETO", list),
-            CORREO=("CORREO", list),
-            CELULAR=("CELULAR", list),
-            JEFE_DIRECTO_CARGO=("JEFE_DIRECTO", lambda x: x.mode()[0] if not x.mode().empty else None)
-        )
-    )
-
-    # 2. Mapear el nombre del jefe (persona) al cargo del jefe
-    nombre_a_cargo = df.set_index('NOMBRE COMPLETO')['CARGO'].to_dict()
-    df_cargos['PARENT_CARGO'] = df_cargos['JEFE_DIRECTO_CARGO'].map(nombre_a_cargo)
-
-    # 3. Construir el árbol jerárquico
-    nodes = {row['CARGO']: {"name": row['CARGO'], "data": row.to_dict(), "children": []} for _, row in df_cargos.iterrows()}
-    forest = []
-    for cargo, node in nodes.items():
-        parent_cargo = node['data'].get('PARENT_CARGO')
-        if parent_cargo and parent_cargo in nodes and parent_cargo != cargo:
-            nodes[parent_cargo]['children'].append(node)
-        else:
-            forest.append(node)
-    
-    tree_data = {"name": "SERVINET", "data": {"CARGO": "SERVINET", "DEPARTAMENTO": "DIRECCIÓN", "NOMBRE_COMPLETO": []}, "children": forest} if len(forest) > 1 else (forest[0] if forest else {})
-
-    # 4. Función recursiva para dar formato Echarts
-    def format_node_for_echarts(node):
-        data = node['data']
-        cargo, depto, empleados = data.get('CARGO', 'N/A'), data.get('DEPARTAMENTO', 'OTROS'), data.get('NOMBRE_COMPLETO', [])
-        formatted_label = f"{{title|{wrap_text_node(cargo, 18)}}}\n{{hr|}}\n{{subtitle|{len(empleados)} Personas}}"
-        
-        return {
-            "name": formatted_label, "value": len(empleados),
-            "itemStyle": {"color": color_por_departamento(depto), "borderColor": "#3b82f6", "borderWidth": 1.5, "borderRadius": 12, "shadowBlur": 10, "shadowColor": "rgba(0,0,0,0.08)"},
-            "tooltip_info": {
-                "cargo": cargo, "departamento": depto,
-                "empleados": [{"nombre": n, "correo": c, "celular": cel} for n, c, cel in zip(empleados, data.get('CORREO', []), data.get('CELULAR', []))]
-            },
-            "children": [format_node_for_echarts(child) for child in node.get('children', [])]
-        }
+    # Tabla de cargos, árbol y opción de ECharts: se arman solo cuando cambian los datos
+    modelo = get_org_model(df)
+    df_cargos = modelo.cargos
 
-    if tree_data:
-        echarts_tree_data = format_node_for_echarts(tree_data)
-        option = {
-            "tooltip": {
-                "trigger": 'item', "triggerOn": 'mousemove|click', "enterable": True,
-                "formatter": """
-                    function(params) {
-                        var info = params.data.tooltip_info; if (!info) return '';
-                        var html = `<div style="font-family: sans-serif; min-width: 280px; max-height: 350px; overflow-y: auto; padding: 12px; border-radius: 8px; background: white; box-shadow: 0 4px 12px rgba(0,0,0,0.15);">
-                                    <h4 style="margin:0 0 8px 0; color: #1e3a8a; border-bottom: 2px solid #3b82f6; padding-bottom: 6px;">${info.cargo}</h4>
-                                    <div style="font-size: 12px; color: #475569; margin-bottom: 10px;"><b>Departamento:</b> ${info.departamento} | <b>Total:</b> ${info.empleados.length}</div>
-                                    <table style="width: 100%; border-collapse: collapse; font-size: 12px;">`;
-                        info.empleados.forEach(function(emp) { html += `<tr style="border-bottom: 1px solid #e2e8f0;"><td style="padding: 6px 4px; color: #334155;"><b>${emp.nombre}</b></td></tr>`; });
-                        html += `</table></div>`; return html;
-                    }
-                """
-            },
-            "series": [{"type": "tree", "data": [echarts_tree_data], "left": '2%', "right": '2%', "top": '8%', "bottom": '8%', "orient": 'TB', "layout": 'orthogonal', "symbol": 'rect', "symbolSize": [220, 65], "roam": True, "initialTreeDepth": 3, "expandAndCollapse": True, "edgeShape": "polyline", "edgeForkPosition": "50%", "lineStyle": {"color": "#94a3b8", "width": 1.5},
-                "label": {"show": True, "position": 'inside', "color": '#1e293b', "fontSize": 14, "rich": {
-                        "title": {"color": "#003d6e", "fontSize": 15, "fontWeight": "bold", "align": "center", "lineHeight": 18},
-                        "hr": {"borderColor": "#cbd5e1", "width": "100%", "borderWidth": 0.5, "height": 0, "margin": [4, 0, 4, 0]},
-                        "subtitle": {"color": "#475569", "fontSize": 11, "align": "center", "lineHeight": 12}
-                }}, "animationDurationUpdate": 600
-            }]
-        }
-        st_echarts(options=option, height="950px")
+    vista_ligera = st.toggle(
+        "⚡ Vista ligera (carga bajo demanda)", value=len(modelo.nodos) > 60, key="org_vista_ligera",
+        help="Envía solo los primeros niveles con conteos. Haz clic en un cargo para abrir sus subcargos y ver sus empleados."
+    )
+    if modelo.opcion and vista_ligera:
+        # Estado de la vista: nodos abiertos y cargo seleccionado (se reinicia si cambian los datos)
+        vista = st.session_state.get("org_vista")
+        if not vista or vista["huella"] != modelo.fingerprint:
+            vista = st.session_state["org_vista"] = {"huella": modelo.fingerprint, "expandidos": set(), "seleccion": None, "evento": None}
+        resultado = st_echarts(
+            options=modelo.opcion_ligera(vista["expandidos"]), height="950px",
+            events={"click": EVENTO_CLIC}, key="org_ligero"
+        )
+        evento = (resultado or {}).get("chart_event") if isinstance(resultado, dict) else resultado
+        if evento and evento != vista["evento"]:
+            vista["evento"] = evento
+            nodo = int(evento[0])
+            vista["seleccion"] = nodo
+            if modelo.hijos[nodo]:
+                if nodo in vista["expandidos"]:
+                    vista["expandidos"].difference_update([nodo, *modelo.descendientes(nodo)])
+                else:
+                    vista["expandidos"].add(nodo)
+            st.rerun()
+        if vista["seleccion"] is not None:
+            nodo = vista["seleccion"]
+            data = modelo.nodos[nodo]["data"]
+            st.markdown(f"##### 👥 {data.get('CARGO', '')} · {data.get('DEPARTAMENTO', '')} ({modelo.personas[nodo]} personas)")
+            st.dataframe(pd.DataFrame(modelo.empleados(nodo)), use_container_width=True, hide_index=True)
+    elif modelo.opcion:
+        st_echarts(options=modelo.opcion, height="950px")
     else:
         st.error("No se pudo construir la jerarquía del organigrama.")
 
+    # Calidad de la línea de reporte: ciclos y jefes que no existen en la base
+    jerarquia = get_jerarquia(df)
+    if modelo.ciclos or jerarquia.ciclos or jerarquia.huerfanos:
+        with st.expander(f"⚠️ Revisar JEFE_DIRECTO: {len(jerarquia.ciclos) + len(modelo.ciclos)} ciclos, {len(jerarquia.huerfanos)} jefes no encontrados"):
+            for ciclo in modelo.ciclos:
+                st.markdown(f"- Ciclo de cargos (se muestra cortado en **{ciclo[0]}**): {' → '.join(ciclo)} → {ciclo[0]}")
+            for ciclo in jerarquia.ciclos:
+                nombres = [jerarquia.etiqueta(i) for i in ciclo]
+                st.markdown(f"- Ciclo de personas: {' → '.join(nombres)} → {nombres[0]}")
+            for i in jerarquia.huerfanos:
+                fila = df.iloc[i]
+                st.markdown(f"- **{fila.get('NOMBRE COMPLETO', '')}**: el jefe '{fila.get('JEFE_DIRECTO', '')}' no está en BD EMPLEADOS")
+
     st.markdown("---")
     st.markdown("### 📂 Gestión del Organigrama en PDF")
     
@@ -163,46 +130,104 @@ with tab1:
 
     with col_pdf1:
         st.markdown("#### Generar y Guardar Nueva Versión")
+        modos_pdf = {
+            "unico": "Documento continuo",
+            "paginas": "Una página nueva por departamento",
+            "por_departamento": "Por departamento (plantillas grandes)",
+        }
+        modo_pdf = st.selectbox(
+            "Formato del PDF", options=list(modos_pdf), format_func=modos_pdf.get,
+            index=2 if len(df) > 1000 else 0,
+            help="Con muchos colaboradores, 'Por departamento' renderiza cada área por separado y las une: menos memoria y solo se re-renderizan las áreas que cambiaron."
+        )
         if st.button("📄 Crear PDF con IA y Subir a Drive"):
-            with st.spinner("Generando descripciones con IA y creando PDF..."):
+            with st.spinner("Generando descripciones con IA..."):
                 # 1. Preparar datos para la IA y el PDF
                 cargos_info = []
                 for _, row in df_cargos.iterrows():
-                    desc_cargo = "Descripción no generada."
-                    if openai_client:
-                        try:
-                            prompt_cargo = f"Describe brevemente en una línea el propósito del cargo '{row['CARGO']}' en el departamento '{row['DEPARTAMENTO']}' para una empresa de telecomunicaciones."
-                            resp = openai_client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": prompt_cargo}], temperature=0.2)
-                            desc_cargo = resp.choices[0].message.content.strip()
-                        except Exception as e:
-                            desc_cargo = f"Error IA: {e}"
+                    desc_cargo = describe_cargo(row['CARGO'], row['DEPARTAMENTO'])
                     cargos_info.append({"cargo": row['CARGO'], "departamento": row['DEPARTAMENTO'], "descripcion": desc_cargo, "empleados": row['NOMBRE_COMPLETO']})
 
                 # 2. Generar descripción general con IA
-                descripcion_general = "Análisis no disponible."
-                if openai_client:
-                    try:
-                        prompt_general = f"Eres consultor senior en RRHH. Resume el organigrama de SERVINET en un párrafo ejecutivo (máximo 7 líneas), basado en estos cargos: {[c['cargo'] for c in cargos_info]}. Resalta la estructura y distribución de roles."
-                        resp_gen = openai_client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": prompt_general}], temperature=0.2)
-                        descripcion_general = resp_gen.choices[0].message.content.strip()
-                    except Exception as e:
-                        descripcion_general = f"Error IA: {e}"
+                descripcion_general = summarize_organigrama(c['cargo'] for c in cargos_info)
 
-                # 3. Generar y subir el PDF
-                pdf_filename = export_organigrama_pdf_master(df, descripcion_general)
-                upload_organigrama_to_drive(pdf_filename, manuals_folder_id)
-                st.success("✅ PDF generado y guardado en Drive exitosamente.")
-                st.rerun()
+            # 3. Renderizar el PDF en el pool de procesos mostrando el avance, y subirlo
+            job_id = submit_render("organigrama_master", df, descripcion_general, modo=modo_pdf)
+            barra = st.progress(0, text="Renderizando PDF...")
+            try:
+                pdf_bytes = wait_render(job_id, on_progress=lambda estado: barra.progress(
+                    estado["progreso"], text=f"Renderizando PDF... ({estado['segundos']} s)"
+                ))
+            except RenderError as e:
+                barra.empty()
+                st.error(f"No se pudo generar el PDF: {e}")
+                st.stop()
+            barra.progress(1.0, text="Subiendo a Google Drive...")
+            upload_organigrama_to_drive(pdf_bytes, manuals_folder_id)
+            barra.empty()
+            st.success("✅ PDF generado y guardado en Drive exitosamente.")
+            st.rerun()
 
     with col_pdf2:
         st.markdown("#### Descargar Versión Guardada")
         organigrama_file_id = find_organigrama_in_drive(manuals_folder_id)
         if organigrama_file_id:
-            pdf_bytes = download_organigrama_from_drive(organigrama_file_id)
-            st.download_button(label="📥 Descargar Organigrama PDF de Drive", data=pdf_bytes, file_name="Organigrama_Cargos_SERVINET.pdf", mime="application/pdf", use_container_width=True)
+            # MEJORA: Descarga perezosa, solo cuando el usuario hace clic
+            st.download_button(label="📥 Descargar Organigrama PDF de Drive", data=partial(download_organigrama_from_drive, organigrama_file_id), file_name="Organigrama_Cargos_SERVINET.pdf", mime="application/pdf", use_container_width=True)
         else:
             st.warning("No hay un organigrama guardado en Drive. Genéralo primero.")
 
+# ======================================================================
+# TAB PERSONAS: CADA EMPLEADO BAJO SU JEFE DIRECTO
+# ======================================================================
+with tab_personas:
+    st.markdown("### 🔹 Organigrama por Personas")
+    st.info("💡 **Interacción:** Haz clic en una persona para abrir o cerrar su equipo; los equipos grandes se agrupan por departamento. Usa el buscador para ir directo a alguien.")
+
+    # Agrupado y layout se calculan en el servidor; el navegador solo recibe los nodos visibles
+    personas = get_person_model(df)
+    vista_p = st.session_state.get("org_personas")
+    if not vista_p or vista_p["huella"] != personas.fingerprint:
+        vista_p = st.session_state["org_personas"] = {
+            "huella": personas.fingerprint, "expandidos": personas.iniciales(), "seleccion": None, "evento": None, "busqueda": ""
+        }
+
+    nombres_p = sorted({str(n) for n in df['NOMBRE COMPLETO'].dropna()})
+    busqueda = st.selectbox("🔎 Buscar persona", [""] + nombres_p, key="org_personas_buscar")
+    if busqueda != vista_p["busqueda"]:
+        vista_p["busqueda"] = busqueda
+        pos_buscada = personas.jerarquia.indice(busqueda) if busqueda else None
+        if pos_buscada is not None:
+            # Solo la cadena de mando de la persona: el resto del árbol sigue cerrado
+            vista_p["expandidos"] = personas.iniciales() | personas.camino(pos_buscada)
+            vista_p["seleccion"] = pos_buscada
+
+    opcion_personas = personas.opcion(vista_p["expandidos"], vista_p["seleccion"])
+    if opcion_personas:
+        resultado_p = st_echarts(options=opcion_personas, height="850px", events={"click": EVENTO_CLIC}, key="org_personas_chart")
+        evento_p = (resultado_p or {}).get("chart_event") if isinstance(resultado_p, dict) else resultado_p
+        if evento_p and evento_p != vista_p["evento"]:
+            vista_p["evento"] = evento_p
+            clave = str(evento_p[0])
+            if clave.startswith("p:"):
+                vista_p["seleccion"] = int(clave[2:])
+                if personas.jerarquia.hijos[vista_p["seleccion"]]:
+                    vista_p["expandidos"] = personas.alternar(vista_p["expandidos"], clave)
+            elif clave.startswith("g:"):
+                vista_p["expandidos"] = personas.alternar(vista_p["expandidos"], clave)
+            st.rerun()
+        if vista_p["seleccion"] is not None:
+            pos_sel = vista_p["seleccion"]
+            jerarquia_p = personas.jerarquia
+            cadena = " → ".join(str(jerarquia_p.etiqueta(i)).strip() for i in jerarquia_p.cadena_de_mando(pos_sel))
+            st.markdown(
+                f"##### 👤 {jerarquia_p.etiqueta(pos_sel)} · {personas.cargos[pos_sel]} ({personas.departamentos[pos_sel]})\n"
+                f"👥 {len(jerarquia_p.directos(pos_sel))} directos · {jerarquia_p.tamano_equipo(pos_sel)} en total"
+                + (f" · 🎯 Cadena de mando: {cadena}" if cadena else "")
+            )
+    else:
+        st.error("No hay empleados para construir el organigrama por personas.")
+
 # ======================================================================
 # TAB 2: FICHA DE EMPLEADO & EDICIÓN (CORREGIDO Y MEJORADO)
 # ======================================================================
@@ -237,6 +262,14 @@ with tab2:
     f_estado_val = c4.selectbox("Estado", ["Todos"] + sorted(df['ESTADO'].dropna().unique()), key="f_estado_tab2")
     if f_estado_val != "Todos": df_filt = df_filt[df_filt['ESTADO'] == f_estado_val]
 
+    # Exportación masiva en texto (FPDF): se genera solo al hacer clic
+    st.download_button(
+        f"🖨️ Exportar fichas filtradas en PDF ({len(df_filt)})",
+        data=partial(export_fichas_pdf, df_filt),
+        file_name=f"Fichas_SERVINET_{datetime.date.today():%Y%m%d}.pdf",
+        mime="application/pdf", disabled=df_filt.empty, key="export_fichas_tab2"
+    )
+
     empleados_disponibles = sorted(df_filt['NOMBRE COMPLETO'].unique())
     if empleados_disponibles:
         seleccion = st.selectbox("Seleccionar Empleado", empleados_disponibles, key="sel_emp_tab2")
@@ -245,6 +278,10 @@ with tab2:
         col_card_izq, col_card_der = st.columns([1, 2])
 
         with col_card_izq:
+            jerarquia = get_jerarquia(df)
+            pos = jerarquia.indice(seleccion)
+            equipo = (f"{len(jerarquia.directos(pos))} directos · {jerarquia.tamano_equipo(pos)} en total"
+                      if pos is not None else "--")
             st.markdown(f"""<div style="background-color: white; padding: 28px; border-radius: 14px; border: 1.5px solid #e2e8f0; text-align: center; box-shadow: 0 4px 12px rgba(0,0,0,0.07);">
                 <div style="font-size: 64px; margin-bottom: 10px;">👤</div>
                 <h3 style="margin:0; color: #1e293b; font-size: 24px;">{seleccion}</h3>
@@ -254,6 +291,7 @@ with tab2:
                     <p style="margin: 8px 0;"><b>📱 Celular:</b> {datos.get('CELULAR', '--')}</p>
                     <p style="margin: 8px 0;"><b>📍 Sede:</b> {datos.get('SEDE', '--')}</p>
                     <p style="margin: 8px 0;"><b>🎯 Jefe:</b> {datos.get('JEFE_DIRECTO', 'N/A')}</p>
+                    <p style="margin: 8px 0;"><b>👥 Equipo:</b> {equipo}</p>
                 </div></div>""", unsafe_allow_html=True)
             st.write(" "); st.markdown("##### 📄 Manual de Funciones")
             with st.spinner("Buscando manual..."):
@@ -261,8 +299,7 @@ with tab2:
             if manual_file_id:
                 set_file_public(manual_file_id)
                 drive_url = f"https://drive.google.com/file/d/{manual_file_id}/view"
-                pdf_bytes = download_manual_from_drive(manual_file_id)
-                st.download_button("📥 Descargar Manual PDF", pdf_bytes, f"Manual_{datos.get('CARGO', '').replace(' ', '_')}.pdf", "application/pdf")
+                st.download_button("📥 Descargar Manual PDF", partial(download_manual_from_drive, manual_file_id), f"Manual_{datos.get('CARGO', '').replace(' ', '_')}.pdf", "application/pdf")
                 
                 # --- NUEVO: Botón para enviar por WhatsApp ---
                 # Genera un enlace de visualización de Google Drive (en vez de descarga directa)
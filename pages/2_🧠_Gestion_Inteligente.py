@@ -14,15 +14,12 @@ from modules.drive_manager import (
     find_manual_in_drive,
     download_manual_from_drive,
     upload_manual_to_drive,
+    manual_filename,
     set_file_public
 )
-from modules.pdf_generator import (
-    create_manual_pdf_from_template, 
-    extraer_mision, extraer_funciones, extraer_educacion, extraer_experiencia,
-    extraer_conocimientos, extraer_idiomas, extraer_competencias, extraer_kpis
-)
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML
+from modules.pdf_generator import submit_render, wait_render, build_manual_data
+from modules.bulk_manuals import plan_bulk_manuals, run_bulk_manuals
+from modules.hierarchy import get_jerarquia
 
 # --- CONFIGURACIÓN INICIAL DE LA PÁGINA ---
 st.set_page_config(
@@ -68,12 +65,13 @@ with st.sidebar:
     if st.button("🔄 Recargar Manuales de Drive", help="Lee nuevamente todos los archivos en la carpeta de Drive"):
         with st.status("Releyendo archivos de Drive...", expanded=True) as status:
             st.write("Conectando a Drive...")
-            st.session_state["company_context"] = get_company_context(manuals_folder_id)
+            st.session_state["company_context"] = get_company_context(manuals_folder_id, status=status)
             status.update(label="¡Contexto actualizado!", state="complete", expanded=False)
             st.toast("Base de conocimiento actualizada correctamente.", icon="✅")
     if "company_context" not in st.session_state:
-        with st.spinner("Inicializando cerebro de IA..."):
-            st.session_state["company_context"] = get_company_context(manuals_folder_id)
+        with st.status("Inicializando cerebro de IA...", expanded=False) as status:
+            st.session_state["company_context"] = get_company_context(manuals_folder_id, status=status)
+            status.update(label="Cerebro de IA listo", state="complete")
     context_preview = st.session_state.get("company_context", "")
     if context_preview:
         st.success(f"Contexto cargado: {len(context_preview)} caracteres.")
@@ -93,6 +91,48 @@ if df.empty:
     st.error("🚨 Error Crítico: No se pudo conectar a la base de datos de empleados.")
     st.stop()
 
+# --- GENERACIÓN MASIVA DE MANUALES (SIDEBAR) ---
+if not (link_cedula and link_token):
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("🏭 Generación Masiva de Manuales")
+        if st.button("🔎 Revisar cargos sin manual", help="Busca cargos de BD EMPLEADOS sin manual o con manual desactualizado"):
+            st.session_state["bulk_plan"] = plan_bulk_manuals(df, manuals_folder_id)
+        plan = st.session_state.get("bulk_plan")
+        if plan is not None:
+            if not plan:
+                st.success("Todos los cargos tienen un manual vigente.")
+            else:
+                st.dataframe(pd.DataFrame(plan)[["cargo", "motivo"]], hide_index=True, use_container_width=True)
+                if st.button(f"🚀 Generar {len(plan)} manuales", type="primary"):
+                    barra = st.progress(0, text="Iniciando tubería...")
+                    def avance(evento, resumen):
+                        hechos = resumen["subidos"] + len(resumen["fallidos"])
+                        barra.progress(
+                            hechos / max(len(plan) - resumen["omitidos"], 1),
+                            text=f"{evento['cargo']}: {evento['estado']} ({hechos} listos)"
+                        )
+                    try:
+                        resumen = run_bulk_manuals(plan, manuals_folder_id, st.session_state.get("company_context", ""), on_progress=avance)
+                    except Exception as e:
+                        st.error(f"No se pudo ejecutar la generación masiva: {e}")
+                    else:
+                        barra.empty()
+                        st.session_state["bulk_resumen"] = resumen
+                        st.session_state.pop("bulk_plan", None)
+        resumen = st.session_state.get("bulk_resumen")
+        if resumen:
+            st.caption(
+                f"Última corrida: {resumen['subidos']} subidos, {resumen['omitidos']} ya listos, "
+                f"{len(resumen['fallidos'])} fallidos en {resumen['duracion_s']} s"
+                + (" (reanudada)" if resumen["reanudado"] else "")
+            )
+            if resumen["fallidos"]:
+                st.dataframe(
+                    pd.DataFrame(list(resumen["fallidos"].items()), columns=["cargo", "error"]),
+                    hide_index=True, use_container_width=True
+                )
+
 if link_cedula and link_token:
     try:
         expected_token = base64.b64encode(str(link_cedula).encode()).decode()
@@ -197,56 +237,23 @@ if tab_manual:
                     my_bar.progress(25, text="Analizando manuales y estructura...")
                     perfil_html = generate_role_profile_by_sections(empleado['cargo'], contexto_total)
                     my_bar.progress(60, text="Maquetando documento PDF...")
-                    logo_path = os.path.abspath("logo_servinet.jpg") if os.path.exists("logo_servinet.jpg") else None
                     now = datetime.datetime.now()
-                    datos_pdf = {
-                        "empresa": "GRUPO SERVINET",
-                        "logo_url": logo_path,
-                        "codigo_doc": f"MF-{empleado['cedula']}-{now.year}",
-                        "departamento": empleado['departamento'],
-                        "version": "1.0 IA",
-                        "vigencia": str(now.year),
-                        "fecha_emision": now.strftime("%d/%m/%Y"),
-                        "cargo": empleado['cargo'],
-                        "perfil_html": perfil_html
-                    }
-                    cargo_dict = {
-                        "nombre": empleado['cargo'],
-                        "area": empleado['departamento'],
-                        "jefe_inmediato": empleado.get('jefe_directo', ''),
-                        "subordinados": empleado.get('subordinados', ''),
-                        "modalidad": empleado.get('modalidad', ''),
-                        "sede": empleado.get('sede', ''),
-                        "mision": extraer_mision(perfil_html),  # Puedes extraerlo del HTML generado
-                        "funciones": extraer_funciones(perfil_html),  # idem
-                        "educacion": extraer_educacion(perfil_html),
-                        "experiencia": extraer_experiencia(perfil_html),
-                        "conocimientos": extraer_conocimientos(perfil_html),
-                        "idiomas": extraer_idiomas(perfil_html),
-                        "competencias": extraer_competencias(perfil_html),
-                        "kpis": extraer_kpis(perfil_html)
-                    }
-                    doc_dict = {
-                        "codigo": f"MF-{empleado['cedula']}-{now.year}",
-                        "version": "1.0 IA",
-                        "fecha": now.strftime("%d/%m/%Y"),
-                    }
-                    template_dir = os.path.join(os.path.dirname(__file__), "../modules")
-                    env = Environment(loader=FileSystemLoader(template_dir))
-                    template = env.get_template("manual_template.html")
-
-                    html_content = template.render(
-                        cargo=cargo_dict,
-                        doc=doc_dict,
-                        logo_url="logo_servinet.jpg",
-                        perfil_html=perfil_html  # <-- Asegúrate de pasar esto
+                    datos_pdf = build_manual_data(
+                        empleado['cargo'], empleado['departamento'], perfil_html,
+                        codigo=f"MF-{empleado['cedula']}-{now.year}",
+                        jefe_inmediato=empleado.get('jefe_directo', ''),
+                        subordinados=empleado.get('subordinados', ''),
+                        modalidad=empleado.get('modalidad', ''),
+                        sede=empleado.get('sede', '')
                     )
-                    pdf_filename = f"Manual_{cargo_dict['nombre'].replace(' ', '_')}.pdf"
-                    HTML(string=html_content, base_url=template_dir).write_pdf(pdf_filename)
+                    # MEJORA: El PDF se renderiza en el pool de procesos; la página solo consulta su avance
+                    job_id = submit_render("manual", datos_pdf, empleado['cargo'])
+                    pdf_bytes = wait_render(job_id, on_progress=lambda estado: my_bar.progress(
+                        60 + int(estado["progreso"] * 25), text=f"Maquetando documento PDF... ({estado['segundos']} s)"
+                    ))
 
                     my_bar.progress(85, text="Subiendo a Google Drive...")
-                    folder_id = get_or_create_manuals_folder()
-                    file_id = upload_manual_to_drive(pdf_filename, folder_id)
+                    file_id, _ = upload_manual_to_drive(pdf_bytes, manuals_folder_id, filename=manual_filename(empleado['cargo']))
                     set_file_public(file_id)
                     my_bar.progress(100, text="¡Completado!")
                     time.sleep(1)
@@ -385,7 +392,16 @@ if tab_share:
             link_final_encoded = urllib.parse.quote(link_final, safe='')
 
             nombre_subordinado = empleado['nombre']
-            nombre_jefe = df[df['NOMBRE COMPLETO'] == nombre_subordinado].iloc[0].get('JEFE_DIRECTO', 'Jefe no asignado')
+            # Jefe desde el índice de la línea de reporte; si JEFE_DIRECTO no está en la base, el texto tal cual
+            jerarquia = get_jerarquia(df)
+            pos = jerarquia.indice(nombre_subordinado)
+            jefe_pos = jerarquia.jefe(pos) if pos is not None else None
+            nombre_jefe = (
+                jerarquia.etiqueta(jefe_pos).strip() if jefe_pos is not None
+                else str(datos_empleado.get('JEFE_DIRECTO', '') or 'Jefe no asignado')
+            )
+            if pos is not None and jefe_pos is not None:
+                st.caption("Cadena de mando: " + " → ".join(jerarquia.etiqueta(i).strip() for i in jerarquia.cadena_de_mando(pos)))
 
             mensaje_ws = (
                 f"👋 Hola {nombre_jefe},%0A%0A"
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from functools import partial
 from modules.database import get_evaluaciones, get_employees, connect_to_drive, SPREADSHEET_ID
 from modules.drive_manager import find_manual_in_drive, download_manual_from_drive, get_or_create_manuals_folder
 from modules.ai_brain import analyze_results
@@ -29,10 +30,9 @@ st.caption(f"Sede: {datos.get('SEDE', '--')} | Departamento: {datos.get('DEPARTA
 with st.expander("📄 Manual de Funciones"):
     manual_file_id = find_manual_in_drive(cargo, manuals_folder_id)
     if manual_file_id:
-        pdf_bytes = download_manual_from_drive(manual_file_id)
         st.download_button(
             label="📥 Descargar Manual PDF",
-            data=pdf_bytes,
+            data=partial(download_manual_from_drive, manual_file_id),
             file_name=f"Manual_{cargo.replace(' ', '_').upper()}.pdf",
             mime="application/pdf"
         )
@@ -1,31 +1,28 @@
 # pages/6_🌤️_Clima_Laboral.py
+import html
 import streamlit as st
-from modules.database import connect_to_drive, SPREADSHEET_ID, get_employees
+from modules.database import get_employees, get_clima_laboral
 from modules.ai_brain import analyze_clima_laboral
-import base64
+from modules.clima_cube import periodos, estadisticas
+from modules.clima import get_cubo_clima, pendientes_clima, enlaces_clima, exportar_enlaces
+from functools import partial
 import pandas as pd
-import urllib.parse
 
 st.set_page_config(page_title="Clima Laboral", page_icon="🌤️", layout="wide")
 st.title("🌤️ Encuesta de Clima Laboral")
 
 # --- CARGA DE DATOS ---
 df = get_employees()
-client = connect_to_drive()
-spreadsheet = client.open_by_key(SPREADSHEET_ID)
-sheet = spreadsheet.worksheet("4_clima_laboral")
-data_clima = sheet.get_all_records()
-df_clima = pd.DataFrame(data_clima)
+df_clima = get_clima_laboral()  # cacheada; la encuesta la invalida al registrar una respuesta
 
-# Convierte las columnas de preguntas a numéricas (ignora errores)
-preguntas = [col for col in df_clima.columns if col.startswith("¿")]
-for col in preguntas:
-    df_clima[col] = pd.to_numeric(df_clima[col], errors='coerce')
+# Cubo de agregados (conteo, suma y suma de cuadrados por cargo, depto, pregunta y periodo):
+# se sincroniza una vez por lectura de la hoja (solo suma las filas nuevas); las medias y
+# varianzas salen de los grupos y se calculan una vez por versión del cubo
+cubo = get_cubo_clima()
+preguntas = cubo["preguntas"]
 
 # --- FILTRAR EMPLEADOS QUE NO HAN RESPONDIDO ---
-respondieron = set(str(row['CEDULA']) for _, row in df_clima.iterrows() if 'CEDULA' in row and row['CEDULA'])
-df['CEDULA'] = df['CEDULA'].astype(str)
-df_pendientes = df[~df['CEDULA'].isin(respondieron)]
+df_pendientes = pendientes_clima(df, df_clima)
 
 tab1, tab2, tab3 = st.tabs(["📨 Envío y Registro", "📊 Resultados Globales", "🧠 Análisis y Plan de Acción"])
 
@@ -34,24 +31,44 @@ with tab1:
     if df_pendientes.empty:
         st.success("🎉 Todos los empleados han respondido la encuesta de clima laboral.")
     else:
-        for _, row in df_pendientes.iterrows():
-            token = base64.b64encode(str(row['CEDULA']).encode()).decode()
-            url = f"https://servinet.datovatenexuspro.com/?clima={row['CEDULA']}&token={token}"
-            url_encoded = urllib.parse.quote(url, safe='')
-            mensaje_ws = (
-                f"🌤️ Hola {row['NOMBRE COMPLETO']},%0A"
-                "Te invitamos a diligenciar la Encuesta de Clima Laboral de SERVINET.%0A"
-                "Tu opinión es muy importante para nosotros y nos ayuda a mejorar el ambiente de trabajo.%0A"
-                "Por favor ingresa al siguiente enlace seguro y responde la encuesta: "
-                f"{url_encoded}%0A"
-                "¡Gracias por tu participación! 😊"
-            )
-            st.markdown(f"""
+        # Enlaces y mensajes de todos los pendientes en una sola pasada; en pantalla solo una página
+        enlaces = enlaces_clima(df_pendientes)
+        st.caption(f"👥 {len(enlaces)} empleados pendientes por responder")
+        col_csv, col_xlsx = st.columns(2)
+        col_csv.download_button(
+            "📥 Descargar enlaces y mensajes (CSV)", data=partial(exportar_enlaces, enlaces, "csv"),
+            file_name="Enlaces_Clima_Laboral.csv", mime="text/csv", use_container_width=True, key="clima_export_csv"
+        )
+        col_xlsx.download_button(
+            "📥 Descargar enlaces y mensajes (Excel)", data=partial(exportar_enlaces, enlaces, "xlsx"),
+            file_name="Enlaces_Clima_Laboral.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            use_container_width=True, key="clima_export_xlsx"
+        )
+
+        col_buscar, col_tamano = st.columns([3, 1])
+        busqueda = col_buscar.text_input("🔎 Buscar por nombre, cédula, cargo o departamento", key="clima_buscar")
+        por_pagina = col_tamano.selectbox("Por página", [10, 25, 50, 100], key="clima_por_pagina")
+        filtrados = enlaces
+        if busqueda.strip():
+            texto = (enlaces["NOMBRE COMPLETO"] + " " + enlaces["CEDULA"] + " " + enlaces["CARGO"] + " " + enlaces["DEPARTAMENTO"]).str.upper()
+            filtrados = enlaces[texto.str.contains(busqueda.strip().upper(), regex=False).to_numpy()]
+
+        paginas = max(1, -(-len(filtrados) // por_pagina))
+        if st.session_state.get("clima_pagina", 1) > paginas:
+            st.session_state["clima_pagina"] = 1
+        pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key="clima_pagina")
+        inicio = (pagina - 1) * por_pagina
+        pagina_actual = filtrados.iloc[inicio:inicio + por_pagina]
+        if pagina_actual.empty:
+            st.info("No hay pendientes que coincidan con la búsqueda.")
+        else:
+            st.caption(f"Mostrando {inicio + 1}–{inicio + len(pagina_actual)} de {len(filtrados)}")
+            tarjetas = [f"""
                 <div style="background:#f8fafc; border-radius:10px; padding:16px; margin-bottom:12px; box-shadow:0 2px 8px #e0e7ef;">
-                    <b>{row['NOMBRE COMPLETO']}</b> ({row.get('CARGO','')})<br>
-                    <a href="{url}" target="_blank" style="color:#2563eb;">Abrir encuesta</a>
+                    <b>{html.escape(fila['NOMBRE COMPLETO'])}</b> ({html.escape(fila['CARGO'])})<br>
+                    <a href="{html.escape(fila['ENLACE'])}" target="_blank" style="color:#2563eb;">Abrir encuesta</a>
                     <br>
-                    <a href="https://web.whatsapp.com/send?phone={row.get('CELULAR','')}&text={mensaje_ws}" target="_blank">
+                    <a href="{html.escape(fila['WHATSAPP'])}" target="_blank">
                         <button style="
                             background-color:#25D366; 
                             color:white; 
@@ -64,8 +81,8 @@ with tab1:
                             📲 Enviar por WhatsApp
                         </button>
                     </a>
-                </div>
-            """, unsafe_allow_html=True)
+                </div>""" for fila in pagina_actual.to_dict("records")]
+            st.markdown("".join(tarjetas), unsafe_allow_html=True)
     st.markdown("---")
     st.info("Solo aparecen los empleados que aún no han respondido la encuesta. Cuando respondan, desaparecerán de este listado automáticamente.")
     with st.expander("👀 Ver empleados que ya respondieron"):
@@ -76,14 +93,14 @@ with tab1:
 
 with tab2:
     st.header("📈 Resultados Globales de Clima Laboral")
-    if not df_clima.empty:
-        preguntas = [col for col in df_clima.columns if col.startswith("¿")]
-        for col in preguntas:
-            df_clima[col] = pd.to_numeric(df_clima[col], errors='coerce')
+    if not df_clima.empty and not cubo["grupos"].empty:
+        periodo = st.selectbox("Periodo", ["Todos"] + periodos(cubo), key="clima_periodo")
+        periodo = None if periodo == "Todos" else periodo
+        globales = estadisticas(cubo, periodo=periodo).set_index("PREGUNTA").reindex(preguntas)
 
         st.subheader("Promedio Global por Pregunta")
         import plotly.express as px
-        promedios = df_clima[preguntas].mean().sort_values(ascending=True)
+        promedios = globales["MEDIA"].dropna().sort_values(ascending=True)
         fig = px.bar(
             promedios,
             orientation='h',
@@ -101,9 +118,15 @@ with tab2:
             plot_bgcolor='#f8fafc'
         )
         st.plotly_chart(fig, use_container_width=True)
+        with st.expander("📏 Dispersión por pregunta"):
+            st.dataframe(
+                globales[["N", "MEDIA", "DESVIACION"]].dropna(subset=["MEDIA"]).rename(columns={"N": "Respuestas", "MEDIA": "Promedio", "DESVIACION": "Desviación"}),
+                use_container_width=True
+            )
 
         st.subheader("Promedio de Clima por Cargo")
-        clima_por_cargo = df_clima.groupby("CARGO")[preguntas].mean()
+        clima_por_cargo = estadisticas(cubo, ["CARGO"], periodo).pivot(index="CARGO", columns="PREGUNTA", values="MEDIA")
+        clima_por_cargo = clima_por_cargo.reindex(columns=[p for p in preguntas if p in clima_por_cargo.columns])
         st.dataframe(clima_por_cargo, use_container_width=True)
 
         st.subheader("Mapa de Calor de Clima Laboral por Cargo")
@@ -129,27 +152,21 @@ with tab2:
 with tab3:
     st.header("🧠 Análisis IA y Plan de Acción")
     if not df_clima.empty:
-        preguntas = [col for col in df_clima.columns if col.startswith("¿")]
-        # --- Conversión a numérico ---
-        for col in preguntas:
-            df_clima[col] = pd.to_numeric(df_clima[col], errors='coerce')
-
         st.subheader("Análisis Ejecutivo Global")
         respuestas_list = df_clima.to_dict(orient='records')
         analisis = analyze_clima_laboral(respuestas_list)
         st.markdown(analisis, unsafe_allow_html=True)
 
         st.subheader("Análisis y Plan de Acción por Cargo")
-        cargos = df_clima["CARGO"].dropna().unique()
-        for cargo in cargos:
-            grupo = df_clima[df_clima["CARGO"] == cargo]
+        medias_cargo = estadisticas(cubo, ["CARGO"])
+        for cargo, grupo in df_clima.dropna(subset=["CARGO"]).groupby("CARGO", sort=False):
             if not grupo.empty:
                 st.markdown(f"### {cargo}")
                 respuestas_cargo = grupo.to_dict(orient='records')
                 analisis_cargo = analyze_clima_laboral(respuestas_cargo)
                 st.markdown(analisis_cargo, unsafe_allow_html=True)
                 # Gráfico de barras para este cargo
-                promedios_cargo = grupo[preguntas].mean().sort_values(ascending=False)
+                promedios_cargo = medias_cargo[medias_cargo["CARGO"] == str(cargo)].set_index("PREGUNTA")["MEDIA"].sort_values(ascending=False)
                 st.bar_chart(promedios_cargo)
                 st.markdown("---")
     else: